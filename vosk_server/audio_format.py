@@ -0,0 +1,171 @@
+"""
+Input format conversion.
+
+The recognizer wants 16 kHz mono 16-bit PCM. Clients that capture
+something else declare their format in the hello:
+
+    {"type": "hello", "sample_rate": 48000, "channels": 2,
+     "encoding": "float32", "gain": "auto"}
+
+and a FormatConverter turns their audio into 16 kHz mono int16 on the
+fly. All steps work on whole chunks with NumPy:
+
+- decode int16 or float32 samples, carrying a partial sample frame over
+  to the next chunk
+- downmix interleaved channels by averaging them
+- resample: a windowed-sinc low-pass (only when downsampling, so that
+  e.g. 48 kHz input doesn't alias) followed by linear interpolation. The
+  filter history and the interpolation phase carry across chunks, so
+  chunk boundaries don't click
+- gain: a fixed gain in dB, or "auto" to normalize speech towards
+  AGC_TARGET_DB. Auto gain only adapts on chunks above AGC_GATE_DB, so
+  silence isn't pumped up to speech level
+
+Work arrays are kept per converter and only grow, so a steady stream
+doesn't allocate new buffers for every chunk.
+"""
+
+import numpy as np
+
+TARGET_RATE = 16000
+MIN_RATE = 8000
+MAX_RATE = 48000
+MAX_CHANNELS = 8
+ENCODINGS = {"int16": np.int16, "float32": np.float32}
+DEFAULT_ENCODING = "int16"
+# Hello keys that describe the input format
+FORMAT_SETTINGS = ("sample_rate", "channels", "encoding", "gain")
+
+FILTER_TAPS = 63
+AGC_TARGET_DB = -20.0   # RMS level speech is normalized to
+AGC_GATE_DB = -50.0     # quieter chunks don't move the gain
+AGC_MAX_GAIN_DB = 30.0
+AGC_SMOOTHING = 0.2     # fraction of the way to the new gain per chunk
+
+
+def lowpass_filter(cutoff: float, taps: int = FILTER_TAPS) -> np.ndarray:
+    """Hamming-windowed sinc low-pass; cutoff is a fraction of the rate."""
+    n = np.arange(taps) - (taps - 1) / 2
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return (h / h.sum()).astype(np.float32)
+
+
+def parse_gain(gain):
+    """None (off), "auto", or a fixed gain in dB."""
+    if gain is None or gain == "auto":
+        return gain
+    if isinstance(gain, bool) or not isinstance(gain, (int, float)):
+        raise ValueError('gain must be a number of dB or "auto"')
+    return float(gain)
+
+
+class FormatConverter:
+    """Streaming conversion of one client's audio to 16 kHz mono int16."""
+
+    def __init__(self, sample_rate: int = TARGET_RATE, channels: int = 1,
+                 encoding: str = DEFAULT_ENCODING, gain=None):
+        sample_rate, channels = int(sample_rate), int(channels)
+        if not MIN_RATE <= sample_rate <= MAX_RATE:
+            raise ValueError(f"sample_rate must be {MIN_RATE}-{MAX_RATE} Hz")
+        if not 1 <= channels <= MAX_CHANNELS:
+            raise ValueError(f"channels must be 1-{MAX_CHANNELS}")
+        if encoding not in ENCODINGS:
+            raise ValueError(f"encoding must be one of {', '.join(ENCODINGS)}")
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.encoding = encoding
+        self.gain = parse_gain(gain)
+        self.dtype = np.dtype(ENCODINGS[encoding])
+        self.frame_bytes = self.dtype.itemsize * channels
+        self.step = sample_rate / TARGET_RATE  # input samples per output sample
+        self.filter = (lowpass_filter(0.45 / self.step)
+                       if sample_rate > TARGET_RATE else None)
+        self._ramp = np.arange(0, dtype=np.float64)
+        self._work = np.empty(0, dtype=np.float64)
+        self.reset()
+
+    @property
+    def passthrough(self) -> bool:
+        """True if audio is already in the recognizer's format."""
+        return (self.sample_rate == TARGET_RATE and self.channels == 1
+                and self.encoding == "int16" and self.gain is None)
+
+    @property
+    def bytes_per_ms(self) -> float:
+        """Input bytes per millisecond of audio."""
+        return self.sample_rate * self.frame_bytes / 1000
+
+    def config(self) -> dict:
+        return {key: getattr(self, key) for key in FORMAT_SETTINGS}
+
+    def reset(self):
+        """Forget stream state (partial frames, filter history, phase)."""
+        self._odd = b""
+        self._history = np.zeros(len(self.filter) - 1 if self.filter is not None else 0,
+                                 dtype=np.float32)
+        self._last = None  # last input sample, for interpolating across chunks
+        self._phase = 0.0  # position of the next output sample
+        self.gain_db = self.gain if isinstance(self.gain, float) else 0.0
+
+    def convert(self, chunk: bytes) -> bytes:
+        """Convert a chunk; returns whatever whole output samples are ready."""
+        if self.passthrough:
+            return chunk
+        data = self._odd + chunk if self._odd else chunk
+        usable = len(data) - len(data) % self.frame_bytes
+        self._odd = bytes(data[usable:])
+        if not usable:
+            return b""
+
+        x = np.frombuffer(data, dtype=self.dtype, count=usable // self.dtype.itemsize)
+        x = x.astype(np.float32)
+        if self.encoding == "float32":
+            x *= 32767.0
+        if self.channels > 1:
+            x = x.reshape(-1, self.channels).mean(axis=1, dtype=np.float32)
+        if self.sample_rate != TARGET_RATE:
+            x = self._resample(x)
+        if self.gain is not None:
+            x = self._apply_gain(x)
+        return np.clip(x, -32768, 32767, out=x).astype(np.int16).tobytes()
+
+    def _resample(self, x: np.ndarray) -> np.ndarray:
+        if self.filter is not None:
+            x = np.concatenate((self._history, x))
+            self._history = x[-len(self._history):].copy()
+            x = np.convolve(x, self.filter, mode="valid").astype(np.float32, copy=False)
+        if self._last is not None:
+            x = np.concatenate(((self._last,), x))
+        self._last = x[-1]
+        # Output samples fall at phase, phase + step, ... up to the last
+        # input sample. The next chunk starts at that sample, so the
+        # phase carries over relative to it.
+        last = len(x) - 1
+        if self._phase > last:
+            self._phase -= last
+            return x[:0]
+        count = int((last - self._phase) // self.step) + 1
+        if len(self._ramp) < max(count, len(x)):
+            self._ramp = np.arange(max(count, len(x)), dtype=np.float64)
+        positions = np.multiply(self._ramp[:count], self.step,
+                                out=self._positions(count))
+        positions += self._phase
+        self._phase = positions[-1] + self.step - last
+        return np.interp(positions, self._ramp[:len(x)], x)
+
+    def _positions(self, count: int) -> np.ndarray:
+        """A reused work array for `count` sample positions."""
+        if len(self._work) < count:
+            self._work = np.empty(len(self._ramp), dtype=np.float64)
+        return self._work[:count]
+
+    def _apply_gain(self, x: np.ndarray) -> np.ndarray:
+        if self.gain == "auto" and x.size:
+            rms = float(np.sqrt(np.mean(x * x))) + 1e-9
+            level_db = 20.0 * np.log10(rms / 32768.0)
+            if level_db > AGC_GATE_DB:
+                wanted = min(AGC_TARGET_DB - level_db, AGC_MAX_GAIN_DB)
+                self.gain_db += AGC_SMOOTHING * (wanted - self.gain_db)
+        if self.gain_db:
+            x = x * np.float32(10.0 ** (self.gain_db / 20.0))
+        return x
@@ -0,0 +1,166 @@
+"""
+Recognizer backends.
+
+The server needs two things from a speech engine: load a model, and build
+a recognizer for a grammar. A backend provides both:
+
+    backend.load_model(path)              -> model
+    backend.create_recognizer(model, grammar) -> recognizer
+
+Recognizers follow KaldiRecognizer's interface as far as the server uses
+it: AcceptWaveform(data) -> bool (True at an endpoint), Result(),
+PartialResult() and FinalResult() returning JSON strings, and Reset().
+Models answer vosk_model_find_word(word) (< 0 if unknown) for the
+vocabulary check.
+
+VoskBackend is the real one. FakeBackend needs no model: its recognizers
+play a script of phrases, revealing words as audio arrives, and can be
+made to cost a fixed time per chunk. That keeps results deterministic
+and separates the server's own overhead (websocket, JSON, framing,
+queueing) from Kaldi's, for tests and for bench.py at thousands of
+sessions.
+"""
+
+import json
+import time
+
+try:
+    from vosk import KaldiRecognizer, Model, SetLogLevel
+except ImportError:
+    KaldiRecognizer = Model = SetLogLevel = None
+
+SAMPLE_RATE = 16000
+BYTES_PER_MS = SAMPLE_RATE * 2 // 1000
+UNKNOWN_WORD = "[unk]"
+
+# Phrases the fake recognizer says, in turn (all vocabulary words)
+DEFAULT_SCRIPT = ("jarvis show inbox", "next email", "open email three",
+                  "archive this email", "go back")
+DEFAULT_UTTERANCE_MS = 1000
+
+
+class VoskBackend:
+    """Kaldi models and recognizers from the vosk package."""
+
+    name = "vosk"
+
+    def __init__(self):
+        if Model is None:
+            raise ImportError("No module named 'vosk'")
+        SetLogLevel(-1)
+
+    def load_model(self, path):
+        return Model(str(path))
+
+    def create_recognizer(self, model, grammar: str):
+        rec = KaldiRecognizer(model, SAMPLE_RATE, grammar)
+        rec.SetWords(True)  # Include word-level timing
+        return rec
+
+
+class FakeModel:
+    """Stands in for a Model; knows every word."""
+
+    def vosk_model_find_word(self, word: str) -> int:
+        return 0
+
+
+class FakeRecognizer:
+    """Scripted recognizer.
+
+    Each utterance is the next phrase of the script, spread over
+    `utterance_ms` of audio: word i shows up in the partial after
+    (i + 1) / (words + 1) of it, and the final comes at the end. Words
+    outside the grammar come out as [unk], as with Kaldi. Audio content
+    is ignored; only its length counts.
+
+    Every AcceptWaveform call costs `chunk_cost_ms` plus `rtf` times the
+    chunk's duration, slept so the GIL is free, like Kaldi's decoding.
+    Reset() starts the script over, so every session gets the same
+    sequence.
+    """
+
+    def __init__(self, grammar: str = None, script=DEFAULT_SCRIPT,
+                 utterance_ms: float = DEFAULT_UTTERANCE_MS,
+                 chunk_cost_ms: float = 0.0, rtf: float = 0.0):
+        self.script = [self._constrain(phrase.split(), grammar) for phrase in script]
+        self.utterance_ms = utterance_ms
+        self.chunk_cost_ms = chunk_cost_ms
+        self.rtf = rtf
+        self.Reset()
+
+    @staticmethod
+    def _constrain(words: list, grammar: str) -> list:
+        if not grammar:
+            return words
+        allowed = {w for phrase in json.loads(grammar) for w in phrase.split()}
+        return [w if w in allowed else UNKNOWN_WORD for w in words]
+
+    def Reset(self):
+        self._phrase = 0
+        self._heard_ms = 0.0   # audio in the current utterance
+        self._offset_ms = 0.0  # stream time at its start, for word timings
+
+    def AcceptWaveform(self, data) -> bool:
+        ms = len(data) / BYTES_PER_MS
+        cost = self.chunk_cost_ms + self.rtf * ms
+        if cost > 0:
+            time.sleep(cost / 1000)
+        self._heard_ms += ms
+        return self._heard_ms >= self.utterance_ms
+
+    def _words(self) -> list:
+        words = self.script[self._phrase % len(self.script)]
+        n = len(words)
+        heard = min(n, int(self._heard_ms * (n + 1) / self.utterance_ms))
+        return words[:heard]
+
+    def _final(self) -> str:
+        words = self._words()
+        n = len(self.script[self._phrase % len(self.script)])
+        step = self.utterance_ms / (n + 1) / 1000
+        start = self._offset_ms / 1000
+        result = {
+            "result": [{"word": w, "start": round(start + (i + 0.5) * step, 3),
+                        "end": round(start + (i + 1.5) * step, 3), "conf": 1.0}
+                       for i, w in enumerate(words)],
+            "text": " ".join(words),
+        }
+        if words:
+            self._phrase += 1
+        self._offset_ms += self._heard_ms
+        self._heard_ms = 0.0
+        return json.dumps(result) if words else json.dumps({"text": ""})
+
+    def Result(self) -> str:
+        return self._final()
+
+    def FinalResult(self) -> str:
+        return self._final()
+
+    def PartialResult(self) -> str:
+        return json.dumps({"partial": " ".join(self._words())})
+
+
+class FakeBackend:
+    """Scripted recognizers, no model. See FakeRecognizer."""
+
+    name = "fake"
+
+    def __init__(self, script=DEFAULT_SCRIPT,
+                 utterance_ms: float = DEFAULT_UTTERANCE_MS,
+                 chunk_cost_ms: float = 0.0, rtf: float = 0.0):
+        self.script = tuple(script)
+        self.utterance_ms = utterance_ms
+        self.chunk_cost_ms = chunk_cost_ms
+        self.rtf = rtf
+
+    def load_model(self, path):
+        return FakeModel()
+
+    def create_recognizer(self, model, grammar: str):
+        return FakeRecognizer(grammar, self.script, self.utterance_ms,
+                              self.chunk_cost_ms, self.rtf)
+
+
+BACKENDS = {"vosk": VoskBackend, "fake": FakeBackend}
@@ -0,0 +1,107 @@
+"""
+Bounded per-session message queue.
+
+The websocket reader puts every client message on a session's queue and a
+separate task decodes them in order. Audio that arrives faster than it can
+be decoded piles up here instead of in an unbounded socket buffer. Once the
+queued audio exceeds the bound, the overflow policy decides what gives:
+
+- "drop_oldest": discard the oldest queued audio to make room
+- "latest": discard all queued audio and keep only the newest chunk
+- "close": refuse the chunk; the server closes the connection
+
+Control messages are never dropped, so an eof or context switch is always
+seen in order.
+"""
+
+import asyncio
+from collections import deque
+
+OVERFLOW_POLICIES = ("drop_oldest", "latest", "close")
+DEFAULT_OVERFLOW = "drop_oldest"
+DEFAULT_QUEUE_MS = 2000
+
+
+class AudioQueue:
+    """FIFO of (is_audio, message) with a cap on queued audio bytes."""
+
+    def __init__(self, max_bytes: int, policy: str = DEFAULT_OVERFLOW):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.queued_bytes = 0
+        self.dropped_bytes = 0
+        self._items = deque()
+        self._ready = asyncio.Event()
+        self._closed = False
+        self._detached = False
+
+    def __len__(self):
+        return len(self._items)
+
+    def put_audio(self, chunk: bytes) -> int:
+        """Queue an audio chunk, applying the overflow policy.
+
+        Returns the number of bytes dropped to make room, or -1 if the
+        "close" policy refused the chunk.
+        """
+        dropped = 0
+        if self.queued_bytes + len(chunk) > self.max_bytes:
+            if self.policy == "close":
+                return -1
+            if self.policy == "latest":
+                dropped = self._drop_audio(len(self._items))
+            else:
+                while self.queued_bytes + len(chunk) > self.max_bytes and self.queued_bytes:
+                    dropped += self._drop_audio(1)
+        self._items.append((True, chunk))
+        self.queued_bytes += len(chunk)
+        self._ready.set()
+        return dropped
+
+    def put_control(self, data: dict):
+        self._items.append((False, data))
+        self._ready.set()
+
+    def close(self):
+        """Discard queued audio and make get() return None once drained."""
+        self._drop_audio(len(self._items))
+        self._closed = True
+        self._ready.set()
+
+    def detach(self):
+        """Make get() return None now, keeping queued messages for attach()."""
+        self._detached = True
+        self._ready.set()
+
+    def attach(self):
+        self._detached = False
+
+    async def get(self):
+        """Next (is_audio, message), or None after close() or detach()."""
+        while not self._items or self._detached:
+            if self._closed or self._detached:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        is_audio, message = self._items.popleft()
+        if is_audio:
+            self.queued_bytes -= len(message)
+        return is_audio, message
+
+    def _drop_audio(self, limit: int) -> int:
+        """Remove up to `limit` audio chunks, oldest first; keeps control."""
+        dropped = 0
+        kept = deque()
+        while self._items:
+            is_audio, message = self._items.popleft()
+            if is_audio and limit > 0:
+                dropped += len(message)
+                limit -= 1
+            else:
+                kept.append((is_audio, message))
+        self._items = kept
+        self.queued_bytes -= dropped
+        self.dropped_bytes += dropped
+        return dropped
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Offline batch transcription.
+
+Transcribes a directory (searched recursively) or a manifest of WAV / raw
+PCM files with the same model and constrained grammar as the server,
+including the words it adds from its vocabulary file.
+Files are spread over a pool of worker processes, each with its own
+model, and results are written as JSON lines as soon as each file is done.
+
+Usage:
+    python batch.py recordings/ --output results.jsonl [--jobs 8]
+    python batch.py manifest.txt --output results.jsonl --grammar phrases
+
+A manifest lists one audio path per line (relative to the manifest;
+blank lines and "#" comments are skipped). Audio must be 16 kHz mono
+16-bit WAV or raw PCM in that format.
+
+Each output line looks like:
+
+    {"path": "recordings/a.wav", "text": "jarvis delete",
+     "segments": [{"text": "jarvis delete", "words": [{"word": "jarvis",
+                   "start": 0.12, "end": 0.5, "conf": 1.0}, ...]}],
+     "audio_seconds": 2.1, "decode_seconds": 0.08}
+
+Files that fail get {"path": ..., "error": "..."} instead. Rerunning with
+the same --output skips files already in it, so an interrupted run picks
+up where it stopped (add --retry-errors to redo failed files too).
+"""
+
+import json
+import os
+import sys
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+AUDIO_SUFFIXES = {".wav", ".raw", ".pcm"}
+SAMPLE_RATE = 16000
+CHUNK_BYTES = SAMPLE_RATE * 2 // 2  # 0.5 s per AcceptWaveform call
+
+# Set in each worker process by _init_worker
+_recognizer = None
+
+
+def find_inputs(source: Path) -> list:
+    """Audio files under a directory, or the files a manifest lists."""
+    if source.is_dir():
+        return sorted(p for p in source.rglob("*")
+                      if p.suffix.lower() in AUDIO_SUFFIXES and p.is_file())
+    paths = []
+    for line in source.read_text().splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            path = Path(line)
+            paths.append(path if path.is_absolute() else source.parent / path)
+    return paths
+
+
+def read_audio(path: Path, chunk_bytes: int = CHUNK_BYTES):
+    """Yield a file's PCM in chunks without loading all of it.
+
+    Raises ValueError for a WAV that isn't 16 kHz mono 16-bit.
+    """
+    if path.suffix.lower() == ".wav":
+        with wave.open(str(path), "rb") as wf:
+            if (wf.getframerate(), wf.getnchannels(), wf.getsampwidth()) != (SAMPLE_RATE, 1, 2):
+                raise ValueError(f"expected {SAMPLE_RATE} Hz mono 16-bit WAV")
+            while data := wf.readframes(chunk_bytes // 2):
+                yield data
+    else:
+        with open(path, "rb") as f:
+            while data := f.read(chunk_bytes):
+                yield data
+
+
+def transcribe(recognizer, path: Path) -> dict:
+    """Decode one file with a (fresh or reset) recognizer."""
+    segments = []
+    audio_bytes = 0
+    start = time.perf_counter()
+
+    def add(result):
+        text = result.get("text", "").strip()
+        if text:
+            segments.append({"text": text, "words": result.get("result", [])})
+
+    try:
+        for chunk in read_audio(path):
+            audio_bytes += len(chunk)
+            if recognizer.AcceptWaveform(chunk):
+                add(json.loads(recognizer.Result()))
+        add(json.loads(recognizer.FinalResult()))
+    finally:
+        recognizer.Reset()
+
+    return {
+        "path": str(path),
+        "text": " ".join(s["text"] for s in segments),
+        "segments": segments,
+        "audio_seconds": round(audio_bytes / (SAMPLE_RATE * 2), 3),
+        "decode_seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def _init_worker(model_path: str, grammar: str):
+    """Load the model once per worker process."""
+    global _recognizer
+    from vosk import KaldiRecognizer, Model, SetLogLevel
+    SetLogLevel(-1)
+    model = Model(model_path)
+    _recognizer = KaldiRecognizer(model, SAMPLE_RATE, grammar)
+    _recognizer.SetWords(True)
+
+
+def _transcribe_in_worker(path: str) -> dict:
+    try:
+        return transcribe(_recognizer, Path(path))
+    except Exception as e:
+        # Unreadable files, bad formats and Kaldi's own failures ("Failed
+        # to process waveform") are that file's error, not the run's
+        return {"path": path, "error": str(e) or type(e).__name__}
+
+
+def completed_paths(output: Path, retry_errors: bool = False) -> set:
+    """Paths already in an output file from an earlier run.
+
+    A torn last line (the run was killed mid-write) is ignored.
+    """
+    done = set()
+    if not output.exists():
+        return done
+    with open(output) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "path" in record and not (retry_errors and "error" in record):
+                done.add(record["path"])
+    return done
+
+
+def _open_for_append(output: Path):
+    """Open the output for appending, ending any torn line first."""
+    f = open(output, "a+b")
+    if f.tell():
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+    return f
+
+
+def run(paths: list, output: Path, model_path: Path, grammar: str,
+        jobs: int, retry_errors: bool = False) -> dict:
+    """Transcribe `paths`, appending to `output`. Returns a summary."""
+    done = completed_paths(output, retry_errors)
+    todo = [str(p) for p in paths if str(p) not in done]
+    summary = {"files": len(paths), "skipped": len(paths) - len(todo),
+               "transcribed": 0, "errors": 0, "audio_seconds": 0.0}
+    if not todo:
+        return summary
+
+    wall_start = time.perf_counter()
+    with _open_for_append(output) as out, ProcessPoolExecutor(
+            max_workers=jobs, initializer=_init_worker,
+            initargs=(str(model_path), grammar)) as pool:
+        futures = [pool.submit(_transcribe_in_worker, path) for path in todo]
+        for n, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            out.write(json.dumps(record).encode() + b"\n")
+            out.flush()
+            if "error" in record:
+                summary["errors"] += 1
+                print(f"[{n}/{len(todo)}] {record['path']}: {record['error']}",
+                      file=sys.stderr)
+            else:
+                summary["transcribed"] += 1
+                summary["audio_seconds"] += record["audio_seconds"]
+                print(f"[{n}/{len(todo)}] {record['path']}: \"{record['text']}\"",
+                      file=sys.stderr)
+
+    wall = time.perf_counter() - wall_start
+    summary["audio_seconds"] = round(summary["audio_seconds"], 3)
+    summary["wall_seconds"] = round(wall, 3)
+    summary["speedup"] = round(summary["audio_seconds"] / wall, 2) if wall else None
+    return summary
+
+
+def main():
+    import argparse
+
+    from grammar import GRAMMAR_MODES, WORDS_MODE, get_grammar
+    from server import DEFAULT_MODEL, download_model
+    from vocab_reload import DEFAULT_VOCAB_FILE, install_vocabulary, load_vocabulary
+    from vocabulary import CONTEXTS
+
+    parser = argparse.ArgumentParser(description="Batch-transcribe audio files")
+    parser.add_argument("source", type=Path,
+                        help="Directory of audio files, or a manifest listing them")
+    parser.add_argument("--output", "-o", type=Path, required=True,
+                        help="JSONL results file; appended to and used to resume")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes, one model each "
+                             "(default: one per CPU)")
+    parser.add_argument("--model", type=str, default=DEFAULT_MODEL)
+    parser.add_argument("--grammar", choices=sorted(GRAMMAR_MODES),
+                        default=WORDS_MODE)
+    parser.add_argument("--context", choices=sorted(CONTEXTS),
+                        help="Decode with a screen's smaller grammar")
+    parser.add_argument("--vocab-file", type=Path, default=DEFAULT_VOCAB_FILE,
+                        help="Extra vocabulary words, as loaded by the server "
+                             f"(default: {DEFAULT_VOCAB_FILE.name} next to "
+                             "server.py)")
+    parser.add_argument("--retry-errors", action="store_true",
+                        help="Redo files that failed in an earlier run")
+    args = parser.parse_args()
+
+    # Same words as the live server, so transcripts match. The server also
+    # checks them against the model's lexicon; that's left to it here.
+    try:
+        install_vocabulary(*load_vocabulary(args.vocab_file))
+    except (OSError, ValueError) as e:
+        print(f"Ignoring vocabulary file {args.vocab_file}: {e}", file=sys.stderr)
+
+    paths = find_inputs(args.source)
+    if not paths:
+        print(f"No audio files in {args.source}", file=sys.stderr)
+        return 1
+
+    model_path = download_model(args.model)
+    grammar = get_grammar(args.grammar, args.context)
+    try:
+        summary = run(paths, args.output, model_path, grammar,
+                      max(1, args.jobs), args.retry_errors)
+    except KeyboardInterrupt:
+        print("Interrupted; rerun the same command to resume.", file=sys.stderr)
+        return 130
+    print(json.dumps(summary), file=sys.stderr)
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Load-generation benchmark for the Vosk server.
+
+Starts a VoskServer in-process on a free local port, then replays audio
+from N concurrent websocket clients. Audio is paced at real time (or
+--speed times faster; 0 = as fast as possible). Runs for each session
+count in --sessions and writes a JSON report so results can be compared
+across commits.
+
+Usage:
+    python bench.py [--audio a.wav b.raw ...] [--sessions 1,2,4,8,16]
+                    [--speed 1.0] [--output bench.json]
+                    [--backend fake --fake-cost-ms 0]
+
+Audio files are WAV (16 kHz mono 16-bit) or raw PCM in that format.
+Without --audio, a fixture of tone + silence from test_server.py is used.
+
+Reported per run:
+    first_partial  time from the first audio chunk to the first partial
+    final_latency  time from the end of the audio (eof) to the final it
+                   flushes (endpoint "eof"); finals that ended mid-stream
+                   don't count. If eof flushes nothing, the reply to a
+                   "stats" request sent right after it marks the end
+                   instead. Clients wait for that reply before closing.
+    rtf            decode real-time factor: the server's decode seconds
+                   per second of audio, summed over sessions. Each session
+                   reports its own in the "stats" reply. Process CPU time
+                   would also count the clients, which run in this process.
+    decode_per_session_s
+                   the server's decode seconds per session
+
+A run is "sustainable" when every session completes without error and the
+p95 final latency stays within --latency-budget. The largest sustainable
+session count is reported as max_sustainable_sessions.
+
+With --backend fake no model is loaded: recognizers play scripted results
+at --fake-cost-ms per chunk, so with a cost of 0 the report measures the
+server's own overhead, at session counts a real model couldn't reach.
+"""
+
+import asyncio
+import json
+import logging
+import socket
+import subprocess
+import sys
+import time
+import wave
+from pathlib import Path
+
+import websockets
+
+import server as vosk_server
+from backends import BACKENDS, FakeBackend, VoskBackend
+from server import DEFAULT_MODEL, SAMPLE_RATE, VoskServer, download_model
+
+BYTES_PER_SECOND = SAMPLE_RATE * 2
+
+
+def load_audio(path: Path) -> bytes:
+    """Load 16 kHz mono PCM16 from a WAV or raw PCM file."""
+    if path.suffix.lower() == ".wav":
+        with wave.open(str(path), "rb") as wf:
+            if (wf.getframerate(), wf.getnchannels(), wf.getsampwidth()) != (SAMPLE_RATE, 1, 2):
+                raise ValueError(f"{path}: expected {SAMPLE_RATE} Hz mono 16-bit WAV")
+            return wf.readframes(wf.getnframes())
+    return path.read_bytes()
+
+
+def fixture_audio() -> bytes:
+    """One second of tone followed by half a second of silence."""
+    from test_server import generate_silence, generate_sine_wave
+    return generate_sine_wave(440, 1.0) + generate_silence(0.5)
+
+
+def percentiles(values: list) -> dict:
+    """p50/p95/p99/mean/max of a list of seconds (nearest-rank)."""
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def rank(p):
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+    return {
+        "p50": round(rank(50), 4),
+        "p95": round(rank(95), 4),
+        "p99": round(rank(99), 4),
+        "mean": round(sum(ordered) / len(ordered), 4),
+        "max": round(ordered[-1], 4),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True,
+                              cwd=Path(__file__).parent).stdout.strip() or None
+    except OSError:
+        return None
+
+
+async def run_client(url: str, audio: bytes, chunk_bytes: int, speed: float,
+                     hello: dict) -> dict:
+    """Stream one audio clip and time the server's responses."""
+    timings = {"first_partial": None, "final_latency": None, "finals": 0,
+               "decode_seconds": 0.0}
+    first_sent = None
+    eof_sent = None
+    done = asyncio.Event()
+
+    async with websockets.connect(url, max_queue=None) as ws:
+        async def receive():
+            async for message in ws:
+                if isinstance(message, bytes):
+                    continue
+                data = json.loads(message)
+                now = time.perf_counter()
+                if data.get("type") == "partial" and timings["first_partial"] is None:
+                    timings["first_partial"] = now - first_sent
+                elif data.get("type") == "final":
+                    timings["finals"] += 1
+                    # Only the final that eof flushed measures end of
+                    # speech to final; earlier ones ended mid-stream
+                    if data.get("endpoint") == "eof" and eof_sent is not None:
+                        timings["final_latency"] = now - eof_sent
+                elif data.get("type") == "stats" and eof_sent is not None:
+                    # Answered after the eof, so every final is in
+                    if timings["final_latency"] is None:
+                        timings["final_latency"] = now - eof_sent
+                    timings["decode_seconds"] = data["session"]["decode_seconds"]
+                    done.set()
+
+        receiver = asyncio.create_task(receive())
+        try:
+            await ws.send(json.dumps({"type": "hello", **hello}))
+            start = time.perf_counter()
+            first_sent = start
+            for offset in range(0, len(audio), chunk_bytes):
+                if speed > 0:
+                    due = start + offset / BYTES_PER_SECOND / speed
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                await ws.send(audio[offset:offset + chunk_bytes])
+            eof_sent = time.perf_counter()
+            await ws.send(json.dumps({"type": "eof"}))
+            await ws.send(json.dumps({"type": "stats"}))
+            await asyncio.wait_for(done.wait(), timeout=30)
+        finally:
+            receiver.cancel()
+    return timings
+
+
+async def run_load(url: str, clips: list, sessions: int, chunk_ms: int,
+                   speed: float, hello: dict, latency_budget: float) -> dict:
+    """Run `sessions` concurrent clients and summarise the results."""
+    chunk_bytes = BYTES_PER_SECOND * chunk_ms // 1000
+    audio = [clips[i % len(clips)] for i in range(sessions)]
+
+    wall_start = time.perf_counter()
+    results = await asyncio.gather(
+        *(run_client(url, clip, chunk_bytes, speed, hello) for clip in audio),
+        return_exceptions=True)
+    wall = time.perf_counter() - wall_start
+
+    ok = [r for r in results if not isinstance(r, BaseException)]
+    errors = [repr(r) for r in results if isinstance(r, BaseException)]
+    audio_seconds = sum(len(clip) for clip in audio) / BYTES_PER_SECOND
+    decode = sum(r["decode_seconds"] for r in ok)
+    final_latency = percentiles([r["final_latency"] for r in ok
+                                 if r["final_latency"] is not None])
+
+    return {
+        "sessions": sessions,
+        "audio_seconds": round(audio_seconds, 3),
+        "wall_seconds": round(wall, 3),
+        "decode_seconds": round(decode, 3),
+        "rtf": round(decode / audio_seconds, 4) if audio_seconds else None,
+        "decode_per_session_s": round(decode / sessions, 4),
+        "first_partial": percentiles([r["first_partial"] for r in ok
+                                      if r["first_partial"] is not None]),
+        "final_latency": final_latency,
+        "finals": sum(r["finals"] for r in ok),
+        "errors": errors,
+        "sustainable": (not errors and bool(final_latency)
+                        and final_latency["p95"] <= latency_budget),
+    }
+
+
+async def benchmark(server: VoskServer, clips: list, session_counts: list,
+                    chunk_ms: int, speed: float, hello: dict,
+                    latency_budget: float) -> list:
+    server_task = asyncio.create_task(server.run())
+    url = f"ws://localhost:{server.port}"
+    try:
+        # Wait for the server to accept connections
+        for _ in range(100):
+            try:
+                async with websockets.connect(url):
+                    break
+            except OSError:
+                await asyncio.sleep(0.05)
+
+        runs = []
+        for sessions in session_counts:
+            run = await run_load(url, clips, sessions, chunk_ms, speed, hello,
+                                 latency_budget)
+            print(f"{sessions:>5} sessions: rtf={run['rtf']} "
+                  f"final p95={run['final_latency'].get('p95')}s "
+                  f"errors={len(run['errors'])}", file=sys.stderr)
+            runs.append(run)
+        return runs
+    finally:
+        server_task.cancel()
+        try:
+            await server_task
+        except asyncio.CancelledError:
+            pass
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Vosk server load benchmark")
+    parser.add_argument("--audio", type=Path, nargs="*", default=[],
+                        help="WAV or raw PCM files to replay (default: fixture)")
+    parser.add_argument("--sessions", type=str, default="1,2,4,8,16",
+                        help="Comma-separated concurrent session counts")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Playback speed; 1 = real time, 0 = unpaced")
+    parser.add_argument("--chunk-ms", type=int, default=100,
+                        help="Audio sent per websocket message (default: 100)")
+    parser.add_argument("--latency-budget", type=float, default=0.5,
+                        help="Max p95 final latency (s) for a sustainable run")
+    parser.add_argument("--partials", type=str, default="all",
+                        help="Partial policy requested in the hello")
+    parser.add_argument("--model", type=str, default=DEFAULT_MODEL)
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="vosk")
+    parser.add_argument("--fake-cost-ms", type=float, default=0.0,
+                        help="Decode time per chunk with --backend fake")
+    parser.add_argument("--decode-workers", type=int,
+                        default=vosk_server.DEFAULT_DECODE_WORKERS)
+    parser.add_argument("--vad", action="store_true")
+    parser.add_argument("--grammar", type=str, default="words")
+    parser.add_argument("--output", type=Path,
+                        help="Write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    logging.getLogger("vosk-server").setLevel(logging.WARNING)
+    clips = [load_audio(path) for path in args.audio] or [fixture_audio()]
+    session_counts = [int(n) for n in args.sessions.split(",")]
+
+    if args.backend == "fake":
+        backend, model_path = FakeBackend(chunk_cost_ms=args.fake_cost_ms), None
+    else:
+        backend, model_path = VoskBackend(), download_model(args.model)
+    server = VoskServer(model_path, free_port(), args.decode_workers,
+                        pool_size=max(session_counts), vad=args.vad,
+                        grammar_mode=args.grammar, backend=backend)
+    server.load()  # keep model loading out of the measurements
+    hello = {"partials": args.partials}
+
+    runs = asyncio.run(benchmark(server, clips, session_counts, args.chunk_ms,
+                                 args.speed, hello, args.latency_budget))
+    sustainable = [run["sessions"] for run in runs if run["sustainable"]]
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": git_commit(),
+        "config": {
+            "audio": [str(p) for p in args.audio] or ["fixture"],
+            "speed": args.speed,
+            "chunk_ms": args.chunk_ms,
+            "latency_budget": args.latency_budget,
+            "model": args.model if args.backend == "vosk" else None,
+            "backend": args.backend,
+            "fake_cost_ms": args.fake_cost_ms if args.backend == "fake" else None,
+            "decode_workers": args.decode_workers,
+            "vad": args.vad,
+            "grammar": args.grammar,
+            "partials": args.partials,
+        },
+        "runs": runs,
+        "max_sustainable_sessions": max(sustainable, default=0),
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+Capture tap: record what sessions sent and what they got back.
+
+With --capture-dir, every session's incoming audio and control messages,
+and the partial/final/command messages sent back, are written to segment
+files, so a reported misrecognition can be replayed (replay.py) against
+the same or a newer server.
+
+The tap is cheap on the event loop: record() only appends a reference to
+the received bytes to an in-memory queue. A background thread does the
+writing. The queue is bounded by bytes. If the disk can't keep up, new
+records are dropped (and counted) rather than buffered without limit or
+allowed to slow decoding down. A session that lost records gets a GAP
+record in its place, so a replay can tell it isn't exact.
+
+Segment format: a header, then records back to back.
+
+    header  b"VCAP" version:u8 length:u32 json
+            json = {"pid", "started" (epoch seconds), "segment"}
+    record  kind:u8 session:u32 t:f64 length:u32 payload
+
+`t` is seconds since the writer started (monotonic clock), the same
+origin in every segment of a writer. Payloads are the raw PCM for AUDIO,
+UTF-8 JSON for everything else. Segments rotate at `segment_bytes`; each
+new segment repeats the OPEN records of sessions still connected, so a
+segment can be read on its own.
+"""
+
+import json
+import logging
+import os
+import struct
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+log = logging.getLogger("vosk-server")
+
+MAGIC = b"VCAP"
+VERSION = 1
+HEADER = struct.Struct("<4sBI")
+RECORD = struct.Struct("<BIdI")
+SUFFIX = ".vcap"
+
+# Record kinds
+OPEN = 0      # session started: {"client", "token", "resumed"}
+AUDIO = 1     # binary message as received
+CONTROL = 2   # text message as received
+EVENT = 3     # message sent to the client
+CLOSE = 4     # session ended
+GAP = 5       # records dropped here: {"records", "bytes"}
+KIND_NAMES = {OPEN: "open", AUDIO: "audio", CONTROL: "control",
+              EVENT: "event", CLOSE: "close", GAP: "gap"}
+
+DEFAULT_SEGMENT_MB = 64
+DEFAULT_QUEUE_MB = 16
+
+
+class CaptureWriter:
+    """Writes capture records to rotating segment files on a thread."""
+
+    def __init__(self, directory, segment_bytes: int = DEFAULT_SEGMENT_MB << 20,
+                 max_queue_bytes: int = DEFAULT_QUEUE_MB << 20, keep: int = 0):
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.max_queue_bytes = max_queue_bytes
+        self.keep = keep  # newest segments to keep (0 = all)
+        self.recorded_bytes = 0
+        self.dropped_records = 0
+        self.dropped_bytes = 0
+        self.failed = False  # the disk gave out; nothing more is recorded
+        self.segments = []  # paths written by this writer, oldest first
+        self._queue = deque()
+        self._queued_bytes = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closing = False
+        self._next_session = 0
+        self._open = {}  # session -> OPEN payload, for new segments
+        self._gaps = {}  # session -> [records, bytes] dropped since last record
+        self._origin = time.monotonic()
+        self._started = time.time()
+        self._file = None
+        self._segment_number = 0
+        self._thread = None
+
+    def start(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="capture",
+                                        daemon=True)
+        self._thread.start()
+        log.info(f"Capturing sessions to {self.directory}")
+
+    def close(self):
+        """Write out what's queued and stop the thread."""
+        self._closing = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    # -- recording (event loop) ---------------------------------------
+
+    def open(self, **meta) -> int:
+        """Start a capture session; returns its id for the other calls."""
+        with self._lock:
+            session = self._next_session
+            self._next_session += 1
+        payload = json.dumps(meta).encode()
+        self._open[session] = payload
+        self.record(OPEN, session, payload, force=True)
+        return session
+
+    def audio(self, session: int, data: bytes):
+        self.record(AUDIO, session, data)
+
+    def control(self, session: int, text: str):
+        self.record(CONTROL, session, text.encode())
+
+    def event(self, session: int, message: str):
+        self.record(EVENT, session, message.encode())
+
+    def finish(self, session: int):
+        self._open.pop(session, None)
+        self.record(CLOSE, session, b"", force=True)
+
+    def record(self, kind: int, session: int, payload: bytes, force: bool = False):
+        """Queue one record without blocking. Dropped if the queue is full,
+        unless `force` (small bookkeeping records)."""
+        t = time.monotonic() - self._origin
+        size = len(payload)
+        with self._lock:
+            if self.failed:
+                return
+            if not force and self._queued_bytes + size > self.max_queue_bytes:
+                self.dropped_records += 1
+                self.dropped_bytes += size
+                gap = self._gaps.setdefault(session, [0, 0])
+                gap[0] += 1
+                gap[1] += size
+                return
+            was_empty = not self._queue
+            gap = self._gaps.pop(session, None)
+            if gap is not None:
+                self._queue.append((GAP, session, t, json.dumps(
+                    {"records": gap[0], "bytes": gap[1]}).encode()))
+            self._queue.append((kind, session, t, payload))
+            self._queued_bytes += size
+        if was_empty:
+            self._wake.set()
+
+    # -- writing (capture thread) -------------------------------------
+
+    def _run(self):
+        try:
+            while True:
+                self._wake.wait()
+                self._wake.clear()
+                while True:
+                    with self._lock:
+                        if not self._queue:
+                            break
+                        batch, self._queue = self._queue, deque()
+                    for kind, session, t, payload in batch:
+                        self._write(kind, session, t, payload)
+                    with self._lock:
+                        self._queued_bytes -= sum(len(r[3]) for r in batch)
+                if self._file is not None:
+                    self._file.flush()
+                if self._closing:
+                    break
+        except OSError as e:
+            log.error(f"Capture stopped: {e}")
+            with self._lock:
+                self.failed = True
+                self._queue.clear()
+                self._queued_bytes = 0
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _write(self, kind: int, session: int, t: float, payload: bytes):
+        if self._file is None or self._file.tell() >= self.segment_bytes:
+            self._rotate()
+        self._file.write(RECORD.pack(kind, session, t, len(payload)))
+        self._file.write(payload)
+        self.recorded_bytes += RECORD.size + len(payload)
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self._started))
+        number = self._segment_number
+        self._segment_number += 1
+        path = self.directory / (f"capture-{stamp}-{os.getpid()}-"
+                                 f"{number:04d}{SUFFIX}")
+        self._file = open(path, "wb", buffering=1 << 20)
+        header = json.dumps({"pid": os.getpid(), "started": self._started,
+                             "segment": number}).encode()
+        self._file.write(HEADER.pack(MAGIC, VERSION, len(header)) + header)
+        self.segments.append(path)
+        if number:
+            # Sessions that are still connected start again in this segment
+            t = time.monotonic() - self._origin
+            for session, payload in list(self._open.items()):
+                self._file.write(RECORD.pack(OPEN, session, t, len(payload)))
+                self._file.write(payload)
+        if self.keep:
+            while len(self.segments) > self.keep:
+                old = self.segments.pop(0)
+                try:
+                    old.unlink()
+                except OSError:
+                    pass
+
+
+def read_segment(path):
+    """Yield (kind, session, t, payload) records from one segment, with
+    session ids made unique across processes as "pid.session"."""
+    with open(path, "rb") as f:
+        magic, version, length = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: not a capture segment")
+        header = json.loads(f.read(length))
+        pid = header["pid"]
+        while True:
+            head = f.read(RECORD.size)
+            if len(head) < RECORD.size:
+                break  # end, or a record cut off by a crash
+            kind, session, t, size = RECORD.unpack(head)
+            payload = f.read(size)
+            if len(payload) < size:
+                break
+            yield kind, f"{pid}.{session}", t, payload
+
+
+def capture_files(paths) -> list:
+    """Segment files named by `paths` (files or directories), in order."""
+    files = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.glob(f"*{SUFFIX}")) if path.is_dir() else [path])
+    return files
+
+
+def read_capture(paths) -> dict:
+    """Group the records of some segments by session.
+
+    Returns {session id: {"meta": OPEN payload, "records": [(kind, t,
+    payload), ...], "gaps": dropped record count, "closed": bool}},
+    sessions in the order they started.
+    """
+    sessions = {}
+    for path in capture_files(paths):
+        for kind, session, t, payload in read_segment(path):
+            entry = sessions.get(session)
+            if kind == OPEN:
+                if entry is None:
+                    sessions[session] = {"meta": json.loads(payload),
+                                         "start": t, "records": [],
+                                         "gaps": 0, "closed": False}
+                continue  # repeated at the start of each segment
+            if entry is None:
+                # Started in a segment that wasn't given (or was deleted)
+                entry = sessions[session] = {"meta": {}, "start": t, "records": [],
+                                             "gaps": 0, "closed": False}
+            if kind == GAP:
+                entry["gaps"] += json.loads(payload)["records"]
+            elif kind == CLOSE:
+                entry["closed"] = True
+            else:
+                entry["records"].append((kind, t, payload))
+    return sessions
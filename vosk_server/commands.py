@@ -0,0 +1,108 @@
+"""
+Canonical voice command catalog.
+
+Mirrors CommandMatcher in lib/features/voice/domain/command_matcher.dart
+(and the tables in COMMANDS.md). Keep the three in sync when adding
+commands.
+"""
+
+# Commands without arguments: canonical command -> phrase variations
+COMMAND_PHRASES = {
+    # Inbox Navigation
+    "show_inbox": ["show inbox", "show my inbox", "open inbox", "go to inbox", "inbox"],
+    "show_unread": ["show unread", "unread emails", "new emails", "unread", "show unread emails"],
+    "show_sent": ["show sent", "sent mail", "sent emails", "sent folder"],
+    "show_drafts": ["show drafts", "my drafts", "drafts"],
+    "show_starred": ["show starred", "starred emails", "starred"],
+    "show_spam": ["show spam", "spam folder", "spam"],
+    "show_trash": ["show trash", "trash", "deleted emails", "trash folder"],
+    "check_inbox": ["check inbox", "how many emails", "email count", "check email"],
+    "refresh": ["refresh", "refresh inbox", "check for new", "reload"],
+
+    # Email Reading (without number - uses "current" or "this")
+    "next_email": ["next", "next email", "next one", "show next"],
+    "previous_email": ["previous", "previous email", "go back", "last one", "back"],
+    "first_email": ["first email", "go to first", "first"],
+    "last_email": ["last email", "go to last", "last"],
+
+    # Email Actions (on current email)
+    "delete": ["delete", "delete this", "delete email", "trash this", "trash it", "delete it"],
+    "archive": ["archive", "archive this", "archive email", "done with this", "archive it"],
+    "mark_read": ["mark read", "mark as read"],
+    "mark_unread": ["mark unread", "mark as unread"],
+    "star": ["star", "star this", "star email", "star it"],
+    "unstar": ["unstar", "unstar this", "remove star"],
+
+    # Labels
+    "show_labels": ["show labels", "list labels", "my labels"],
+
+    # Composing
+    "compose": ["compose", "new email", "write email", "compose email"],
+    "reply": ["reply", "reply to this", "respond"],
+    "reply_all": ["reply all", "reply to all"],
+    "forward": ["forward", "forward this", "forward email"],
+
+    # Draft actions
+    "send": ["send", "send it", "send email", "send draft"],
+    "cancel_draft": ["cancel", "cancel email", "discard", "nevermind", "cancel draft"],
+    "show_draft": ["show draft", "read draft", "what did i write"],
+
+    # Attachments
+    "open_attachment": ["open attachment", "show attachment", "view attachment", "open the attachment"],
+    "open_pdf": ["open pdf", "show pdf", "view pdf", "open the pdf"],
+
+    # PDF Viewer
+    "scroll_down": ["scroll down", "down", "go down"],
+    "scroll_up": ["scroll up", "up", "go up"],
+    "next_page": ["next page", "page down"],
+    "previous_page": ["previous page", "page up"],
+    "first_page": ["first page", "go to start", "beginning"],
+    "last_page": ["last page", "go to end", "end"],
+    "zoom_in": ["zoom in", "bigger"],
+    "zoom_out": ["zoom out", "smaller"],
+    "close": ["close", "close pdf", "back", "exit"],
+
+    # Contacts
+    "show_contacts": ["show contacts", "list contacts", "my contacts"],
+    "save_sender": ["save sender", "add sender to contacts", "save this sender"],
+
+    # Pagination
+    "more": ["more", "show more", "more emails", "load more"],
+
+    # System
+    "stop": ["stop", "stop listening"],
+    "help": ["help", "what can i say"],
+    "list_commands": ["list commands", "list all commands", "commands", "all commands", "what commands"],
+    "repeat": ["repeat", "say again", "what"],
+}
+
+# Commands followed by a number slot ("open email 3")
+NUMBER_PATTERNS = {
+    "open_email": ["open email", "read email", "show email", "email"],
+    "delete_email": ["delete email", "trash email", "delete"],
+    "archive_email": ["archive email", "archive"],
+    "open_attachment_n": ["open attachment", "attachment"],
+    "page": ["page", "go to page", "page number"],
+}
+
+# Commands followed by free text ("label important")
+TEXT_PATTERNS = {
+    "label": ["label", "label this", "add label"],
+    "remove_label": ["remove label", "unlabel"],
+    "show_label": ["show label", "open label"],
+    "search": ["search", "find", "search for"],
+    "from": ["from", "emails from", "show from"],
+    "email_to": ["email", "send email to", "write to"],
+    "find_contact": ["find contact", "search contact"],
+    "message": ["message", "body", "say"],
+    "continue_message": ["continue", "add", "also say"],
+    "subject": ["subject", "subject is"],
+}
+
+# Spelled-out numbers the grammar can emit in a number slot
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+    "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14,
+    "fifteen": 15, "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50,
+}
@@ -0,0 +1,444 @@
+"""
+Learned corrections, shared by every client.
+
+The app's CorrectionLearner learns that a mishearing stands for a command
+("delayed amen" -> "delete email"), but on one device only, and finds a
+correction by fuzzy-comparing the transcript with every stored one. This
+store does the same on the server: a correction learned from any client
+applies to all of them, and a lookup doesn't scan the store.
+
+Entries are indexed by what was heard:
+
+    exact     the normalized text -> its correction
+    phonetic  a sound-alike key of the text (see phonetic_key) -> entries,
+              plus a BK-tree over the keys to find keys a small edit
+              distance away
+
+A lookup tries the exact text, then the phonetic key, then the BK-tree,
+which only descends into branches that can hold a close enough key. It
+visits a small part of the tree however many corrections there are.
+
+Given the server's CommandResolver, the store never touches a valid
+command: text that is a catalog phrase or resolves to a command is left
+alone, and a sound-alike match only counts if no catalog phrase sounds at
+least as close. After learning "zoom it" -> "zoom in", "zoom out" (same
+key) still means zoom out.
+
+The store is a JSON-lines journal, appended to on every change:
+
+    {"learn": "delayed amen", "text": "delete email", "t": 1760000000.0}
+    {"forget": "delayed amen", "t": 1760000100.0}
+
+and compacted when it's loaded. Pre-fork workers share the file: each
+appends its own changes and picks up the others' with refresh(), which
+reads whatever was appended since it last looked.
+
+The server calls the store from its decode threads (lookups, and the
+journal reads and writes), so every public method takes the store's lock.
+"""
+
+import difflib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+from vocabulary import WAKE_WORDS
+
+DEFAULT_MAX_DISTANCE = 1
+REFRESH_INTERVAL = 1.0
+
+VOWELS = set("aeiou")
+# Consonants Kaldi confuses with their voiced/unvoiced partner share a code
+CODES = {"b": "p", "d": "t", "g": "k", "q": "k", "v": "f", "z": "s"}
+# Silent or simplified starts ("knock", "write", "psst", "xerox", "what")
+INITIAL = (("kn", "n"), ("gn", "n"), ("pn", "n"), ("wr", "r"),
+           ("ps", "s"), ("x", "s"), ("wh", "w"))
+
+
+def normalize(text: str) -> str:
+    """Lowercase, without punctuation, extra spaces or leading wake words."""
+    words = re.sub(r"[^\w\s']", "", text.lower()).split()
+    while words and words[0] in WAKE_WORDS:
+        words.pop(0)
+    return " ".join(words)
+
+
+def word_key(word: str) -> str:
+    """Consonant skeleton of a word, in the spirit of Metaphone.
+
+    Vowels are dropped except a leading one (as "a"), digraphs are folded
+    ("ph" -> "f", "ch"/"sh" -> "x", "th" -> "0"), voiced and unvoiced
+    consonants share a code and repeats collapse. "delete" and "delayed"
+    are both "tlt".
+    """
+    w = re.sub(r"[^a-z]", "", word)
+    if not w:
+        return word  # digits
+    for prefix, replacement in INITIAL:
+        if w.startswith(prefix):
+            w = replacement + w[len(prefix):]
+            break
+    out = []
+    i, n = 0, len(w)
+    while i < n:
+        c = w[i]
+        after = w[i + 1] if i + 1 < n else ""
+        if c in VOWELS:
+            code = "a" if i == 0 else ""
+        elif c == "c":
+            if after == "h":
+                code, i = "x", i + 1
+            else:
+                code = "s" if after in ("e", "i", "y") else "k"
+        elif c == "g" and after == "h":
+            code, i = ("k" if i == 0 else ""), i + 1  # "ghost", "night"
+        elif c == "g" and after in ("e", "i", "y"):
+            code = "j"
+        elif c in ("s", "t") and after == "h":
+            code, i = ("x" if c == "s" else "0"), i + 1
+        elif c == "p" and after == "h":
+            code, i = "f", i + 1
+        elif c in ("s", "t") and w[i + 1:i + 3] in ("io", "ia"):
+            code = "x"  # "session", "action"
+        elif c == "k" and i and w[i - 1] == "c":
+            code = ""
+        elif c in ("h", "w", "y"):
+            code = c if i == 0 and after in VOWELS else ""
+        elif c == "x":
+            code = "ks"
+        else:
+            code = CODES.get(c, c)
+        for ch in code:
+            if not out or out[-1] != ch:
+                out.append(ch)
+        i += 1
+    return "".join(out)
+
+
+def phonetic_key(text: str) -> str:
+    """Key of a normalized phrase. Word boundaries are left out, since
+    Kaldi often splits or merges words ("in box" / "inbox")."""
+    return "".join(word_key(word) for word in text.split())
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance."""
+    return _Pattern(a).distance(b)
+
+
+class _Pattern:
+    """A string prepared for computing its edit distance to many others
+    with Myers' bit-vector algorithm: one pass over the other string, a
+    few integer operations per character."""
+
+    __slots__ = ("length", "masks", "mask", "last")
+
+    def __init__(self, text: str):
+        self.length = len(text)
+        self.masks = {}  # char -> bit set of its positions in text
+        for i, c in enumerate(text):
+            self.masks[c] = self.masks.get(c, 0) | (1 << i)
+        self.mask = (1 << self.length) - 1
+        self.last = 1 << (self.length - 1) if text else 0
+
+    def distance(self, other: str) -> int:
+        if not self.length:
+            return len(other)
+        mask, last, masks = self.mask, self.last, self.masks
+        plus, minus, score = mask, 0, self.length
+        for c in other:
+            eq = masks.get(c, 0)
+            xv = eq | minus
+            xh = (((eq & plus) + plus) ^ plus) | eq
+            ph = minus | (~(xh | plus) & mask)
+            mh = plus & xh
+            if ph & last:
+                score += 1
+            elif mh & last:
+                score -= 1
+            ph = ((ph << 1) | 1) & mask
+            mh = (mh << 1) & mask
+            plus = mh | (~(xv | ph) & mask)
+            minus = ph & xv
+        return score
+
+
+class BKTree:
+    """Metric tree over strings under edit distance.
+
+    A node's children are keyed by their distance to it, so a search for
+    keys within `radius` of a query only follows children whose distance
+    to the node is within `radius` of the query's (triangle inequality).
+    Keys are never removed; the store skips keys without entries and
+    rebuilds the tree when too many pile up.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, key: str):
+        if self.root is None:
+            self.root = (key, {})
+            self.size = 1
+            return
+        node = self.root
+        pattern = _Pattern(key)
+        while True:
+            distance = pattern.distance(node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = (key, {})
+                self.size += 1
+                return
+            node = child
+
+    def search(self, key: str, radius: int) -> list:
+        """(distance, key) for every key within `radius` of `key`."""
+        found = []
+        pattern = _Pattern(key)
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node_key, children = stack.pop()
+            distance = pattern.distance(node_key)
+            if distance <= radius:
+                found.append((distance, node_key))
+            for d, child in children.items():
+                if distance - radius <= d <= distance + radius:
+                    stack.append(child)
+        return found
+
+
+class CorrectionStore:
+    """Heard phrase -> correction, persisted in a journal file (or only in
+    memory if `path` is None).
+
+    `resolver` (a CommandResolver) is the command catalog to protect.
+    """
+
+    def __init__(self, path: Path = None,
+                 max_distance: int = DEFAULT_MAX_DISTANCE, resolver=None):
+        self.path = Path(path) if path is not None else None
+        self.max_distance = max_distance
+        self.resolver = resolver
+        self._catalog = set()          # normalized command phrases
+        self._catalog_tree = BKTree()  # and their phonetic keys
+        for phrase in (resolver.phrases if resolver is not None else ()):
+            phrase = normalize(phrase)
+            if phrase:
+                self._catalog.add(phrase)
+                self._catalog_tree.add(phonetic_key(phrase))
+        self.corrections = {}   # heard -> text
+        self._keys = {}         # phonetic key -> set of heard
+        self._targets = {}      # text -> number of entries correcting to it
+        self._tree = BKTree()
+        self._offset = 0        # journal bytes applied so far
+        self._inode = None
+        self._lock = threading.Lock()
+        self.journal_lines = 0
+
+    def __len__(self):
+        return len(self.corrections)
+
+    def load(self):
+        """Read the journal, then rewrite it as one line per entry."""
+        with self._lock:
+            self._reset()
+            if self.path is None or not self.path.exists():
+                return
+            self._refresh()
+            if self.journal_lines > 2 * len(self.corrections):
+                self._compact()
+
+    def refresh(self) -> int:
+        """Apply changes other processes appended to the journal; returns
+        how many lines were read."""
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self) -> int:
+        if self.path is None:
+            return 0
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return 0
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            # Replaced or truncated: start over
+            self._reset()
+            self._inode = stat.st_ino
+        if stat.st_size == self._offset:
+            return 0
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # a line still being written waits
+        self._offset += end
+        lines = data[:end].splitlines()
+        for line in lines:
+            self._replay(line)
+        self.journal_lines += len(lines)
+        return len(lines)
+
+    def learn(self, heard: str, text: str) -> tuple:
+        """Correct `heard` to `text` from now on; returns both normalized.
+
+        Raises ValueError if either is empty, they're the same, or `heard`
+        is already a command.
+        """
+        heard, text = normalize(heard), normalize(text)
+        if not heard or not text:
+            raise ValueError("learn needs a non-empty 'heard' and 'text'")
+        if heard == text:
+            raise ValueError("'heard' and 'text' are the same")
+        if self.is_command(heard):
+            raise ValueError(f"'{heard}' is already a command")
+        with self._lock:
+            self._append({"learn": heard, "text": text})
+            self._add(heard, text)
+        return heard, text
+
+    def forget(self, heard: str) -> bool:
+        """Drop the correction for `heard`; False if there was none."""
+        heard = normalize(heard)
+        with self._lock:
+            if heard not in self.corrections:
+                return False
+            self._append({"forget": heard})
+            self._remove(heard)
+        return True
+
+    def is_command(self, text: str) -> bool:
+        """True if a normalized phrase is in the catalog or resolves to a
+        command as it is."""
+        return text in self._catalog or (
+            self.resolver is not None and self.resolver.resolve(text) is not None)
+
+    def lookup(self, text: str):
+        """Find the correction for a normalized phrase.
+
+        Returns (correction, heard, how) with how one of "exact",
+        "phonetic" or "near", or None. Phrases known to be right are never
+        corrected: commands, and what some entry corrects to.
+        """
+        with self._lock:
+            return self._lookup(text)
+
+    def _lookup(self, text: str):
+        if not text or text in self._targets or self.is_command(text):
+            return None
+        if text in self.corrections:
+            return self.corrections[text], text, "exact"
+        key = phonetic_key(text)
+        if key in self._keys:
+            if self._catalog_tree.search(key, 0):
+                return None  # sounds just like a command too
+            heard = self._closest(text, self._keys[key])
+            return self.corrections[heard], heard, "phonetic"
+        radius = min(self.max_distance, len(key) // 4)
+        if radius < 1:
+            return None
+        hits = [(distance, hit) for distance, hit in self._tree.search(key, radius)
+                if hit in self._keys]
+        if not hits:
+            return None
+        nearest = min(distance for distance, _ in hits)
+        if self._catalog_tree.search(key, nearest):
+            return None  # a command is at least as close
+        heard = self._closest(text, set().union(
+            *(self._keys[hit] for distance, hit in hits if distance == nearest)))
+        return self.corrections[heard], heard, "near"
+
+    def correct(self, text: str):
+        """Apply a correction to a final transcript, keeping any wake word
+        in front. Returns (corrected text, how) or None."""
+        phrase = normalize(text)
+        found = self.lookup(phrase)
+        if found is None:
+            return None
+        correction, _, how = found
+        words = text.lower().split()
+        prefix = []
+        while words and words[0] in WAKE_WORDS:
+            prefix.append(words.pop(0))
+        return " ".join(prefix + [correction]), how
+
+    @staticmethod
+    def _closest(text: str, candidates) -> str:
+        """The candidate spelled most like `text` (ties: alphabetical)."""
+        return max(sorted(candidates), key=lambda heard: difflib.SequenceMatcher(
+            None, text, heard).ratio())
+
+    def _reset(self):
+        self.corrections = {}
+        self._keys = {}
+        self._targets = {}
+        self._tree = BKTree()
+        self._offset = 0
+        self._inode = None
+        self.journal_lines = 0
+
+    def _add(self, heard: str, text: str):
+        if heard in self.corrections:
+            self._remove(heard)
+        self.corrections[heard] = text
+        self._targets[text] = self._targets.get(text, 0) + 1
+        key = phonetic_key(heard)
+        if key not in self._keys:
+            self._keys[key] = set()
+            self._tree.add(key)
+        self._keys[key].add(heard)
+
+    def _remove(self, heard: str):
+        text = self.corrections.pop(heard)
+        self._targets[text] -= 1
+        if not self._targets[text]:
+            del self._targets[text]
+        key = phonetic_key(heard)
+        self._keys[key].discard(heard)
+        if not self._keys[key]:
+            del self._keys[key]
+            if self._tree.size > 2 * len(self._keys) + 64:
+                self._rebuild_tree()
+
+    def _rebuild_tree(self):
+        self._tree = BKTree()
+        for key in self._keys:
+            self._tree.add(key)
+
+    def _replay(self, line: bytes):
+        try:
+            entry = json.loads(line)
+            if "learn" in entry:
+                self._add(entry["learn"], entry["text"])
+            elif entry.get("forget") in self.corrections:
+                self._remove(entry["forget"])
+        except (ValueError, TypeError, KeyError, AttributeError):
+            pass  # a damaged line loses that one change
+
+    def _append(self, entry: dict):
+        if self.path is None:
+            return
+        entry["t"] = round(time.time(), 3)
+        line = (json.dumps(entry) + "\n").encode()
+        # One write on an O_APPEND descriptor, so workers' lines don't mix
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def _compact(self):
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w") as f:
+            for heard, text in self.corrections.items():
+                f.write(json.dumps({"learn": heard, "text": text}) + "\n")
+        os.replace(tmp, self.path)
+        stat = self.path.stat()
+        self._inode, self._offset = stat.st_ino, stat.st_size
+        self.journal_lines = len(self.corrections)
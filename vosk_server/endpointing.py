@@ -0,0 +1,101 @@
+"""
+Server-side endpointing.
+
+Kaldi only ends an utterance inside AcceptWaveform once its own endpointer
+sees enough trailing silence. Otherwise the client has to send an eof.
+An Endpointer watches a session's partial results and forces the final
+earlier:
+
+- silence_ms: the partial hasn't changed for this much audio. Kaldi emits
+  no new words during silence, so this acts as a trailing-silence threshold
+- command_ms: the partial is already a complete command (see
+  CommandResolver.is_complete) and has been stable for this much audio.
+  This is normally much shorter than silence_ms, so "jarvis next" fires
+  as soon as the speaker stops
+
+Both are measured in audio time, so network jitter doesn't move them.
+0 turns a rule off.
+
+For every final, the endpointer also measures the latency from the end of
+speech (the moment the partial last changed, in wall time) to the final.
+"""
+
+import time
+
+TUNABLE = {
+    "silence_ms": int,
+    "command_ms": int,
+}
+
+# Why an utterance ended, reported with each final
+KALDI = "kaldi"        # Kaldi's own endpointer
+SILENCE = "silence"    # silence_ms rule
+COMMAND = "command"    # command_ms rule
+VAD = "vad"            # end of a VAD speech region
+EOF = "eof"            # client sent {"type": "eof"}
+TIMEOUT = "timeout"    # wake-mode idle timeout
+
+
+class Endpointer:
+    """Decide when to force a final for one session."""
+
+    def __init__(self, silence_ms: int = 0, command_ms: int = 0,
+                 is_complete=None):
+        self.silence_ms = silence_ms
+        self.command_ms = command_ms
+        self.is_complete = is_complete  # callable(text) -> bool
+        self.reset()
+
+    def configure(self, **settings) -> dict:
+        """Apply tunable settings and return the current configuration.
+
+        Raises ValueError for unknown or negative settings.
+        """
+        for key, value in settings.items():
+            if key not in TUNABLE:
+                raise ValueError(f"Unknown endpoint setting: {key}")
+            if TUNABLE[key](value) < 0:
+                raise ValueError(f"{key} must not be negative")
+        for key, value in settings.items():
+            setattr(self, key, TUNABLE[key](value))
+        return self.config()
+
+    def config(self) -> dict:
+        return {key: getattr(self, key) for key in TUNABLE}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.silence_ms or self.command_ms)
+
+    def reset(self):
+        """Start a new utterance."""
+        self.text = ""
+        self._changed_audio_ms = 0.0
+        self._changed_at = None  # wall time the partial last changed
+
+    def update(self, text: str, audio_ms: float):
+        """Track a new partial at stream position audio_ms.
+
+        Returns the reason to force a final now (SILENCE or COMMAND), or
+        None to keep decoding.
+        """
+        if text != self.text:
+            self.text = text
+            self._changed_audio_ms = audio_ms
+            self._changed_at = time.monotonic()
+            return None
+        if not text:
+            return None
+        stable_ms = audio_ms - self._changed_audio_ms
+        if (self.command_ms and stable_ms >= self.command_ms
+                and self.is_complete is not None and self.is_complete(text)):
+            return COMMAND
+        if self.silence_ms and stable_ms >= self.silence_ms:
+            return SILENCE
+        return None
+
+    def latency_ms(self):
+        """Wall time since the partial last changed, or None if unknown."""
+        if self._changed_at is None:
+            return None
+        return round((time.monotonic() - self._changed_at) * 1000)
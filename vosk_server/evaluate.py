@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+A/B evaluation of grammar and vocabulary variants.
+
+Decodes a labelled corpus of command utterances under two (or more)
+grammar variants and reports, for each:
+
+    wer             word error rate over the whole corpus
+    exact_match     share of utterances transcribed exactly
+    command_match   share whose transcript resolves to the same command
+                    (and arguments) as the expected text
+    rtf             decode seconds per second of audio
+    build_seconds   time to compile the grammar into a recognizer
+    recognizer_mb   resident memory added by building the recognizer
+    peak_rss_mb     peak resident memory of the decoding process
+
+Each variant is decoded in a fresh process, so the memory figures aren't
+mixed up with each other.
+
+Usage:
+    python evaluate.py corpus.jsonl words phrases
+    python evaluate.py corpus.tsv words new_vocabulary.json --output ab.json
+
+A corpus is JSONL ({"audio": "a.wav", "text": "jarvis delete"}) or
+tab-separated "audio<TAB>text" lines. Audio paths are relative to the
+corpus file. A variant is a grammar mode ("words" or "phrases"), a
+grammar JSON file (a list, e.g. from `grammar.py dump`), a JSON or YAML
+vocabulary data file (see vocab_reload.py) whose words are added to the
+"words" grammar, or "free" for the model's full, unconstrained vocabulary.
+"""
+
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from batch import SAMPLE_RATE, transcribe
+from intents import CommandResolver
+
+try:
+    import resource
+except ImportError:     # Windows
+    resource = None
+
+FREE = "free"
+
+
+def load_corpus(path: Path) -> list:
+    """[(audio path, expected text)] from a JSONL or TSV corpus file."""
+    corpus = []
+    for number, line in enumerate(path.read_text().splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            entry = json.loads(line)
+            audio, text = entry["audio"], entry["text"]
+        else:
+            audio, sep, text = line.partition("\t")
+            if not sep:
+                raise ValueError(f"{path.name}:{number}: expected audio<TAB>text")
+        audio = Path(audio)
+        corpus.append((audio if audio.is_absolute() else path.parent / audio, text))
+    return corpus
+
+
+def normalize(text: str) -> list:
+    """Lowercased words without punctuation."""
+    words = (w.strip(".,!?;:\"'").lower() for w in text.split())
+    return [w for w in words if w]
+
+
+def word_errors(reference: list, hypothesis: list) -> int:
+    """Substitutions + deletions + insertions (word-level Levenshtein)."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1,          # deletion
+                               current[j - 1] + 1,       # insertion
+                               previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1]
+
+
+def load_variant(spec: str):
+    """The grammar JSON string for a variant spec, or None for FREE."""
+    from grammar import GRAMMAR_MODES, get_grammar
+    if spec == FREE:
+        return None
+    if spec in GRAMMAR_MODES:
+        return get_grammar(spec)
+    from vocab_reload import merge_vocabulary, read_vocabulary_file
+    path = Path(spec)
+    if path.suffix.lower() not in (".yaml", ".yml"):
+        data = json.loads(path.read_text())
+        if isinstance(data, list):
+            return json.dumps(data)
+    words, _ = merge_vocabulary(read_vocabulary_file(path))
+    return json.dumps(words + ["[unk]"])
+
+
+def _rss_mb() -> float:
+    """Current resident set size (Linux; 0 elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return 0.0
+    return pages * resource.getpagesize() / 2**20
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of this process (Unix; 0 elsewhere)."""
+    if resource is None:
+        return 0.0
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    scale = 2**20 if sys.platform == "darwin" else 2**10
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def decode_variant(model_path: str, grammar, corpus: list) -> dict:
+    """Decode the corpus with one grammar. Runs in its own process."""
+    from vosk import KaldiRecognizer, Model, SetLogLevel
+    SetLogLevel(-1)
+    model = Model(model_path)
+
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    if grammar is None:
+        recognizer = KaldiRecognizer(model, SAMPLE_RATE)
+    else:
+        recognizer = KaldiRecognizer(model, SAMPLE_RATE, grammar)
+    build_seconds = time.perf_counter() - start
+    recognizer_mb = _rss_mb() - rss_before
+
+    transcripts = []
+    audio_seconds = decode_seconds = 0.0
+    for audio, _ in corpus:
+        record = transcribe(recognizer, audio)
+        transcripts.append(record["text"])
+        audio_seconds += record["audio_seconds"]
+        decode_seconds += record["decode_seconds"]
+
+    return {
+        "transcripts": transcripts,
+        "audio_seconds": audio_seconds,
+        "decode_seconds": decode_seconds,
+        "build_seconds": build_seconds,
+        "recognizer_mb": recognizer_mb,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def score(corpus: list, transcripts: list, resolver: CommandResolver) -> dict:
+    """Accuracy of transcripts against the corpus's expected texts."""
+    errors = words = exact = commands = 0
+    for (_, expected), got in zip(corpus, transcripts):
+        reference, hypothesis = normalize(expected), normalize(got)
+        errors += word_errors(reference, hypothesis)
+        words += len(reference)
+        exact += reference == hypothesis
+        want = resolver.resolve(" ".join(reference))
+        have = resolver.resolve(" ".join(hypothesis))
+        if want is None:
+            commands += reference == hypothesis
+        else:
+            commands += (have is not None and
+                         (have["command"], have["args"]) == (want["command"], want["args"]))
+    n = len(corpus)
+    return {
+        "utterances": n,
+        "wer": round(errors / words, 4) if words else 0.0,
+        "exact_match": round(exact / n, 4) if n else 0.0,
+        "command_match": round(commands / n, 4) if n else 0.0,
+    }
+
+
+def evaluate(model_path: Path, corpus: list, specs: list) -> list:
+    """Decode and score the corpus under each variant."""
+    resolver = CommandResolver()
+    report = []
+    for spec in specs:
+        grammar = load_variant(spec)
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            run = pool.submit(decode_variant, str(model_path), grammar, corpus).result()
+        result = {"variant": spec,
+                  "grammar_entries": len(json.loads(grammar)) if grammar else None}
+        result.update(score(corpus, run["transcripts"], resolver))
+        audio = run["audio_seconds"]
+        result.update({
+            "rtf": round(run["decode_seconds"] / audio, 4) if audio else None,
+            "build_seconds": round(run["build_seconds"], 3),
+            "recognizer_mb": round(run["recognizer_mb"], 1),
+            "peak_rss_mb": round(run["peak_rss_mb"], 1),
+        })
+        result["errors"] = [
+            {"audio": str(audio), "expected": expected, "got": got}
+            for (audio, expected), got in zip(corpus, run["transcripts"])
+            if normalize(expected) != normalize(got)]
+        report.append(result)
+    return report
+
+
+COLUMNS = ("wer", "exact_match", "command_match", "rtf", "build_seconds",
+           "recognizer_mb", "peak_rss_mb")
+
+
+def format_table(report: list) -> str:
+    width = max(len(r["variant"]) for r in report)
+    lines = [f"{'variant':<{width}}  " + "  ".join(f"{c:>13}" for c in COLUMNS)]
+    for r in report:
+        lines.append(f"{r['variant']:<{width}}  " +
+                     "  ".join(f"{str(r[c]):>13}" for c in COLUMNS))
+    return "\n".join(lines)
+
+
+def main():
+    import argparse
+
+    from server import DEFAULT_MODEL, download_model
+
+    parser = argparse.ArgumentParser(description="Compare grammar variants on a corpus")
+    parser.add_argument("corpus", type=Path, help="JSONL or TSV corpus file")
+    parser.add_argument("variants", nargs="+",
+                        help="Grammar modes, grammar/vocabulary JSON files or 'free'")
+    parser.add_argument("--model", type=str, default=DEFAULT_MODEL)
+    parser.add_argument("--output", type=Path,
+                        help="Also write the full report (with errors) as JSON")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        print(f"No utterances in {args.corpus}", file=sys.stderr)
+        return 1
+    report = evaluate(download_model(args.model), corpus, args.variants)
+    print(format_table(report))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Fixed-size audio framing.
+
+The `record` package delivers PCM in whatever chunk size the platform
+likes, from a few ms to hundreds of ms. FrameBuffer re-frames that byte
+stream into fixed frames (e.g. 100 ms), so decode calls happen at a steady
+cadence regardless of the client.
+
+Incoming bytes are copied once into a preallocated ring buffer, and frames
+are handed out as memoryviews into that ring. No per-chunk concatenation
+takes place. The ring's capacity is a multiple of the frame size and reads
+always start on a frame boundary, so a frame never wraps around the end of
+the buffer. Odd bytes (an int16 sample split across two chunks) simply
+stay in the ring until the rest of the sample arrives.
+"""
+
+BYTES_PER_SAMPLE = 2
+
+
+def frame_bytes_for(frame_ms: int, sample_rate: int = 16000) -> int:
+    """Size in bytes of a frame_ms frame of 16-bit mono PCM."""
+    return sample_rate * frame_ms // 1000 * BYTES_PER_SAMPLE
+
+
+class FrameBuffer:
+    """Ring buffer that turns arbitrary chunks into fixed-size frames."""
+
+    def __init__(self, frame_bytes: int, capacity_frames: int = 16):
+        if frame_bytes <= 0 or frame_bytes % BYTES_PER_SAMPLE:
+            raise ValueError("frame_bytes must be a positive whole number of samples")
+        self.frame_bytes = frame_bytes
+        self._buf = bytearray(frame_bytes * max(2, capacity_frames))
+        self._view = memoryview(self._buf)
+        self._read = 0   # start of unread data, always frame-aligned
+        self._size = 0   # bytes of unread data
+
+    @property
+    def capacity(self) -> int:
+        return len(self._buf)
+
+    @property
+    def buffered(self) -> int:
+        """Bytes waiting for a frame to fill up."""
+        return self._size
+
+    def clear(self):
+        self._read = 0
+        self._size = 0
+
+    def push(self, data) -> list:
+        """Add a chunk and return the complete frames now available.
+
+        Frames are memoryviews into the ring and are only valid until the
+        next call to push() or clear().
+        """
+        src = memoryview(data).cast("B")
+        n = len(src)
+        if self._size + n > self.capacity:
+            self._grow(self._size + n)
+
+        # Copy into the ring, in at most two pieces
+        write = (self._read + self._size) % self.capacity
+        first = min(n, self.capacity - write)
+        self._view[write:write + first] = src[:first]
+        if first < n:
+            self._view[:n - first] = src[first:]
+        self._size += n
+
+        frames = []
+        while self._size >= self.frame_bytes:
+            frames.append(self._view[self._read:self._read + self.frame_bytes])
+            self._read = (self._read + self.frame_bytes) % self.capacity
+            self._size -= self.frame_bytes
+        return frames
+
+    def _grow(self, needed: int):
+        """Enlarge the ring (rare: only for chunks bigger than the ring)."""
+        frames = -(-needed // self.frame_bytes) + 1
+        buf = bytearray(frames * self.frame_bytes)
+        # Unread data may wrap; lay it out from the start of the new ring
+        end = self._read + self._size
+        if end <= self.capacity:
+            buf[:self._size] = self._view[self._read:end]
+        else:
+            head = self.capacity - self._read
+            buf[:head] = self._view[self._read:]
+            buf[head:self._size] = self._view[:end - self.capacity]
+        self._buf = buf
+        self._view = memoryview(buf)
+        self._read = 0
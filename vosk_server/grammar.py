@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Phrase-level grammar builder.
+
+get_grammar_string() in vocabulary.py lets Kaldi consider any sequence of
+vocabulary words, including nonsense like "zoom trash the eleven". This
+module builds a grammar from the command catalog in commands.py instead:
+every command phrase, every number command expanded with each number word,
+the prefixes of free-text commands, and the wake word. Kaldi then only
+considers sequences of whole phrases. That shrinks the search space and
+lets endpointing finalize as soon as a complete phrase is heard.
+
+Free-text arguments ("search <query>") come out as [unk].
+
+Usage:
+    python grammar.py dump [--mode phrases] [--context pdf]
+    python grammar.py diff OLD [NEW] [--context pdf]
+
+OLD and NEW are grammar JSON files (e.g. an earlier dump) or a mode name
+("words" or "phrases"). NEW defaults to the current phrase grammar.
+"""
+
+import functools
+import json
+import sys
+from pathlib import Path
+
+from commands import COMMAND_PHRASES, NUMBER_PATTERNS, NUMBER_WORDS, TEXT_PATTERNS
+from vocabulary import CONTEXTS, VOCABULARY, WAKE_WORDS, get_grammar_string
+
+WORDS_MODE = "words"
+PHRASES_MODE = "phrases"
+
+
+def catalog_phrases() -> list:
+    """Every phrase the command catalog can produce, in catalog order."""
+    phrases = list(WAKE_WORDS)
+    for variations in COMMAND_PHRASES.values():
+        phrases.extend(variations)
+    for patterns in NUMBER_PATTERNS.values():
+        for pattern in patterns:
+            phrases.extend(f"{pattern} {number}" for number in NUMBER_WORDS)
+    for patterns in TEXT_PATTERNS.values():
+        phrases.extend(patterns)
+    return list(dict.fromkeys(phrases))
+
+
+def build_phrases(context=None) -> tuple[list, list]:
+    """Return (phrases, dropped) for the phrase grammar.
+
+    Phrases using words outside the vocabulary can't be decoded and are
+    returned as dropped. With a context, phrases using words outside that
+    context are left out as well (but not reported).
+    """
+    vocabulary = set(VOCABULARY)
+    allowed = vocabulary
+    if context is not None:
+        allowed = set(WAKE_WORDS + CONTEXTS[context])
+
+    phrases, dropped = [], []
+    for phrase in catalog_phrases():
+        words = phrase.split()
+        if not all(word in vocabulary for word in words):
+            dropped.append(phrase)
+        elif all(word in allowed for word in words):
+            phrases.append(phrase)
+    return sorted(phrases), sorted(dropped)
+
+
+@functools.lru_cache(maxsize=None)
+def get_phrase_grammar_string(context=None) -> str:
+    """Return the phrase grammar as a JSON array string for Vosk."""
+    phrases, _ = build_phrases(context)
+    return json.dumps(phrases + ["[unk]"])
+
+
+GRAMMAR_MODES = {
+    WORDS_MODE: get_grammar_string,
+    PHRASES_MODE: get_phrase_grammar_string,
+}
+
+
+def get_grammar(mode: str = WORDS_MODE, context=None) -> str:
+    """Return the grammar string for a mode and optional context.
+
+    Raises KeyError for an unknown mode or context.
+    """
+    return GRAMMAR_MODES[mode](context)
+
+
+def load_grammar(spec: str, context=None) -> list:
+    """Load a grammar from a JSON file or build it from a mode name."""
+    if spec in GRAMMAR_MODES:
+        return json.loads(get_grammar(spec, context))
+    return json.loads(Path(spec).read_text())
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Dump or diff Vosk grammars")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    dump = sub.add_parser("dump", help="Print the generated grammar as JSON")
+    dump.add_argument("--mode", choices=sorted(GRAMMAR_MODES),
+                      default=PHRASES_MODE)
+    dump.add_argument("--context", choices=sorted(CONTEXTS))
+
+    diff = sub.add_parser("diff", help="Compare two grammars")
+    diff.add_argument("old", help="Grammar JSON file or mode name")
+    diff.add_argument("new", nargs="?", default=PHRASES_MODE,
+                      help="Grammar JSON file or mode name (default: phrases)")
+    diff.add_argument("--context", choices=sorted(CONTEXTS))
+    args = parser.parse_args()
+
+    if args.command == "dump":
+        grammar = json.loads(get_grammar(args.mode, args.context))
+        print(json.dumps(grammar, indent=2))
+        if args.mode == PHRASES_MODE:
+            _, dropped = build_phrases(args.context)
+            print(f"{len(grammar)} entries", file=sys.stderr)
+            for phrase in dropped:
+                print(f"dropped (not in vocabulary): {phrase}", file=sys.stderr)
+        return 0
+
+    old = set(load_grammar(args.old, args.context))
+    new = set(load_grammar(args.new, args.context))
+    for entry in sorted(old - new):
+        print(f"- {entry}")
+    for entry in sorted(new - old):
+        print(f"+ {entry}")
+    print(f"{len(old)} -> {len(new)} entries "
+          f"({len(new - old)} added, {len(old - new)} removed)", file=sys.stderr)
+    return 1 if old != new else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+Server-side command resolution.
+
+Turns a final transcript into a structured intent, e.g.
+
+    "jarvis delete email three"
+        -> {"command": "delete_email", "args": {"number": 3}, "confidence": 0.97}
+
+The phrase table from commands.py is compiled once into a token trie, so
+resolving is a single walk over the transcript's words rather than a fuzzy
+comparison against every phrase variant. The cost stays flat as commands
+are added. Resolution follows CommandMatcher's precedence: simple commands
+first, then number commands, then free-text commands.
+"""
+
+from commands import COMMAND_PHRASES, NUMBER_PATTERNS, NUMBER_WORDS, TEXT_PATTERNS
+from vocabulary import WAKE_WORDS
+
+# Words ignored when matching ("open the attachment" == "open attachment")
+FILLERS = {"please", "the", "a", "an", "just", "now"}
+
+# Words Kaldi may hear in a number slot that stand for a number
+NUMBER_HOMOPHONES = {"won": 1, "to": 2, "too": 2, "tree": 3, "for": 4, "fore": 4, "ate": 8}
+
+# Confidence of a free-text match relative to an exact phrase match
+TEXT_MATCH_WEIGHT = 0.9
+
+
+def parse_number(tokens: list):
+    """Parse "3", "three" or "twenty one" into an int, or return None."""
+    if len(tokens) == 1:
+        token = tokens[0]
+        if token.isdigit():
+            return int(token)
+        if token in NUMBER_WORDS:
+            return NUMBER_WORDS[token]
+        return NUMBER_HOMOPHONES.get(token)
+    if len(tokens) == 2:
+        tens, units = (NUMBER_WORDS.get(t) for t in tokens)
+        if tens in (20, 30, 40, 50) and units is not None and units < 10:
+            return tens + units
+    return None
+
+
+class _Node:
+    __slots__ = ("children", "command", "number_command", "text_command")
+
+    def __init__(self):
+        self.children = {}
+        self.command = None          # a simple command ends here
+        self.number_command = None   # a number slot may follow
+        self.text_command = None     # free text may follow
+
+
+class CommandResolver:
+    """Resolve transcripts to commands with a precomputed token trie."""
+
+    def __init__(self, phrases: dict = COMMAND_PHRASES,
+                 number_patterns: dict = NUMBER_PATTERNS,
+                 text_patterns: dict = TEXT_PATTERNS):
+        self._root = _Node()
+        self.size = 0
+        self.phrases = []  # every phrase in the table, as written
+        for slot, table in (("command", phrases),
+                            ("number_command", number_patterns),
+                            ("text_command", text_patterns)):
+            for command, variations in table.items():
+                for phrase in variations:
+                    self._insert(phrase, slot, command)
+                    self.phrases.append(phrase)
+
+    def _insert(self, phrase: str, slot: str, command: str):
+        node = self._root
+        for word in phrase.split():
+            if word in FILLERS:
+                continue
+            node = node.children.setdefault(word, _Node())
+        # Earlier entries win, like the first best match in CommandMatcher
+        if getattr(node, slot) is None:
+            setattr(node, slot, command)
+            self.size += 1
+
+    def is_complete(self, text: str) -> bool:
+        """True if text is already a whole simple or number command.
+
+        Free-text commands never count: more words may still follow. Nor
+        does a simple command that also starts a number or free-text
+        command ("delete email" may go on "... three").
+        """
+        intent = self.resolve(text)
+        if intent is None or "text" in intent["args"]:
+            return False
+        if intent["args"]:
+            return True
+        node = self._root
+        for token in self._tokens(text)[2]:
+            node = node.children[token]
+        return node.number_command is None and node.text_command is None
+
+    @staticmethod
+    def _tokens(text: str) -> tuple:
+        """(spoken words, positions of the matching ones, those words)"""
+        spoken = text.lower().split()
+        while spoken and spoken[0] in WAKE_WORDS:
+            spoken.pop(0)
+        # Positions in `spoken` of the words that take part in matching
+        positions = [i for i, t in enumerate(spoken) if t not in FILLERS]
+        return spoken, positions, [spoken[i] for i in positions]
+
+    def resolve(self, text: str, words: list = None):
+        """Resolve a transcript to {"command", "args", "confidence"}.
+
+        `words` is Kaldi's per-word result list (from SetWords); their mean
+        confidence scales the match confidence. Returns None if nothing
+        matches.
+        """
+        spoken, positions, tokens = self._tokens(text)
+        if not tokens:
+            return None
+
+        # Walk the trie as far as the transcript goes
+        path = []  # (tokens consumed, node)
+        node = self._root
+        for i, token in enumerate(tokens):
+            node = node.children.get(token)
+            if node is None:
+                break
+            path.append((i + 1, node))
+
+        match = None
+        if path and path[-1][0] == len(tokens) and path[-1][1].command:
+            match = (path[-1][1].command, {}, 1.0)
+
+        if match is None:
+            for consumed, node in reversed(path):
+                if node.number_command:
+                    number = parse_number(tokens[consumed:])
+                    if number is not None:
+                        match = (node.number_command, {"number": number}, 1.0)
+                        break
+
+        if match is None:
+            for consumed, node in reversed(path):
+                # Free text keeps its filler words ("search the invoice")
+                start = positions[consumed - 1] + 1
+                rest = [t for t in spoken[start:] if t != "[unk]"]
+                if node.text_command and rest:
+                    match = (node.text_command, {"text": " ".join(rest)},
+                             TEXT_MATCH_WEIGHT)
+                    break
+
+        if match is None:
+            return None
+
+        command, args, confidence = match
+        if words:
+            confidence *= sum(w.get("conf", 1.0) for w in words) / len(words)
+        return {"command": command, "args": args,
+                "confidence": round(confidence, 3)}
@@ -0,0 +1,243 @@
+"""
+Prometheus metrics for the Vosk server.
+
+Minimal Counter/Gauge/Histogram types rendered in the Prometheus text
+exposition format, plus a tiny HTTP listener serving them on /metrics.
+No client library is needed. Metrics are updated from both the event loop
+and the decode threads, so every type is guarded by a lock.
+
+Usage:
+    python server.py --metrics-port 9100
+    curl localhost:9100/metrics
+"""
+
+import asyncio
+import logging
+import threading
+
+log = logging.getLogger("vosk-server")
+
+# Bucket bounds (seconds) for decode-call and recognizer-creation timings
+DECODE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+LATENCY_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 5.0)
+CREATE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+    return "{" + inner + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            items = list(self._values.items()) or [((), 0)]
+        return self.header() + [f"{self.name}{_labels(dict(k))} {v}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def remove(self, **labels):
+        with self._lock:
+            self._values.pop(tuple(sorted(labels.items())), None)
+
+    def render(self) -> list:
+        with self._lock:
+            items = list(self._values.items()) or [((), 0)]
+        return self.header() + [f"{self.name}{_labels(dict(k))} {v}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: tuple):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # last bucket is +Inf
+        self._sum = 0.0
+
+    def observe(self, value: float):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def render(self) -> list:
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        lines = self.header()
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {total}")
+        lines.append(f"{self.name}_count {cumulative}")
+        return lines
+
+
+class ServerMetrics:
+    """All metrics exported by the server."""
+
+    def __init__(self):
+        self.model_ready = Gauge(
+            "vosk_model_ready", "1 once the model is loaded and sessions are served")
+        self.load_seconds = Gauge(
+            "vosk_model_load_seconds", "Time taken to install and load the model(s)")
+        self.active_sessions = Gauge(
+            "vosk_active_sessions", "Currently connected sessions")
+        self.accept_seconds = Histogram(
+            "vosk_accept_waveform_seconds",
+            "Duration of AcceptWaveform calls, including fetching the result",
+            DECODE_BUCKETS)
+        self.convert_seconds = Histogram(
+            "vosk_format_convert_seconds",
+            "Time to convert a chunk from the client's audio format", DECODE_BUCKETS)
+        self.parked_sessions = Gauge(
+            "vosk_parked_sessions",
+            "Disconnected sessions waiting to be resumed")
+        self.decode_pending = Gauge(
+            "vosk_decode_pending",
+            "Decode calls queued or running on the decode executor")
+        self.session_rtf = Gauge(
+            "vosk_session_real_time_factor",
+            "Decode time per second of audio, per active session")
+        self.audio_bytes = Counter(
+            "vosk_audio_bytes_total", "PCM bytes received from clients")
+        self.audio_dropped = Counter(
+            "vosk_audio_dropped_bytes_total",
+            "PCM bytes discarded because a session's queue overflowed")
+        self.rejected = Counter(
+            "vosk_sessions_rejected_total",
+            "Connections turned away because the server was full")
+        self.messages = Counter(
+            "vosk_messages_sent_total", "Result messages sent, by type")
+        self.endpoints = Counter(
+            "vosk_endpoints_total", "Finals with text, by what ended the utterance")
+        self.endpoint_latency = Histogram(
+            "vosk_endpoint_latency_seconds",
+            "Time from the last new word to the final result", LATENCY_BUCKETS)
+        self.rescored = Counter(
+            "vosk_rescored_total",
+            "Finals decoded again with the secondary model, by reason and outcome")
+        self.rescore_seconds = Histogram(
+            "vosk_rescore_seconds",
+            "Time to decode an utterance with the secondary model", CREATE_BUCKETS)
+        self.create_seconds = Histogram(
+            "vosk_recognizer_create_seconds",
+            "Time to build a KaldiRecognizer (grammar compilation)", CREATE_BUCKETS)
+        self.loop_lag = Gauge(
+            "vosk_event_loop_lag_seconds",
+            "How late the event loop ran a timer at the last sample")
+        self.pool = Gauge(
+            "vosk_recognizer_pool", "Recognizer pool counters, by stat")
+        self.capture = Gauge(
+            "vosk_capture", "Capture tap bytes written and records dropped, by stat")
+        self.corrections = Gauge(
+            "vosk_corrections", "Learned corrections and journal lines, by stat")
+        self.corrected = Counter(
+            "vosk_corrected_total", "Finals rewritten by a learned correction, by match")
+        self._collectors = []
+
+    def add_collector(self, callback):
+        """Register a callback run before each scrape to refresh gauges."""
+        self._collectors.append(callback)
+
+    def render(self) -> str:
+        for callback in self._collectors:
+            callback(self)
+        lines = []
+        for metric in (self.model_ready, self.load_seconds,
+                       self.active_sessions, self.parked_sessions,
+                       self.accept_seconds, self.convert_seconds,
+                       self.decode_pending, self.session_rtf,
+                       self.audio_bytes, self.audio_dropped,
+                       self.rejected, self.messages, self.endpoints,
+                       self.endpoint_latency, self.rescored, self.rescore_seconds,
+                       self.create_seconds, self.loop_lag, self.pool,
+                       self.capture, self.corrections, self.corrected):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    async def sample_loop_lag(self, interval: float = 1.0):
+        """Measure event-loop lag by how late a sleep wakes up. Runs forever."""
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(interval)
+            self.loop_lag.set(max(0.0, loop.time() - start - interval))
+
+    async def serve(self, port: int, host: str = "localhost"):
+        """Serve /metrics over HTTP. Returns the asyncio server."""
+        async def handle(reader, writer):
+            try:
+                request = await asyncio.wait_for(reader.readline(), timeout=5)
+                # Drain the request headers
+                while (await asyncio.wait_for(reader.readline(), timeout=5)).strip():
+                    pass
+                parts = request.decode("latin-1").split()
+                if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                    status, body = "200 OK", self.render().encode()
+                else:
+                    status, body = "404 Not Found", b"Not found\n"
+                writer.write(
+                    f"HTTP/1.1 {status}\r\n"
+                    "Content-Type: text/plain; version=0.0.4\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    "Connection: close\r\n\r\n".encode() + body)
+                await writer.drain()
+            except (asyncio.TimeoutError, ConnectionError):
+                pass
+            finally:
+                writer.close()
+
+        server = await asyncio.start_server(handle, host, port)
+        log.info(f"Metrics on http://{host}:{port}/metrics")
+        return server
+
@@ -0,0 +1,377 @@
+"""
+Streaming model installer.
+
+Vosk models ship as zip archives. Rather than download the whole archive
+and only then extract it, the installer unpacks each member as its bytes
+arrive, so download and extraction overlap:
+
+- the archive is appended to `<name>.zip.part` while it streams in. If
+  the download breaks off, the next attempt (or the next run) asks the
+  server for the rest with an HTTP Range request, replaying the bytes
+  already on disk through the extractor first. A server that ignores the
+  Range header just starts over
+- every member's CRC-32 is checked as it is written, and given an expected
+  SHA-256 the whole archive is checked too. A bad archive is deleted, so
+  the next attempt downloads it again
+- members are extracted into a staging directory that is renamed into
+  place only once everything checked out, so a half-installed model is
+  never mistaken for a complete one
+
+The source can be the default model site, a mirror (a base URL or
+directory holding `<name>.zip`) or one archive given by URL or file path.
+Local files are read in place.
+"""
+
+import hashlib
+import http.client
+import logging
+import os
+import shutil
+import struct
+import time
+import urllib.error
+import urllib.request
+import zlib
+from pathlib import Path, PurePosixPath
+
+log = logging.getLogger("vosk-server")
+
+MODEL_BASE_URL = "https://alphacephei.com/vosk/models"
+BLOCK_SIZE = 64 * 1024
+DEFAULT_RETRIES = 3
+TIMEOUT = 30
+
+LOCAL_HEADER = b"PK\x03\x04"
+CENTRAL_HEADER = b"PK\x01\x02"
+END_OF_CENTRAL = b"PK\x05\x06"
+ZIP64_END = b"PK\x06\x06"
+DESCRIPTOR = b"PK\x07\x08"
+LOCAL_HEADER_FORMAT = struct.Struct("<4sHHHHHIIIHH")
+FLAG_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+STORED, DEFLATED = 0, 8
+
+
+class InstallError(Exception):
+    """The model couldn't be installed."""
+
+
+class ZipStreamExtractor:
+    """Unpack a zip archive from a byte stream as it arrives.
+
+    Reads the local file headers in order and stops at the central
+    directory, so the archive never has to be complete (or seekable) on
+    disk. Handles stored and deflated members, data descriptors and
+    Zip64 sizes. Raises InstallError for anything else, for a CRC
+    mismatch and for member names that would land outside `dest`.
+    """
+
+    def __init__(self, dest: Path):
+        self.dest = Path(dest)
+        self.dest.mkdir(parents=True, exist_ok=True)
+        self.files = 0
+        self.done = False
+        self._buf = bytearray()
+        self._member = None  # state of the member being extracted
+
+    def feed(self, data: bytes):
+        self._buf += data
+        while not self.done and self._step():
+            pass
+
+    def close(self):
+        """Check that the whole archive was seen."""
+        if not self.done:
+            raise InstallError("Archive is truncated")
+
+    def _step(self) -> bool:
+        """Make progress on the buffer; False if more data is needed."""
+        if self._member is None:
+            return self._read_header()
+        if self._member["reading_descriptor"]:
+            return self._read_descriptor()
+        return self._read_data()
+
+    def _read_header(self) -> bool:
+        if len(self._buf) < 4:
+            return False
+        signature = bytes(self._buf[:4])
+        if signature in (CENTRAL_HEADER, END_OF_CENTRAL, ZIP64_END):
+            self.done = True
+            self._buf.clear()
+            return False
+        if signature != LOCAL_HEADER:
+            raise InstallError("Not a zip archive (or a corrupt one)")
+        if len(self._buf) < LOCAL_HEADER_FORMAT.size:
+            return False
+        (_, _, flags, method, _, _, crc, csize, usize,
+         name_len, extra_len) = LOCAL_HEADER_FORMAT.unpack_from(self._buf)
+        header_len = LOCAL_HEADER_FORMAT.size + name_len + extra_len
+        if len(self._buf) < header_len:
+            return False
+        raw_name = bytes(self._buf[LOCAL_HEADER_FORMAT.size:
+                                   LOCAL_HEADER_FORMAT.size + name_len])
+        extra = bytes(self._buf[LOCAL_HEADER_FORMAT.size + name_len:header_len])
+        del self._buf[:header_len]
+
+        name = raw_name.decode("utf-8" if flags & FLAG_UTF8 else "cp437")
+        zip64 = csize == 0xFFFFFFFF or usize == 0xFFFFFFFF
+        if zip64:
+            usize, csize = self._zip64_sizes(extra, usize, csize)
+        if method not in (STORED, DEFLATED):
+            raise InstallError(f"{name}: unsupported compression method {method}")
+        has_descriptor = bool(flags & FLAG_DESCRIPTOR)
+        if has_descriptor and method == STORED:
+            raise InstallError(f"{name}: stored member without sizes")
+
+        path = self._safe_path(name)
+        is_dir = name.endswith("/")
+        if is_dir:
+            path.mkdir(parents=True, exist_ok=True)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        self._member = {
+            "name": name,
+            "file": None if is_dir else open(path, "wb"),
+            "remaining": None if has_descriptor else csize,
+            "crc": crc, "usize": usize, "zip64": zip64,
+            "has_descriptor": has_descriptor, "reading_descriptor": False,
+            "inflate": zlib.decompressobj(-15) if method == DEFLATED else None,
+            "actual_crc": 0, "written": 0,
+        }
+        return True
+
+    @staticmethod
+    def _zip64_sizes(extra: bytes, usize: int, csize: int) -> tuple[int, int]:
+        pos = 0
+        while pos + 4 <= len(extra):
+            tag, size = struct.unpack_from("<HH", extra, pos)
+            if tag == 0x0001:
+                values = list(struct.unpack_from(f"<{size // 8}Q", extra, pos + 4))
+                if usize == 0xFFFFFFFF and values:
+                    usize = values.pop(0)
+                if csize == 0xFFFFFFFF and values:
+                    csize = values.pop(0)
+                break
+            pos += 4 + size
+        return usize, csize
+
+    def _safe_path(self, name: str) -> Path:
+        parts = PurePosixPath(name.replace("\\", "/")).parts
+        if not parts or parts[0] == "/" or ".." in parts or ":" in parts[0]:
+            raise InstallError(f"Unsafe path in archive: {name}")
+        return self.dest.joinpath(*parts)
+
+    def _read_data(self) -> bool:
+        member = self._member
+        if not self._buf and member["remaining"] != 0:
+            return False
+        if member["remaining"] is not None:
+            take = min(member["remaining"], len(self._buf))
+            data = bytes(self._buf[:take])
+            del self._buf[:take]
+            member["remaining"] -= take
+            self._write(member["inflate"].decompress(data)
+                        if member["inflate"] else data)
+            if member["remaining"]:
+                return False
+            if member["inflate"]:
+                self._write(member["inflate"].flush())
+        else:
+            # Size unknown until the data descriptor: the deflate stream
+            # itself says where it ends
+            inflate = member["inflate"]
+            data = bytes(self._buf)
+            self._buf.clear()
+            self._write(inflate.decompress(data))
+            if not inflate.eof:
+                return False
+            self._buf[:0] = inflate.unused_data
+        if member["has_descriptor"]:
+            member["reading_descriptor"] = True
+            return True
+        self._finish_member(member["crc"])
+        return True
+
+    def _read_descriptor(self) -> bool:
+        size_len = 8 if self._member["zip64"] else 4
+        has_signature = self._buf[:4] == DESCRIPTOR
+        needed = (4 if has_signature else 0) + 4 + 2 * size_len
+        if len(self._buf) < needed:
+            return False
+        (crc,) = struct.unpack_from("<I", self._buf, 4 if has_signature else 0)
+        del self._buf[:needed]
+        self._finish_member(crc)
+        return True
+
+    def _write(self, data: bytes):
+        member = self._member
+        if data and member["file"] is not None:
+            member["file"].write(data)
+            member["actual_crc"] = zlib.crc32(data, member["actual_crc"])
+            member["written"] += len(data)
+
+    def _finish_member(self, crc: int):
+        member, self._member = self._member, None
+        if member["file"] is None:
+            return
+        member["file"].close()
+        if member["actual_crc"] != crc:
+            raise InstallError(f"{member['name']}: CRC mismatch")
+        self.files += 1
+
+    def abort(self):
+        """Close any file left open by a failed extraction."""
+        if self._member is not None and self._member["file"] is not None:
+            self._member["file"].close()
+        self._member = None
+
+
+def archive_location(name: str, source: str = None) -> str:
+    """URL or path of a model's archive.
+
+    `source` is None (the default model site), a mirror base URL or
+    directory holding `<name>.zip`, or a .zip URL or path used as is.
+    """
+    if source is None:
+        return f"{MODEL_BASE_URL}/{name}.zip"
+    source = str(source)
+    if source.lower().endswith(".zip"):
+        return source
+    return f"{source.rstrip('/')}/{name}.zip"
+
+
+def is_local(location: str) -> bool:
+    return "://" not in location or location.startswith("file://")
+
+
+def open_remote(url: str, offset: int):
+    """Open a URL from `offset`. Returns (response, total size or None, resumed)."""
+    request = urllib.request.Request(url)
+    if offset:
+        request.add_header("Range", f"bytes={offset}-")
+    response = urllib.request.urlopen(request, timeout=TIMEOUT)
+    resumed = offset > 0 and response.status == 206
+    length = response.headers.get("Content-Length")
+    total = int(length) + (offset if resumed else 0) if length else None
+    return response, total, resumed
+
+
+def install_model(name: str, model_dir: Path, source: str = None,
+                  sha256: str = None, retries: int = DEFAULT_RETRIES,
+                  progress=None) -> Path:
+    """Install a model into model_dir/name unless it's there already.
+
+    `progress(done_bytes, total_bytes or None)` is called as the archive
+    streams in. Raises InstallError if it can't be installed.
+    """
+    model_dir = Path(model_dir)
+    target = model_dir / name
+    if target.exists():
+        log.info(f"Model found: {target}")
+        return target
+
+    model_dir.mkdir(parents=True, exist_ok=True)
+    location = archive_location(name, source)
+    staging = model_dir / f".{name}.extracting"
+    part = model_dir / f"{name}.zip.part"
+    log.info(f"Installing model {name} from {location}")
+    start = time.monotonic()
+
+    for attempt in range(1, retries + 1):
+        shutil.rmtree(staging, ignore_errors=True)
+        extractor = ZipStreamExtractor(staging)
+        digest = hashlib.sha256()
+
+        def consume(block):
+            digest.update(block)
+            extractor.feed(block)
+
+        try:
+            if is_local(location):
+                _read_local(location, consume, progress)
+            else:
+                _download(location, part, consume, progress)
+            extractor.close()
+            break
+        except InstallError:
+            extractor.abort()
+            # The data itself is bad; don't resume from it
+            part.unlink(missing_ok=True)
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        except zlib.error as e:
+            extractor.abort()
+            part.unlink(missing_ok=True)
+            shutil.rmtree(staging, ignore_errors=True)
+            raise InstallError(f"Corrupt archive: {e}") from None
+        except urllib.error.HTTPError as e:
+            extractor.abort()
+            if e.code != 416:
+                raise InstallError(f"Could not fetch {location}: HTTP {e.code}") from None
+            # Nothing left to resume from; the .part is stale
+            part.unlink(missing_ok=True)
+        except (OSError, http.client.HTTPException) as e:
+            extractor.abort()
+            if is_local(location):
+                raise InstallError(f"Could not read {location}: {e}") from None
+            if attempt < retries:
+                log.warning(f"Download interrupted ({e!r}); resuming "
+                            f"(attempt {attempt + 1}/{retries})")
+                time.sleep(min(2 ** attempt, 10))
+    else:
+        raise InstallError(f"Could not fetch {location} after {retries} attempts")
+
+    if sha256 and digest.hexdigest() != sha256.strip().lower():
+        part.unlink(missing_ok=True)
+        shutil.rmtree(staging, ignore_errors=True)
+        raise InstallError(f"Checksum mismatch for {location}: "
+                           f"got sha256 {digest.hexdigest()}")
+
+    # Archives normally hold a single <name>/ directory
+    entries = list(staging.iterdir())
+    root = entries[0] if len(entries) == 1 and entries[0].is_dir() else staging
+    os.replace(root, target)
+    shutil.rmtree(staging, ignore_errors=True)
+    part.unlink(missing_ok=True)
+    log.info(f"Model ready: {target} ({extractor.files} files, "
+             f"{time.monotonic() - start:.1f}s)")
+    return target
+
+
+def _read_local(location: str, consume, progress):
+    path = Path(location[len("file://"):] if location.startswith("file://") else location)
+    total = path.stat().st_size
+    done = 0
+    with open(path, "rb") as f:
+        while block := f.read(BLOCK_SIZE):
+            consume(block)
+            done += len(block)
+            if progress:
+                progress(done, total)
+
+
+def _download(url: str, part: Path, consume, progress):
+    """Stream url into part (resuming it) and through consume()."""
+    offset = part.stat().st_size if part.exists() else 0
+    response, total, resumed = open_remote(url, offset)
+    with response:
+        if offset and not resumed:
+            log.info("Server doesn't support resuming; starting over")
+        done = 0
+        if resumed:
+            log.info(f"Resuming download at {offset} bytes")
+            # Bytes from the earlier attempt go through the extractor first
+            with open(part, "rb") as f:
+                while block := f.read(BLOCK_SIZE):
+                    consume(block)
+                    done += len(block)
+        with open(part, "ab" if resumed else "wb") as out:
+            while block := response.read(BLOCK_SIZE):
+                out.write(block)
+                consume(block)
+                done += len(block)
+                if progress:
+                    progress(done, total)
+        if total is not None and done < total:
+            raise ConnectionError(f"connection closed at {done} of {total} bytes")
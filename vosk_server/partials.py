@@ -0,0 +1,88 @@
+"""
+Per-session partial-result policies.
+
+Kaldi produces a partial result for nearly every audio chunk, and most of
+them repeat the previous one. A PartialPolicy decides which partials are
+actually sent:
+
+- "all": every non-empty partial (the original behaviour)
+- "change": only partials that differ from the last one sent
+- "rate": changed partials, at most `rate_hz` per second. Partials that
+  arrive too early are coalesced; only the latest is kept and sent when
+  the next slot opens
+- "off": no partials at all (the session then skips computing them)
+"""
+
+POLICIES = ("all", "change", "rate", "off")
+DEFAULT_POLICY = "change"
+DEFAULT_RATE_HZ = 5.0
+
+
+class PartialPolicy:
+    """Decide which partial results to send for one session."""
+
+    def __init__(self, policy: str = DEFAULT_POLICY,
+                 rate_hz: float = DEFAULT_RATE_HZ):
+        self.configure(policy, rate_hz)
+
+    def configure(self, policy: str = None, rate_hz: float = None) -> dict:
+        """Change the policy and return the resulting settings.
+
+        Raises ValueError for an unknown policy or a non-positive rate.
+        """
+        policy = policy or getattr(self, "policy", DEFAULT_POLICY)
+        rate_hz = float(rate_hz if rate_hz is not None
+                        else getattr(self, "rate_hz", DEFAULT_RATE_HZ))
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown partials policy: {policy}")
+        if rate_hz <= 0:
+            raise ValueError("partial_rate must be positive")
+        self.policy = policy
+        self.rate_hz = rate_hz
+        self.reset()
+        return {"partials": self.policy, "partial_rate": self.rate_hz}
+
+    @property
+    def enabled(self) -> bool:
+        return self.policy != "off"
+
+    def reset(self):
+        """Forget the last sent and pending partials (e.g. after a final)."""
+        self.last_sent = ""
+        self.pending = None
+        self._next_slot = 0.0
+
+    def offer(self, text: str, now: float):
+        """Offer a new partial. Returns the text to send now, or None.
+
+        In "rate" mode a partial that can't be sent yet becomes `pending`;
+        call flush_at() to find out when to send it.
+        """
+        if not text or self.policy == "off":
+            return None
+        if self.policy == "all":
+            self.last_sent = text
+            return text
+        if text == self.last_sent:
+            self.pending = None
+            return None
+        if self.policy == "rate" and now < self._next_slot:
+            self.pending = text
+            return None
+        self.pending = None
+        self.last_sent = text
+        self._next_slot = now + 1.0 / self.rate_hz
+        return text
+
+    def flush_at(self):
+        """Time at which the pending partial may be sent, or None."""
+        return self._next_slot if self.pending is not None else None
+
+    def take_pending(self, now: float):
+        """Return the pending partial if its slot has opened, else None."""
+        if self.pending is None or now < self._next_slot:
+            return None
+        text, self.pending = self.pending, None
+        self.last_sent = text
+        self._next_slot = now + 1.0 / self.rate_hz
+        return text
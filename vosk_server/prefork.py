@@ -0,0 +1,210 @@
+"""
+Pre-fork multi-process mode for the Vosk server.
+
+The acoustic model is loaded once in the parent process, which then binds
+the listening sockets and forks the workers. Workers inherit the model
+(shared copy-on-write, so RAM holds a single copy) and the sockets, and
+the kernel spreads incoming connections across them. The parent stays
+behind as a supervisor and restarts any worker that exits.
+
+POSIX only - os.fork() is not available on Windows.
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import socket
+import stat
+import time
+
+log = logging.getLogger("vosk-server")
+
+# A worker that dies sooner than this after starting counts as a crash loop
+MIN_HEALTHY_UPTIME = 5.0
+MAX_RESTART_BACKOFF = 10.0
+
+
+def bind_sockets(host: str, port: int, backlog: int = 1024) -> list:
+    """Bind and listen on every address `host` resolves to."""
+    socks = []
+    seen = set()
+    infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM,
+                               flags=socket.AI_PASSIVE)
+    for family, socktype, proto, _, addr in infos:
+        if (family, addr[:2]) in seen:
+            continue
+        seen.add((family, addr[:2]))
+        sock = socket.socket(family, socktype, proto)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if family == socket.AF_INET6:
+                sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 1)
+            sock.bind(addr)
+            sock.listen(backlog)
+        except OSError as e:
+            sock.close()
+            log.warning(f"Could not bind {addr}: {e}")
+            continue
+        sock.setblocking(False)
+        socks.append(sock)
+
+    if not socks:
+        raise OSError(f"Could not bind any address for {host}:{port}")
+    return socks
+
+
+def bind_unix_socket(path, backlog: int = 1024) -> socket.socket:
+    """Listen on a Unix domain socket, replacing a stale socket file.
+
+    Only the server's user may connect (mode 0600). Raises OSError if
+    another server is listening there.
+    """
+    path = str(path)
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                try:
+                    probe.connect(path)
+                except ConnectionRefusedError:
+                    os.unlink(path)  # left behind by a server that's gone
+                else:
+                    raise OSError(f"{path} is in use by another server")
+    except FileNotFoundError:
+        pass
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.bind(path)
+        os.chmod(path, 0o600)
+        sock.listen(backlog)
+    except OSError:
+        sock.close()
+        raise
+    sock.setblocking(False)
+    return sock
+
+
+class Supervisor:
+    """Fork N server workers and keep them running."""
+
+    def __init__(self, server, workers: int):
+        self.server = server
+        self.workers = workers
+        self.socks = []
+        self.children = {}  # pid -> (slot, start time)
+        self.failures = [0] * workers
+
+    def run(self):
+        """Bind, fork the workers and supervise until interrupted."""
+        self.socks = bind_sockets("localhost", self.server.port)
+        unix_socket = self.server.unix_socket
+        if unix_socket is not None:
+            self.socks.append(bind_unix_socket(unix_socket))
+        signal.signal(signal.SIGTERM, self._on_sigterm)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, self._on_sighup)
+        log.info(f"Pre-fork mode: {self.workers} workers on port "
+                 f"{self.server.port} (supervisor pid {os.getpid()})")
+
+        for slot in range(self.workers):
+            self._spawn(slot)
+
+        try:
+            while self.children:
+                pid, status = os.wait()
+                slot, started = self.children.pop(pid, (None, 0.0))
+                if slot is None:
+                    continue
+                uptime = time.monotonic() - started
+                code = os.waitstatus_to_exitcode(status)
+                log.warning(f"Worker {slot} (pid {pid}) exited with status "
+                            f"{code} after {uptime:.1f}s, restarting")
+                self._restart(slot, uptime)
+        except (KeyboardInterrupt, SystemExit):
+            log.info("Supervisor stopping...")
+        finally:
+            self._stop_children()
+            for sock in self.socks:
+                sock.close()
+            if unix_socket is not None:
+                try:
+                    os.unlink(unix_socket)
+                except OSError:
+                    pass
+            log.info("Server stopped.")
+
+    def _restart(self, slot: int, uptime: float):
+        """Respawn a worker, backing off if it keeps crashing."""
+        if uptime < MIN_HEALTHY_UPTIME:
+            self.failures[slot] += 1
+            delay = min(MAX_RESTART_BACKOFF, 0.5 * 2 ** self.failures[slot])
+            log.warning(f"Worker {slot} is crash-looping, "
+                        f"waiting {delay:.1f}s before restart")
+            time.sleep(delay)
+        else:
+            self.failures[slot] = 0
+        self._spawn(slot)
+
+    def _spawn(self, slot: int):
+        pid = os.fork()
+        if pid == 0:
+            self._worker_main(slot)  # never returns
+        self.children[pid] = (slot, time.monotonic())
+        log.info(f"Worker {slot} started (pid {pid})")
+
+    def _worker_main(self, slot: int):
+        """Entry point of a forked worker process."""
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)  # until the loop handles it
+        code = 0
+        self.server.worker_slot = slot
+        try:
+            asyncio.run(self.server.run(socks=self.socks))
+        except KeyboardInterrupt:
+            pass
+        except BaseException as e:
+            log.error(f"Worker {slot} crashed: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _on_sighup(self, signum, frame):
+        """Pass SIGHUP (reload the vocabulary) on to every worker."""
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGHUP)
+            except ProcessLookupError:
+                pass
+
+    def _on_sigterm(self, signum, frame):
+        raise SystemExit(0)
+
+    def _stop_children(self, timeout: float = 5.0):
+        """Terminate all workers, killing any that do not exit in time."""
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        deadline = time.monotonic() + timeout
+        while self.children and time.monotonic() < deadline:
+            for pid in list(self.children):
+                try:
+                    done, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    done = pid
+                if done:
+                    self.children.pop(pid)
+            time.sleep(0.05)
+
+        for pid in self.children:
+            log.warning(f"Worker pid {pid} did not stop, killing")
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ChildProcessError, ProcessLookupError):
+                pass
+        self.children.clear()
@@ -0,0 +1,135 @@
+"""
+Pool of pre-built recognizers, keyed by grammar.
+
+Building a KaldiRecognizer compiles its grammar, which is the slowest part
+of setting up a session. The Flutter client opens a new connection for
+every listening cycle, so instead of building a recognizer per connection
+the server checks one out of this pool and returns it (reset) afterwards.
+
+Clients can switch between per-screen grammars, so the pool also acts as
+an LRU cache of compiled grammars: idle recognizers for the least
+recently used grammar are dropped once more than `max_grammars` are held,
+or to make room when a recognizer for another grammar is returned to a
+full pool.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+
+class RecognizerPool:
+    """Thread-safe pool of idle recognizers, grouped by grammar string.
+
+    `factory(grammar)` builds a new recognizer. At most `max_idle`
+    recognizers are kept idle across all grammars. A recognizer returned
+    while the pool is full takes the place of an idle one of the least
+    recently used other grammar; if every idle one is for its own
+    grammar, it is dropped.
+    """
+
+    def __init__(self, factory: Callable[[str], object], max_idle: int = 8,
+                 max_grammars: int = 8):
+        self._factory = factory
+        self._max_idle = max_idle
+        self._max_grammars = max_grammars
+        self._idle = OrderedDict()  # grammar -> idle recognizers, LRU first
+        self._idle_count = 0
+        self._retired = set()  # grammars whose recognizers aren't kept
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self.evictions = 0
+
+    def prewarm(self, grammar: str, count: int):
+        """Build up to `count` idle recognizers for a grammar ahead of time."""
+        for _ in range(count):
+            with self._lock:
+                if self._idle_count >= self._max_idle:
+                    return
+            rec = self._factory(grammar)
+            with self._lock:
+                self._store(grammar, rec)
+
+    def acquire(self, grammar: str):
+        """Check out a recognizer for `grammar`, building one on a miss."""
+        with self._lock:
+            self._retired.discard(grammar)
+            idle = self._idle.get(grammar)
+            if idle:
+                self.hits += 1
+                self._idle_count -= 1
+                self._idle.move_to_end(grammar)
+                return idle.pop()
+            self.misses += 1
+        return self._factory(grammar)
+
+    def release(self, grammar: str, rec):
+        """Reset a recognizer and return it to the pool."""
+        rec.Reset()
+        with self._lock:
+            if grammar in self._retired or (
+                    self._idle_count >= self._max_idle
+                    and not self._evict_one(grammar)):
+                self.discarded += 1
+                return
+            self._store(grammar, rec)
+
+    def retire(self, grammars):
+        """Drop idle recognizers for grammars that are no longer in use.
+
+        Recognizers for them that are released later are dropped too,
+        until the grammar is acquired again.
+        """
+        with self._lock:
+            for grammar in grammars:
+                self._retired.add(grammar)
+                self._idle_count -= len(self._idle.pop(grammar, ()))
+
+    def set_max_grammars(self, max_grammars: int):
+        """Change how many grammars keep idle recognizers, e.g. after a
+        vocabulary reload added contexts."""
+        with self._lock:
+            self._max_grammars = max_grammars
+            while len(self._idle) > self._max_grammars:
+                _, evicted = self._idle.popitem(last=False)
+                self._idle_count -= len(evicted)
+                self.evictions += 1
+
+    def _evict_one(self, keep: str) -> bool:
+        """Drop one idle recognizer of the least recently used grammar
+        other than `keep`; False if there is none."""
+        for grammar, idle in self._idle.items():
+            if grammar != keep:
+                idle.pop()
+                if not idle:
+                    del self._idle[grammar]
+                self._idle_count -= 1
+                self.evictions += 1
+                return True
+        return False
+
+    def _store(self, grammar: str, rec):
+        """Add an idle recognizer, evicting the LRU grammar if needed."""
+        self._idle.setdefault(grammar, []).append(rec)
+        self._idle.move_to_end(grammar)
+        self._idle_count += 1
+        while len(self._idle) > self._max_grammars:
+            _, evicted = self._idle.popitem(last=False)
+            self._idle_count -= len(evicted)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """Return pool counters for sizing the pool."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "discarded": self.discarded,
+                "evictions": self.evictions,
+                "idle": self._idle_count,
+                "max_idle": self._max_idle,
+                "grammars": len(self._idle),
+                "max_grammars": self._max_grammars,
+            }
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Replay captured sessions against a running server.
+
+Reads segment files written with `server.py --capture-dir` and sends each
+session's audio and control messages to the server again, exactly as they
+arrived. Chunking, hello options and audio format are all preserved. Then
+it compares what comes back with what was sent the first time:
+
+    finals         recorded vs. replayed final texts, and whether they match
+    final_latency  per final, time since the last audio message was sent
+                   before it (only comparable at --speed 1)
+
+Usage:
+    python replay.py captures/ [--url ws://localhost:8765] [--speed 1]
+                     [--session 4242.7] [--concurrent] [--output replay.json]
+
+--speed 1 replays at the recorded pace (for latency regressions), 0 as fast
+as the server accepts the audio (for accuracy regressions), anything else
+scales the recorded gaps. --concurrent starts all sessions at their
+recorded offsets from each other, reproducing the load they ran under.
+Exits with status 1 if any session's finals differ.
+
+The replay connects without a session token, so a capture of a resumed
+session replays as a connection of its own. Sessions that asked for compact
+results get them again, and they're decoded before comparing.
+"""
+
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import websockets
+
+from bench import percentiles
+from capture import AUDIO, CONTROL, EVENT, read_capture
+from result_encoding import JSON, ResultDecoder
+
+DEFAULT_URL = "ws://localhost:8765"
+
+
+def requested_results(records: list) -> str:
+    """The result encoding a session's hello asked for."""
+    for kind, _, payload in records:
+        if kind == CONTROL:
+            try:
+                data = json.loads(payload)
+            except ValueError:
+                continue
+            if isinstance(data, dict) and data.get("type") == "hello":
+                return data.get("results", JSON)
+    return JSON
+
+
+def recorded_results(records: list) -> list:
+    """(seconds since the last audio message, message) for each result the
+    server sent in a capture."""
+    results = []
+    last_audio = None
+    for kind, t, payload in records:
+        if kind == AUDIO:
+            last_audio = t
+        elif kind == EVENT:
+            message = json.loads(payload)
+            delay = t - last_audio if last_audio is not None else None
+            results.append((delay, message))
+    return results
+
+
+def finals(results: list) -> list:
+    return [m["text"] for _, m in results if m.get("type") == "final"]
+
+
+def final_latencies(results: list) -> list:
+    return [delay for delay, m in results
+            if m.get("type") == "final" and delay is not None]
+
+
+def compare(recorded: list, replayed: list) -> dict:
+    """Summarise one session's recorded and replayed results."""
+    before, after = finals(recorded), finals(replayed)
+    return {
+        "match": before == after,
+        "recorded_finals": before,
+        "replayed_finals": after,
+        "recorded_latency": percentiles(final_latencies(recorded)),
+        "replayed_latency": percentiles(final_latencies(replayed)),
+    }
+
+
+async def replay_session(url: str, records: list, speed: float) -> list:
+    """Send one session's incoming records; returns the results as
+    (seconds since the last audio message, message)."""
+    results = []
+    last_audio = None
+    done = asyncio.Event()
+    # The barrier below is the last stats reply, after any the client asked for
+    stats_left = 1 + sum(1 for kind, _, payload in records
+                         if kind == CONTROL and b'"stats"' in payload)
+    # Compact results come back as binary frames; the capture has them as JSON
+    encoding = requested_results(records)
+    decoder = ResultDecoder(encoding) if encoding != JSON else None
+
+    async with websockets.connect(url, max_queue=None) as ws:
+        async def receive():
+            nonlocal stats_left
+            async for message in ws:
+                now = time.perf_counter()
+                delay = now - last_audio if last_audio is not None else None
+                if isinstance(message, bytes):
+                    if decoder is not None:
+                        results.extend((delay, data) for data in decoder.decode(message))
+                    continue
+                data = json.loads(message)
+                kind = data.get("type")
+                if kind == "stats":
+                    stats_left -= 1
+                    if not stats_left:
+                        done.set()
+                elif kind in ("partial", "final", "command", "wake"):
+                    results.append((delay, data))
+
+        receiver = asyncio.create_task(receive())
+        try:
+            start = time.perf_counter()
+            origin = records[0][1] if records else 0.0
+            for kind, t, payload in records:
+                if kind not in (AUDIO, CONTROL):
+                    continue
+                if speed > 0:
+                    delay = start + (t - origin) / speed - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                if kind == AUDIO:
+                    await ws.send(payload)
+                    last_audio = time.perf_counter()
+                else:
+                    await ws.send(payload.decode())
+            # Control messages are handled in order with the audio, so the
+            # stats reply comes after every result of the replayed stream
+            await ws.send(json.dumps({"type": "stats"}))
+            await asyncio.wait_for(done.wait(), timeout=30)
+        finally:
+            receiver.cancel()
+    return results
+
+
+async def replay(url: str, sessions: dict, speed: float,
+                 concurrent: bool = False) -> dict:
+    """Replay sessions one after another (or together); returns a report
+    entry per session id."""
+    async def run(session_id, entry, delay):
+        if delay > 0:
+            await asyncio.sleep(delay)
+        start = time.perf_counter()
+        try:
+            replayed = await replay_session(url, entry["records"], speed)
+        except (OSError, asyncio.TimeoutError,
+                websockets.exceptions.WebSocketException) as e:
+            return session_id, {"error": repr(e)}
+        report = compare(recorded_results(entry["records"]), replayed)
+        report["wall_seconds"] = round(time.perf_counter() - start, 3)
+        if entry["gaps"]:
+            report["gaps"] = entry["gaps"]  # capture dropped records here
+        return session_id, report
+
+    if concurrent:
+        first = min((e["start"] for e in sessions.values()), default=0.0)
+        scale = 1 / speed if speed > 0 else 0
+        done = await asyncio.gather(*(
+            run(sid, entry, (entry["start"] - first) * scale)
+            for sid, entry in sessions.items()))
+    else:
+        done = [await run(sid, entry, 0) for sid, entry in sessions.items()]
+    return dict(done)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay captured sessions")
+    parser.add_argument("capture", type=Path, nargs="+",
+                        help="Capture segment files or directories of them")
+    parser.add_argument("--url", type=str, default=DEFAULT_URL,
+                        help=f"Server to replay against (default: {DEFAULT_URL})")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="1 = recorded pace, 0 = as fast as possible")
+    parser.add_argument("--session", type=str, nargs="*", default=[],
+                        help="Only replay these session ids (pid.session)")
+    parser.add_argument("--concurrent", action="store_true",
+                        help="Replay sessions together, at their recorded offsets")
+    parser.add_argument("--output", type=Path,
+                        help="Write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    sessions = read_capture(args.capture)
+    if args.session:
+        sessions = {sid: e for sid, e in sessions.items() if sid in args.session}
+    if not sessions:
+        parser.error("no captured sessions found")
+
+    results = asyncio.run(replay(args.url, sessions, args.speed, args.concurrent))
+    for sid, result in results.items():
+        if "error" in result:
+            status = f"error {result['error']}"
+        else:
+            status = "match" if result["match"] else "MISMATCH"
+            latency = result["replayed_latency"].get("p50")
+            status += f", final p50 {latency}s" if latency is not None else ""
+            status += f", {result['gaps']} records missing" if "gaps" in result else ""
+        print(f"{sid}: {status}", file=sys.stderr)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "url": args.url,
+        "speed": args.speed,
+        "concurrent": args.concurrent,
+        "sessions": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+    else:
+        print(text)
+    if any("error" in r or not r["match"] for r in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Two-pass decoding with a secondary model.
+
+Sessions decode with the fast primary model. When a final looks
+unreliable, either because its words have low average confidence or
+because it is mostly [unk], the utterance's audio is decoded again with a
+larger, more accurate secondary model. The final is only sent after that.
+Most commands never hit this path, so the expensive model only runs on
+hard cases.
+
+The second pass runs on the session's decode thread, off the event loop,
+with recognizers from a separate pool built on the secondary model. It
+uses the same grammar as the first pass. Models without runtime-graph
+support ignore the grammar and decode freely.
+"""
+
+import json
+import time
+
+from session import as_waveform
+
+DEFAULT_MIN_CONFIDENCE = 0.6
+DEFAULT_MAX_UNKNOWN = 0.5
+# Longer utterances aren't buffered, and so never rescored
+DEFAULT_MAX_AUDIO_MS = 10000
+
+# Why a final was rescored
+LOW_CONFIDENCE = "confidence"
+UNKNOWN = "unknown"
+
+
+def rescore_reason(result: dict, min_confidence: float,
+                   max_unknown: float):
+    """Why a first-pass final should be decoded again, or None.
+
+    Word confidences come from SetWords output; a final without them is
+    only judged on its share of [unk] words.
+    """
+    words = result.get("text", "").split()
+    if not words:
+        return None
+    if words.count("[unk]") / len(words) >= max_unknown:
+        return UNKNOWN
+    confidences = [w["conf"] for w in result.get("result", ()) if "conf" in w]
+    if confidences and sum(confidences) / len(confidences) < min_confidence:
+        return LOW_CONFIDENCE
+    return None
+
+
+class Rescorer:
+    """Decide which finals to rescore and decode them again.
+
+    `pool` is a RecognizerPool whose factory builds recognizers on the
+    secondary model.
+    """
+
+    def __init__(self, pool, min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+                 max_unknown: float = DEFAULT_MAX_UNKNOWN,
+                 max_audio_ms: int = DEFAULT_MAX_AUDIO_MS):
+        self.pool = pool
+        self.min_confidence = min_confidence
+        self.max_unknown = max_unknown
+        self.max_audio_ms = max_audio_ms
+
+    def reason(self, result: dict):
+        return rescore_reason(result, self.min_confidence, self.max_unknown)
+
+    def rescore(self, grammar: str, audio: list) -> tuple[dict, float]:
+        """Decode buffered audio with the secondary model.
+
+        Returns (result, seconds taken). Blocks; call on the decode executor.
+        """
+        start = time.perf_counter()
+        recognizer = self.pool.acquire(grammar)
+        segments = []
+        try:
+            for chunk in audio:
+                # The secondary model may find an endpoint inside the
+                # utterance; keep every segment
+                if recognizer.AcceptWaveform(as_waveform(chunk)):
+                    segments.append(json.loads(recognizer.Result()))
+            segments.append(json.loads(recognizer.FinalResult()))
+        finally:
+            self.pool.release(grammar, recognizer)
+        result = {
+            "text": " ".join(t for s in segments if (t := s.get("text", "").strip())),
+            "result": [w for s in segments for w in s.get("result", ())],
+        }
+        return result, time.perf_counter() - start
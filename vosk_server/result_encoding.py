@@ -0,0 +1,234 @@
+"""
+Compact encodings for result messages.
+
+By default results go out as JSON text frames. A client on the same host
+that wants less work per message can ask for a compact encoding in the
+hello:
+
+    {"type": "hello", "results": "binary"}    (or "msgpack")
+
+Partial, final, command and wake messages are then sent as binary frames.
+Everything else (hello, stats, errors, ...) stays JSON. A frame holds
+one or more messages back to back; a final and the command it resolved
+to share a frame.
+
+Texts are sent once per connection. The first message to use a text
+(a partial, a final, a word) defines it under a small id, and later
+messages refer to the id. Partials repeat their prefixes and the same
+commands come up again and again, so most messages are a few bytes.
+Text id 0 is the empty text. A connection's table holds MAX_TEXTS
+texts; when it's full, the next message has TABLE_RESET set and the
+client starts a new table before reading that message's definitions.
+
+Binary layout (little-endian):
+
+    message  type:u8 flags:u8 text:u16 defined:u16
+             defined x (id:u16 length:u16 utf-8)
+             [flags & HAS_WORDS]  count:u16, count x (word:u16 start:f32 end:f32 conf:f32)
+             [flags & HAS_EXTRA]  length:u16 json   (other fields, e.g. endpoint)
+
+    type     1 partial, 2 final, 3 command, 4 wake
+
+msgpack carries the same content, one map per message:
+{"t": type, "x": text, "d": {id: text}, "w": [[word, start, end, conf]],
+"e": {other fields}}, with "d", "w" and "e" left out when empty.
+"""
+
+import json
+import struct
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "json"
+BINARY = "binary"
+MSGPACK = "msgpack"
+RESULT_ENCODINGS = (JSON, BINARY, MSGPACK)
+
+TYPE_CODES = {"partial": 1, "final": 2, "command": 3, "wake": 4}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+
+HAS_WORDS = 1
+HAS_EXTRA = 2
+TABLE_RESET = 4
+
+MAX_TEXTS = 4096
+
+HEAD = struct.Struct("<BBHH")
+TEXT = struct.Struct("<HH")
+WORD = struct.Struct("<Hfff")
+COUNT = struct.Struct("<H")
+
+
+class TextTable:
+    """Per-connection text -> id map."""
+
+    def __init__(self, limit: int = MAX_TEXTS):
+        self.limit = limit
+        self.reset()
+
+    def reset(self):
+        self.ids = {"": 0}
+
+    def intern(self, text: str, defined: list) -> int:
+        """Id of `text`, adding it (and to `defined`) if it's new."""
+        text_id = self.ids.get(text)
+        if text_id is None:
+            text_id = self.ids[text] = len(self.ids)
+            defined.append((text_id, text))
+        return text_id
+
+
+class ResultEncoder:
+    """Encodes result messages for one connection."""
+
+    name = BINARY
+
+    def __init__(self, limit: int = MAX_TEXTS):
+        self.table = TextTable(limit)
+
+    def reset(self):
+        """Forget the texts sent; call when the client reconnects."""
+        self.table.reset()
+
+    def encode(self, message: dict) -> bytes:
+        """Encode one message; its "result" (Kaldi's word list) is sent as
+        word timings."""
+        if len(message) == 2 and self.name == BINARY:
+            # Just type and text: the partials that make up most messages
+            text = message.get("text")
+            text_id = self.table.ids.get(text)
+            if text_id is not None:
+                return HEAD.pack(TYPE_CODES[message["type"]], 0, text_id, 0)
+        words = message.get("result") or ()
+        flags = 0
+        # Worst case every text is new; start a table that has room
+        if len(self.table.ids) + 1 + len(words) > self.table.limit:
+            self.table.reset()
+            flags |= TABLE_RESET
+        defined = []
+        text_id = self.table.intern(message.get("text", ""), defined)
+        word_rows = [(self.table.intern(w["word"], defined), w.get("start", 0.0),
+                      w.get("end", 0.0), w.get("conf", 1.0)) for w in words]
+        extra = {k: v for k, v in message.items()
+                 if k not in ("type", "text", "result")}
+        if word_rows:
+            flags |= HAS_WORDS
+        if extra:
+            flags |= HAS_EXTRA
+        return self._pack(TYPE_CODES[message["type"]], flags, text_id,
+                          defined, word_rows, extra)
+
+    def _pack(self, code, flags, text_id, defined, word_rows, extra) -> bytes:
+        parts = [HEAD.pack(code, flags, text_id, len(defined))]
+        for def_id, text in defined:
+            data = text.encode()
+            parts.append(TEXT.pack(def_id, len(data)))
+            parts.append(data)
+        if word_rows:
+            parts.append(COUNT.pack(len(word_rows)))
+            parts.extend(WORD.pack(*row) for row in word_rows)
+        if extra:
+            data = json.dumps(extra).encode()
+            parts.append(COUNT.pack(len(data)))
+            parts.append(data)
+        return b"".join(parts)
+
+
+class MsgpackEncoder(ResultEncoder):
+
+    name = MSGPACK
+
+    def _pack(self, code, flags, text_id, defined, word_rows, extra) -> bytes:
+        message = {"t": code, "x": text_id}
+        if flags & TABLE_RESET:
+            message["r"] = True
+        if defined:
+            message["d"] = dict(defined)
+        if word_rows:
+            message["w"] = [list(row) for row in word_rows]
+        if extra:
+            message["e"] = extra
+        return msgpack.packb(message)
+
+
+def make_encoder(name: str):
+    """Encoder for a hello's "results" value; None for JSON.
+
+    Raises ValueError for an unknown encoding, or msgpack if it isn't
+    installed.
+    """
+    if name == JSON:
+        return None
+    if name == BINARY:
+        return ResultEncoder()
+    if name == MSGPACK:
+        if msgpack is None:
+            raise ValueError("msgpack results need the msgpack package")
+        return MsgpackEncoder()
+    raise ValueError(f"results must be one of {', '.join(RESULT_ENCODINGS)}")
+
+
+class ResultDecoder:
+    """Client side: turns compact frames back into message dicts, with word
+    timings as "result". Used by replay.py and the tests."""
+
+    def __init__(self, name: str = BINARY):
+        if name == MSGPACK and msgpack is None:
+            raise ValueError("msgpack results need the msgpack package")
+        self.name = name
+        self.texts = {0: ""}
+
+    def decode(self, frame: bytes) -> list:
+        if self.name == MSGPACK:
+            unpacker = msgpack.Unpacker(strict_map_key=False)
+            unpacker.feed(frame)
+            return [self._message(m["t"], m.get("r"), m["x"], m.get("d", {}).items(),
+                                  m.get("w", ()), m.get("e"))
+                    for m in unpacker]
+        messages = []
+        pos = 0
+        while pos < len(frame):
+            code, flags, text_id, count = HEAD.unpack_from(frame, pos)
+            pos += HEAD.size
+            defined = []
+            for _ in range(count):
+                def_id, length = TEXT.unpack_from(frame, pos)
+                pos += TEXT.size
+                defined.append((def_id, frame[pos:pos + length].decode()))
+                pos += length
+            word_rows = ()
+            if flags & HAS_WORDS:
+                (count,) = COUNT.unpack_from(frame, pos)
+                pos += COUNT.size
+                word_rows = [WORD.unpack_from(frame, pos + i * WORD.size)
+                             for i in range(count)]
+                pos += count * WORD.size
+            extra = None
+            if flags & HAS_EXTRA:
+                (length,) = COUNT.unpack_from(frame, pos)
+                pos += COUNT.size
+                extra = json.loads(frame[pos:pos + length])
+                pos += length
+            messages.append(self._message(code, flags & TABLE_RESET, text_id,
+                                          defined, word_rows, extra))
+        return messages
+
+    def _message(self, code, reset, text_id, defined, word_rows, extra) -> dict:
+        if reset:
+            self.texts = {0: ""}
+        for def_id, text in defined:
+            self.texts[int(def_id)] = text
+        message = {"type": TYPE_NAMES[code]}
+        if code != TYPE_CODES["wake"]:
+            message["text"] = self.texts[text_id]
+        if word_rows:
+            message["result"] = [
+                {"word": self.texts[w], "start": round(start, 3),
+                 "end": round(end, 3), "conf": round(conf, 4)}
+                for w, start, end, conf in word_rows]
+        if extra:
+            message.update(extra)
+        return message
@@ -7,39 +7,86 @@ the allowed command vocabulary.
 
 Usage:
     python server.py [--port 8765] [--model vosk-model-small-en-us-0.15]
+                     [--decode-workers 4] [--workers 1] [--pool-size 4]
+                     [--vad] [--wake-mode] [--grammar words|phrases]
+                     [--resolve-commands] [--partials change]
+                     [--frame-ms 100] [--metrics-port 9100]
+                     [--max-sessions 32] [--queue-ms 2000]
+                     [--overflow drop_oldest|latest|close]
+                     [--resume-grace 10] [--endpoint-silence-ms 500]
+                     [--endpoint-command-ms 250]
+                     [--vocab-file vocabulary.json] [--admin-token SECRET]
+                     [--secondary-model vosk-model-en-us-0.22]
+                     [--model-source https://mirror.example/vosk/]
+                     [--capture-dir captures/]
+                     [--backend fake --fake-cost-ms 5]
+                     [--unix-socket /tmp/vosk.sock]
+                     [--corrections corrections.jsonl]
 
 Connect from Flutter:
     ws://localhost:8765
-    Send: raw PCM audio (16-bit, 16kHz, mono)
+    Send: raw PCM audio (16-bit, 16kHz, mono, or as declared in a hello)
     Receive: JSON {"text": "...", "partial": "..."}
 """
 
 import asyncio
+import functools
+import hmac
 import json
 import logging
 import os
+import signal
+import socket
 import sys
-import urllib.request
-import zipfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack
 from pathlib import Path
 
 # Check for required packages
 try:
     import websockets
-    from vosk import Model, KaldiRecognizer, SetLogLevel
 except ImportError as e:
     print(f"Missing dependency: {e}")
     print("Install with: pip install -r requirements.txt")
     sys.exit(1)
 
-from vocabulary import get_grammar_string, VOCABULARY
+from backpressure import (DEFAULT_OVERFLOW, DEFAULT_QUEUE_MS,
+                          OVERFLOW_POLICIES, AudioQueue)
+from grammar import GRAMMAR_MODES, WORDS_MODE, get_grammar
+from intents import CommandResolver
+from audio_format import FORMAT_SETTINGS
+from backends import BACKENDS, DEFAULT_UTTERANCE_MS, FakeBackend, VoskBackend
+from capture import DEFAULT_SEGMENT_MB, CaptureWriter
+from corrections import (DEFAULT_MAX_DISTANCE, REFRESH_INTERVAL, CorrectionStore,
+                         normalize)
+from metrics import ServerMetrics
+from model_install import InstallError, install_model
+from partials import DEFAULT_POLICY, DEFAULT_RATE_HZ, POLICIES
+from prefork import bind_unix_socket
+from recognizer_pool import RecognizerPool
+from rescoring import DEFAULT_MAX_UNKNOWN, DEFAULT_MIN_CONFIDENCE, Rescorer
+from session import COMMAND_MODE, FINAL, WAKE, WAKE_MODE, Session
+from session_store import (DEFAULT_RESUME_GRACE, SessionEntry, SessionStore,
+                           token_from_path)
+from vad import VoiceActivityDetector
+from vocab_reload import (DEFAULT_VOCAB_FILE, DEFAULT_WATCH_INTERVAL,
+                          FileWatcher, install_vocabulary, load_vocabulary)
+from vocabulary import CONTEXTS, VOCABULARY, get_wake_grammar_string
 
 # Configuration
 DEFAULT_PORT = 8765
 SAMPLE_RATE = 16000
+BYTES_PER_MS = SAMPLE_RATE * 2 // 1000
 MODEL_DIR = Path(__file__).parent / "models"
 DEFAULT_MODEL = "vosk-model-small-en-us-0.15"
-MODEL_URL = f"https://alphacephei.com/vosk/models/{DEFAULT_MODEL}.zip"
+DEFAULT_DECODE_WORKERS = min(4, os.cpu_count() or 1)
+DEFAULT_POOL_SIZE = 4
+# Pending connections the kernel queues for accept(). Clients reconnect
+# every listening cycle, so bursts are normal; asyncio's default of 100
+# makes the overflow retry their SYN seconds later.
+LISTEN_BACKLOG = 1024
 
 # Logging
 logging.basicConfig(
@@ -49,124 +96,913 @@ logging.basicConfig(
 )
 log = logging.getLogger("vosk-server")
 
-# Reduce Vosk's internal logging
-SetLogLevel(-1)
 
+def download_model(model_name: str, source: str = None, sha256: str = None,
+                   progress=None) -> Path:
+    """Install a Vosk model into MODEL_DIR if not present.
 
-def download_model(model_name: str) -> Path:
-    """Download Vosk model if not present."""
-    model_path = MODEL_DIR / model_name
+    See model_install.install_model for `source`, `sha256` and `progress`.
+    """
+    return install_model(model_name, MODEL_DIR, source, sha256, progress=progress)
 
-    if model_path.exists():
-        log.info(f"Model found: {model_path}")
-        return model_path
 
-    MODEL_DIR.mkdir(parents=True, exist_ok=True)
-    zip_path = MODEL_DIR / f"{model_name}.zip"
+class VoskServer:
+    def __init__(self, model_path: Path, port: int = DEFAULT_PORT,
+                 decode_workers: int = DEFAULT_DECODE_WORKERS,
+                 pool_size: int = DEFAULT_POOL_SIZE, vad: bool = False,
+                 mode: str = COMMAND_MODE, grammar_mode: str = WORDS_MODE,
+                 resolve_commands: bool = False,
+                 partials: str = DEFAULT_POLICY,
+                 partial_rate: float = DEFAULT_RATE_HZ,
+                 frame_ms: int = 0, metrics_port: int = None,
+                 max_sessions: int = 0, queue_ms: int = DEFAULT_QUEUE_MS,
+                 overflow: str = DEFAULT_OVERFLOW,
+                 resume_grace: float = DEFAULT_RESUME_GRACE,
+                 endpoint_silence_ms: int = 0, endpoint_command_ms: int = 0,
+                 vocab_file: Path = DEFAULT_VOCAB_FILE,
+                 vocab_watch: float = DEFAULT_WATCH_INTERVAL,
+                 admin_token: str = None, secondary_model_path: Path = None,
+                 rescore_confidence: float = DEFAULT_MIN_CONFIDENCE,
+                 rescore_unknown: float = DEFAULT_MAX_UNKNOWN,
+                 capture_dir: Path = None,
+                 capture_segment_mb: float = DEFAULT_SEGMENT_MB,
+                 capture_keep: int = 0, backend=None,
+                 unix_socket: Path = None, corrections_file: Path = None,
+                 correction_distance: int = DEFAULT_MAX_DISTANCE):
+        self.port = port
+        # Where models and recognizers come from (see backends.py)
+        self.backend = backend if backend is not None else VoskBackend()
+        # Optional Unix domain socket for clients on this machine
+        self.unix_socket = unix_socket
+        self.metrics = ServerMetrics()
+        self.metrics_port = metrics_port
+        self.worker_slot = 0  # set by the pre-fork supervisor
+        # A model directory, or a callable(progress) that installs one and
+        # returns its path. Either way it's loaded by load(), which run()
+        # calls in the background unless it was called up front.
+        self.model_path = model_path
+        self.secondary_model_path = secondary_model_path
+        self.model = None
+        self.loaded = False
+        self.ready = asyncio.Event()
+        self.load_status = {"stage": "starting"}
+        self.vocab_file = vocab_file
+        self.vocab_watch = vocab_watch
+        self.vocab_watcher = None
+        self.admin_token = admin_token
+        self._reload_lock = asyncio.Lock()
+        self.grammar_mode = grammar_mode
+        self.grammar = None
+        self.wake_grammar = get_wake_grammar_string()
+        # Kaldi releases the GIL while decoding, so a thread pool lets
+        # sessions decode in parallel while the event loop keeps serving
+        # websocket traffic and pings. The pool is created in run() so no
+        # threads exist yet if the pre-fork supervisor forks this object.
+        self.decode_workers = max(1, decode_workers)
+        self.executor = None
+        self.vad = vad
+        self.mode = mode
+        self.resolver = CommandResolver()
+        self.resolve_commands = resolve_commands
+        self.partials = partials
+        self.partial_rate = partial_rate
+        self.frame_ms = frame_ms
+        # Admission control and backpressure
+        self.max_sessions = max_sessions
+        self.active_sessions = 0
+        self.queue_ms = queue_ms
+        self.overflow = overflow
+        # Disconnected sessions are parked for resume_grace seconds
+        self.sessions = SessionStore(resume_grace)
+        # Server-side endpointing (0 = leave it to Kaldi)
+        self.endpoint_silence_ms = endpoint_silence_ms
+        self.endpoint_command_ms = endpoint_command_ms
+        self.pool_size = pool_size
+        self.pool = None
+        self.live_sessions = set()  # connected and parked, for reloads
+        self.rescorer = None
+        self.rescore_confidence = rescore_confidence
+        self.rescore_unknown = rescore_unknown
+        # Opt-in tap recording each session for replay.py. The writer
+        # thread is started by run(), so pre-fork workers each get one.
+        self.capture_dir = capture_dir
+        self.capture_segment_mb = capture_segment_mb
+        self.capture_keep = capture_keep
+        self.capture = None
+        # Learned mishearing -> phrase corrections, shared by all clients
+        # (and, through the journal file, by pre-fork workers)
+        self.corrections = (CorrectionStore(corrections_file, correction_distance,
+                                            self.resolver)
+                            if corrections_file is not None else None)
+        self.metrics.add_collector(self._collect_stats)
 
-    if not zip_path.exists():
-        log.info(f"Downloading model from {MODEL_URL}...")
-        log.info("This may take a few minutes (50MB)...")
-        urllib.request.urlretrieve(MODEL_URL, zip_path)
-        log.info("Download complete.")
+    def load(self):
+        """Install and load the model(s), then pre-build recognizers.
 
-    log.info("Extracting model...")
-    with zipfile.ZipFile(zip_path, 'r') as zf:
-        zf.extractall(MODEL_DIR)
+        Blocks. run() calls it on a thread while already accepting
+        connections; the pre-fork supervisor calls it before forking so
+        the workers share the loaded model.
+        """
+        if self.loaded:
+            return
+        start = time.monotonic()
+        model_path = self._install(self.model_path)
+        self.load_status = {"stage": "loading"}
+        self.model = self.backend.load_model(model_path)
+        # Words from the data file, checked against the model's lexicon.
+        # Snapshot the file as loaded: a forked worker checks it on start.
+        self.vocab_watcher = FileWatcher(self.vocab_file) if self.vocab_file else None
+        if self.vocab_file is not None and Path(self.vocab_file).exists():
+            try:
+                install_vocabulary(*load_vocabulary(self.vocab_file, self.model))
+                log.info(f"Vocabulary file: {self.vocab_file}")
+            except (OSError, ValueError) as e:
+                log.error(f"Ignoring vocabulary file {self.vocab_file}: {e}")
+        if self.corrections is not None:
+            self.corrections.load()
+            log.info(f"Corrections: {len(self.corrections)} learned "
+                     f"({self.corrections.path})")
+        self.grammar = get_grammar(self.grammar_mode)
+        log.info(f"Loaded vocabulary: {len(VOCABULARY)} words "
+                 f"({self.grammar_mode} grammar)")
+        log.info(f"Sample words: {', '.join(VOCABULARY[:15])}...")
+        log.info(f"Decode workers: {self.decode_workers}")
 
-    # Clean up zip
-    zip_path.unlink()
-    log.info(f"Model ready: {model_path}")
+        # Pre-build recognizers so connecting doesn't compile the grammar
+        self.load_status = {"stage": "warming"}
+        pool_size = self.pool_size
+        grammars = 2 if self.mode == WAKE_MODE else 1
+        self.pool = RecognizerPool(self.create_recognizer,
+                                   max_idle=max(pool_size, 1) * grammars,
+                                   max_grammars=self.pool_grammars())
+        self.pool.prewarm(self.grammar, pool_size)
+        if self.mode == WAKE_MODE:
+            self.pool.prewarm(self.wake_grammar, pool_size)
+        log.info(f"Recognizer pool: {pool_size} pre-built")
 
-    return model_path
+        # Optional second pass over doubtful finals with a larger model
+        if self.secondary_model_path is not None:
+            secondary_path = self._install(self.secondary_model_path)
+            self.secondary_model = self.backend.load_model(secondary_path)
+            pool = RecognizerPool(
+                lambda grammar: self.create_recognizer(grammar, self.secondary_model),
+                max_idle=max(pool_size, 1), max_grammars=len(CONTEXTS) + 1)
+            self.rescorer = Rescorer(pool, self.rescore_confidence,
+                                     self.rescore_unknown)
+            pool.prewarm(self.grammar, 1)
+            log.info(f"Secondary model: {secondary_path} (rescoring "
+                     f"finals below {self.rescore_confidence:g} confidence or "
+                     f"{self.rescore_unknown:.0%} [unk])")
 
+        self.loaded = True
+        self.metrics.model_ready.set(1)
+        self.metrics.load_seconds.set(round(time.monotonic() - start, 3))
+        log.info(f"Ready in {time.monotonic() - start:.1f}s")
 
-class VoskServer:
-    def __init__(self, model_path: Path, port: int = DEFAULT_PORT):
-        self.port = port
-        self.model = Model(str(model_path))
-        self.grammar = get_grammar_string()
-        log.info(f"Loaded vocabulary: {len(VOCABULARY)} words")
-        log.info(f"Sample words: {', '.join(VOCABULARY[:15])}...")
+    def pool_grammars(self) -> int:
+        """Grammars the pool keeps: one per context, plus the full grammar
+        (and the wake grammar in wake mode)."""
+        return len(CONTEXTS) + (2 if self.mode == WAKE_MODE else 1)
+
+    async def _load_in_background(self):
+        """Run load() on a daemon thread, so Ctrl-C doesn't wait for a
+        download to finish."""
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+
+        def settle(error):
+            if done.done():
+                return
+            if error is None:
+                done.set_result(None)
+            else:
+                done.set_exception(error)
 
-    def create_recognizer(self) -> KaldiRecognizer:
+        def target():
+            error = None
+            try:
+                self.load()
+            except Exception as e:
+                error = e
+            try:
+                loop.call_soon_threadsafe(settle, error)
+            except RuntimeError:
+                pass  # the loop is gone; we're shutting down
+
+        threading.Thread(target=target, name="model-load", daemon=True).start()
+        await done
+
+    def _install(self, model_path) -> Path:
+        if not callable(model_path):
+            return model_path
+        self.load_status = {"stage": "installing"}
+
+        def progress(done, total):
+            status = {"stage": "installing", "bytes": done}
+            if total:
+                status["progress"] = round(done / total, 3)
+            self.load_status = status
+        return model_path(progress)
+
+    async def decode(self, func, *args):
+        """Run a blocking recognizer call on the decode executor."""
+        loop = asyncio.get_running_loop()
+        self.metrics.decode_pending.inc()
+        try:
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self.metrics.decode_pending.dec()
+
+    def create_recognizer(self, grammar: str = None, model=None):
         """Create a new recognizer with constrained grammar."""
-        rec = KaldiRecognizer(self.model, SAMPLE_RATE, self.grammar)
-        rec.SetWords(True)  # Include word-level timing
+        start = time.perf_counter()
+        rec = self.backend.create_recognizer(model or self.model,
+                                             grammar or self.grammar)
+        self.metrics.create_seconds.observe(time.perf_counter() - start)
         return rec
 
+    def _collect_stats(self, metrics: ServerMetrics):
+        metrics.parked_sessions.set(self.sessions.parked_count)
+        if self.pool is not None:
+            for stat, value in self.pool.stats().items():
+                metrics.pool.set(value, stat=stat)
+        if self.capture is not None:
+            for stat in ("recorded_bytes", "dropped_records", "dropped_bytes"):
+                metrics.capture.set(getattr(self.capture, stat), stat=stat)
+        if self.corrections is not None:
+            metrics.corrections.set(len(self.corrections), stat="entries")
+            metrics.corrections.set(self.corrections.journal_lines, stat="journal_lines")
+
     async def handle_client(self, websocket):
         """Handle a single WebSocket client connection."""
         client_id = id(websocket)
-        log.info(f"[{client_id}] Client connected")
+        if not self.ready.is_set():
+            try:
+                await self.wait_until_ready(websocket)
+            except websockets.exceptions.ConnectionClosed:
+                return
+        if self.max_sessions and self.active_sessions >= self.max_sessions:
+            # Turn the client away rather than slow every session down
+            log.warning(f"[{client_id}] Rejected: {self.active_sessions} "
+                        f"sessions active (max {self.max_sessions})")
+            self.metrics.rejected.inc()
+            try:
+                await websocket.send(json.dumps({"type": "busy"}))
+                await websocket.close(1013, "server busy")
+            except websockets.exceptions.ConnectionClosed:
+                pass
+            return
+
+        self.active_sessions += 1
+        self.metrics.active_sessions.inc()
+        try:
+            entry, resumed = await self.attach_session(websocket, client_id)
+        except BaseException:
+            self.active_sessions -= 1
+            self.metrics.active_sessions.dec()
+            raise
+        session, queue = entry.session, entry.queue
+        # Only clients that asked for a token can come back for the session
+        resumable = entry.token is not None
+        if session.result_encoder is not None:
+            session.result_encoder.reset()  # a new connection has no texts yet
+        capture = self.capture
+        if capture is not None:
+            session.capture_id = capture.open(
+                client=client_id, token=entry.token, resumed=resumed)
+
+        if resumable:
+            try:
+                await websocket.send(json.dumps({
+                    "type": "session", "token": entry.token, "resumed": resumed}))
+                # Finals decoded after the previous connection dropped
+                undelivered, session.undelivered = session.undelivered, []
+                await self.deliver(websocket, client_id, session, undelivered)
+            except websockets.exceptions.ConnectionClosed:
+                pass
 
-        recognizer = self.create_recognizer()
+        # The reader below only queues messages; the worker decodes them in
+        # arrival order, so a slow decode can't make the socket buffer grow
+        # without bound.
+        worker = asyncio.create_task(
+            self.process_queue(websocket, client_id, session, queue))
+        closing = None
 
         try:
             async for message in websocket:
+                if closing is not None:
+                    continue  # read on until the client's close frame
                 if isinstance(message, bytes):
-                    # Process audio chunk
-                    if recognizer.AcceptWaveform(message):
-                        # Final result for this utterance
-                        result = json.loads(recognizer.Result())
-                        text = result.get("text", "").strip()
-                        log.debug(f"[{client_id}] Vosk result: {result}")
-                        if text:
-                            log.info(f"[{client_id}] Final: \"{text}\"")
-                            response = json.dumps({"type": "final", "text": text})
-                            log.debug(f"[{client_id}] Sending: {response}")
-                            await websocket.send(response)
-                        else:
-                            log.debug(f"[{client_id}] Empty final result, skipping")
-                    else:
-                        # Partial result
-                        partial = json.loads(recognizer.PartialResult())
-                        partial_text = partial.get("partial", "").strip()
-                        if partial_text:
-                            response = json.dumps({"type": "partial", "text": partial_text})
-                            await websocket.send(response)
+                    self.metrics.audio_bytes.inc(len(message))
+                    if capture is not None:
+                        capture.audio(session.capture_id, message)
+                    dropped = queue.put_audio(message)
+                    if dropped < 0:
+                        log.warning(f"[{client_id}] Decoding fell behind, "
+                                    "closing connection")
+                        resumable = False
+                        # Not awaited here: the client's close frame may be
+                        # queued behind audio that only this loop reads
+                        closing = asyncio.create_task(
+                            websocket.close(1013, "decoding fell behind"))
+                        continue
+                    if dropped:
+                        self.metrics.audio_dropped.inc(dropped)
+                        if queue.dropped_bytes == dropped:
+                            # Warn once; the total is logged on disconnect
+                            log.warning(f"[{client_id}] Decoding fell behind, "
+                                        f"dropping audio ({self.overflow})")
 
                 elif isinstance(message, str):
-                    # Handle control messages
+                    if capture is not None:
+                        capture.control(session.capture_id, message)
+                    # Control messages are queued too, to keep their order
+                    # relative to the audio (e.g. eof after the last chunk)
                     try:
                         data = json.loads(message)
-                        if data.get("type") == "reset":
-                            recognizer = self.create_recognizer()
-                            log.info(f"[{client_id}] Recognizer reset")
-                        elif data.get("type") == "eof":
-                            # End of stream - get final result
-                            result = json.loads(recognizer.FinalResult())
-                            text = result.get("text", "").strip()
-                            if text:
-                                log.info(f"[{client_id}] EOF Final: \"{text}\"")
-                                await websocket.send(json.dumps({
-                                    "type": "final",
-                                    "text": text
-                                }))
                     except json.JSONDecodeError:
-                        pass
+                        continue
+                    if isinstance(data, dict):
+                        queue.put_control(data)
 
         except websockets.exceptions.ConnectionClosed:
             log.info(f"[{client_id}] Connection closed")
         except Exception as e:
             log.error(f"[{client_id}] Error: {e}")
         finally:
-            log.info(f"[{client_id}] Client disconnected")
+            # Let the worker finish its current decode before the session is
+            # parked or its recognizers go back to the pool
+            if resumable:
+                queue.detach()
+            else:
+                queue.close()
+            await worker
+            if closing is not None:
+                await closing
+            if capture is not None:
+                capture.finish(session.capture_id)
+            if session.partial_timer:
+                session.partial_timer.cancel()
+                session.partial_timer = None
+            self.active_sessions -= 1
+            self.metrics.active_sessions.dec()
+            self.metrics.session_rtf.remove(session=client_id)
+            if resumable:
+                self.sessions.park(entry, asyncio.get_running_loop().time())
+                log.info(f"[{client_id}] Client disconnected, session parked "
+                         f"for {self.sessions.grace:g}s")
+            else:
+                self.sessions.remove(entry)
+                entry.parked.set()  # wake a connection waiting to take over
+                log.info(f"[{client_id}] Client disconnected")
+                await self.close_session(client_id, entry)
+
+    async def wait_until_ready(self, websocket):
+        """Keep a client that connected during startup posted until the
+        model is loaded.
+
+        Sends {"type": "loading", "stage": ...} (with "progress" while the
+        model downloads) whenever the status changes, at most once a
+        second, then {"type": "ready"}.
+        """
+        sent = None
+        while not self.ready.is_set():
+            status = self.load_status
+            if status != sent:
+                await websocket.send(json.dumps({"type": "loading", **status}))
+                sent = status
+            try:
+                await asyncio.wait_for(asyncio.shield(self.ready.wait()), 1.0)
+            except asyncio.TimeoutError:
+                pass
+        await websocket.send(json.dumps({"type": "ready"}))
+
+    async def attach_session(self, websocket, client_id):
+        """Resume the session named in the request, or start a new one.
+
+        Returns (entry, resumed).
+        """
+        request = getattr(websocket, "request", None)
+        token = token_from_path(request.path if request else "")
+        entry = self.sessions.get(token) if self.sessions.grace > 0 else None
+        if entry is not None and entry.websocket is not None:
+            # The old connection hasn't noticed it's dead yet; take over
+            log.info(f"[{client_id}] Taking over session from "
+                     f"[{id(entry.websocket)}]")
+            await entry.websocket.close(1000, "session resumed elsewhere")
+            await entry.parked.wait()
+            entry = self.sessions.get(token)  # unless the reaper got it
+
+        if entry is not None:
+            self.sessions.attach(entry, websocket)
+            entry.queue.attach()
+            log.info(f"[{client_id}] Client reconnected, session resumed "
+                     f"({len(entry.queue)} messages pending)")
+            return entry, True
+
+        if token:
+            log.info(f"[{client_id}] Unknown or expired session, starting anew")
+        log.info(f"[{client_id}] Client connected")
+        session = await self.decode(
+            Session, self.pool, self.grammar, self.wake_grammar,
+            VoiceActivityDetector(SAMPLE_RATE, enabled=self.vad), self.mode)
+        session.resolve_commands = self.resolve_commands
+        session.partials.configure(self.partials, self.partial_rate)
+        session.set_frame_ms(self.frame_ms, SAMPLE_RATE)
+        session.endpointer.configure(silence_ms=self.endpoint_silence_ms,
+                                     command_ms=self.endpoint_command_ms)
+        session.endpointer.is_complete = self.resolver.is_complete
+        session.metrics = self.metrics
+        session.rescorer = self.rescorer
+        self.live_sessions.add(session)
+        queue = AudioQueue(self.queue_ms * BYTES_PER_MS, self.overflow)
+        if token is None or self.sessions.grace <= 0:
+            # Not resumable: no token, nothing to keep in the store
+            return SessionEntry(None, session, queue, websocket), False
+        return self.sessions.add(session, queue, websocket), False
+
+    async def close_session(self, client_id, entry):
+        """Release a session's recognizers for good."""
+        await self.decode(entry.session.close)
+        self.live_sessions.discard(entry.session)
+        if entry.queue.dropped_bytes:
+            log.warning(f"[{client_id}] Dropped "
+                        f"{entry.queue.dropped_bytes / entry.session.input_bytes_per_ms:.0f} "
+                        "ms of audio")
+        log.info(f"[{client_id}] Session closed (rtf "
+                 f"{entry.session.real_time_factor():.3f})")
+
+    async def reap_sessions(self, interval: float = 1.0):
+        """Close parked sessions whose grace window has run out. Runs forever."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            for entry in self.sessions.expired(loop.time()):
+                await self.close_session(entry.token[:8], entry)
+
+    async def reload_vocabulary(self, reason: str) -> dict:
+        """Reload the vocabulary file and move sessions to the new grammar.
+
+        The file is read and validated and the new grammar compiled on the
+        decode executor while sessions keep using the old one. Each session
+        then switches at its next utterance boundary. On any error the
+        current vocabulary stays in place.
+        """
+        if self.vocab_file is None:
+            return {"ok": False, "error": "No vocabulary file configured"}
+        async with self._reload_lock:
+            self.vocab_watcher.changed()  # this reload covers any change
+            try:
+                words, contexts = await self.decode(
+                    load_vocabulary, self.vocab_file, self.model)
+            except (OSError, ValueError) as e:
+                log.error(f"Vocabulary reload ({reason}) failed: {e}")
+                return {"ok": False, "error": str(e)}
 
-    async def run(self):
-        """Start the WebSocket server."""
+            old = {self.grammar} | {self.session_grammar(name) for name in CONTEXTS}
+            added = len(set(words) - set(VOCABULARY))
+            removed = len(set(VOCABULARY) - set(words))
+            install_vocabulary(words, contexts)
+            grammar = get_grammar(self.grammar_mode)
+            unused = old - {self.session_grammar(name) for name in [None, *CONTEXTS]}
+            pools = [self.pool]
+            if self.rescorer is not None:
+                pools.append(self.rescorer.pool)
+            # The old grammars' idle recognizers would fill the pool and
+            # cut the prewarm short
+            for pool in pools:
+                pool.retire(unused)
+            # Room for contexts the file added
+            self.pool.set_max_grammars(self.pool_grammars())
+            if self.rescorer is not None:
+                self.rescorer.pool.set_max_grammars(len(CONTEXTS) + 1)
+            await self.decode(self.pool.prewarm, grammar, self.pool_size)
+            if self.rescorer is not None:
+                await self.decode(self.rescorer.pool.prewarm, grammar, 1)
+
+            self.grammar = grammar
+            for session in list(self.live_sessions):
+                session.request_grammar(self.session_grammar(session.context))
+            # Again, for sessions that connected during the prewarm
+            for pool in pools:
+                pool.retire(unused)
+            log.info(f"Vocabulary reloaded ({reason}): {len(VOCABULARY)} words, "
+                     f"+{added} -{removed}, {len(self.live_sessions)} sessions "
+                     "switching at their next utterance boundary")
+            return {"ok": True, "words": len(VOCABULARY),
+                    "added": added, "removed": removed}
+
+    async def refresh_corrections(self):
+        """Pick up corrections other workers learned. Runs forever."""
+        while True:
+            await asyncio.sleep(REFRESH_INTERVAL)
+            try:
+                await self.decode(self.corrections.refresh)
+            except OSError as e:
+                log.warning(f"Could not read corrections: {e}")
+
+    def session_grammar(self, context=None) -> str:
+        """The current grammar for a context (None = full grammar)."""
+        try:
+            return get_grammar(self.grammar_mode, context)
+        except KeyError:
+            return self.grammar  # the context is gone
+
+    async def watch_vocabulary(self):
+        """Reload the vocabulary file whenever it changes. Runs forever."""
+        while True:
+            await asyncio.sleep(self.vocab_watch)
+            if self.vocab_watcher.changed():
+                await self.reload_vocabulary("file changed")
+
+    async def process_queue(self, websocket, client_id, session: Session,
+                            queue: AudioQueue):
+        """Decode a session's queued messages until the queue is closed."""
+        try:
+            while (item := await queue.get()) is not None:
+                is_audio, message = item
+                if is_audio:
+                    events = await self.decode(session.feed, message)
+                    self.metrics.session_rtf.set(
+                        round(session.real_time_factor(), 4), session=client_id)
+                    await self.deliver(websocket, client_id, session, events)
+                else:
+                    await self.handle_control(websocket, client_id, session, message)
+                    if message.get("type") == "hello":
+                        # Queue the same duration in the client's format
+                        queue.max_bytes = int(self.queue_ms * session.input_bytes_per_ms)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        except Exception as e:
+            log.error(f"[{client_id}] Error: {e}")
+            await websocket.close(1011, "internal error")
+
+    async def deliver(self, websocket, client_id, session: Session, events: list):
+        """Send result events. If the connection drops, finals that didn't
+        go out are kept on the session for a resumed connection."""
+        for i, (kind, result) in enumerate(events):
+            try:
+                await self.send_result(websocket, client_id, session, kind, result)
+            except websockets.exceptions.ConnectionClosed:
+                # Partials are stale by the time the client is back
+                session.undelivered.extend(
+                    event for event in events[i:] if event[0] == FINAL)
+                raise
+
+    async def handle_control(self, websocket, client_id, session: Session,
+                             data: dict):
+        """Handle one JSON control message from a client."""
+        msg_type = data.get("type")
+        if msg_type == "hello":
+            await self.handle_hello(websocket, client_id, session, data)
+        elif msg_type == "reset":
+            await self.decode(session.reset)
+            log.info(f"[{client_id}] Recognizer reset")
+        elif msg_type == "vad":
+            # Toggle/tune voice activity detection
+            settings = {k: v for k, v in data.items() if k != "type"}
+            try:
+                config = session.vad.configure(**settings)
+            except (TypeError, ValueError) as e:
+                await websocket.send(json.dumps({
+                    "type": "error",
+                    "message": str(e),
+                }))
+            else:
+                log.info(f"[{client_id}] VAD: {config}")
+                await websocket.send(json.dumps({"type": "vad", **config}))
+        elif msg_type == "endpoint":
+            # Tune server-side endpointing
+            settings = {k: v for k, v in data.items() if k != "type"}
+            try:
+                config = session.endpointer.configure(**settings)
+            except (TypeError, ValueError) as e:
+                await websocket.send(json.dumps({
+                    "type": "error",
+                    "message": str(e),
+                }))
+            else:
+                log.info(f"[{client_id}] Endpoint: {config}")
+                await websocket.send(json.dumps({"type": "endpoint", **config}))
+        elif msg_type == "mode":
+            # Switch between full-command and wake-word listening
+            try:
+                config = await self.decode(
+                    session.set_mode, data.get("mode", session.mode),
+                    data.get("wake_timeout_ms"))
+            except (TypeError, ValueError) as e:
+                await websocket.send(json.dumps({
+                    "type": "error",
+                    "message": str(e),
+                }))
+            else:
+                log.info(f"[{client_id}] Mode: {config}")
+                await websocket.send(json.dumps({"type": "mode", **config}))
+        elif msg_type == "context":
+            # Switch to a screen's smaller grammar (no name = full grammar)
+            name = data.get("name")
+            try:
+                grammar = get_grammar(self.grammar_mode, name)
+            except (KeyError, TypeError):
+                await websocket.send(json.dumps({
+                    "type": "error",
+                    "message": f"Unknown context: {name}",
+                }))
+            else:
+                await self.decode(session.set_grammar, grammar, name)
+                log.info(f"[{client_id}] Context: {name or 'all'}")
+                await websocket.send(json.dumps({
+                    "type": "context", "name": name}))
+        elif msg_type == "resolve":
+            # Turn server-side command resolution on or off
+            session.resolve_commands = bool(data.get("enabled", True))
+            await websocket.send(json.dumps({
+                "type": "resolve", "enabled": session.resolve_commands}))
+        elif msg_type in ("learn", "forget"):
+            # Teach or unteach a correction, for every client
+            await self.handle_correction(websocket, client_id, data)
+        elif msg_type == "reload":
+            # Admin: reload the vocabulary file
+            token = data.get("token")
+            if not (self.admin_token and isinstance(token, str)
+                    and hmac.compare_digest(token, self.admin_token)):
+                await websocket.send(json.dumps({
+                    "type": "error",
+                    "message": "Not allowed",
+                }))
+            else:
+                result = await self.reload_vocabulary(f"admin [{client_id}]")
+                await websocket.send(json.dumps({"type": "reload", **result}))
+        elif msg_type == "stats":
+            stats = {"type": "stats", "pool": self.pool.stats(),
+                     "session": {
+                         "audio_seconds": round(
+                             session.audio_bytes / BYTES_PER_MS / 1000, 3),
+                         "decode_seconds": round(session.decode_seconds, 4)}}
+            if self.rescorer is not None:
+                stats["secondary_pool"] = self.rescorer.pool.stats()
+            await websocket.send(json.dumps(stats))
+        elif msg_type == "eof":
+            # End of stream - get final result
+            events = await self.decode(session.finish)
+            await self.deliver(websocket, client_id, session, events)
+
+    async def handle_correction(self, websocket, client_id, data: dict):
+        """{"type": "learn", "heard": ..., "text": ...} or
+        {"type": "forget", "heard": ...}, answered with the normalized
+        phrases and the store's size."""
+        msg_type = data["type"]
+        try:
+            if self.corrections is None:
+                raise ValueError("Corrections are off (start the server "
+                                 "with --corrections FILE)")
+            heard = data.get("heard")
+            if not isinstance(heard, str):
+                raise ValueError(f"{msg_type} needs 'heard'")
+            if msg_type == "learn":
+                text = data.get("text")
+                if not isinstance(text, str):
+                    raise ValueError("learn needs 'text'")
+                heard, text = await self.decode(self.corrections.learn, heard, text)
+                reply = {"type": "learn", "heard": heard, "text": text}
+                log.info(f"[{client_id}] Learned: \"{heard}\" -> \"{text}\"")
+            else:
+                removed = await self.decode(self.corrections.forget, heard)
+                heard = normalize(heard)
+                reply = {"type": "forget", "heard": heard, "removed": removed}
+                log.info(f"[{client_id}] Forgot: \"{heard}\" ({removed})")
+        except (OSError, ValueError) as e:
+            await websocket.send(json.dumps({
+                "type": "error",
+                "message": str(e),
+            }))
+            return
+        await websocket.send(json.dumps({**reply, "size": len(self.corrections)}))
+
+    async def handle_hello(self, websocket, client_id, session: Session,
+                           data: dict):
+        """Negotiate session options from the client's handshake message.
+
+        {"type": "hello", "partials": "rate", "partial_rate": 4,
+         "frame_ms": 100, "sample_rate": 48000, "channels": 2,
+         "encoding": "float32", "gain": "auto", "results": "binary",
+         "corrections": false}
+        is answered with the settings actually in effect.
+        """
+        try:
+            # A rejected hello leaves the session as it was
+            config = session.negotiate(
+                partials=data.get("partials"),
+                partial_rate=data.get("partial_rate"),
+                frame_ms=data.get("frame_ms"),
+                results=data.get("results"),
+                **{key: data[key] for key in FORMAT_SETTINGS if key in data})
+            if "corrections" in data:
+                session.apply_corrections = bool(data["corrections"])
+            if self.corrections is not None:
+                config["corrections"] = session.apply_corrections
+        except (TypeError, ValueError) as e:
+            await websocket.send(json.dumps({
+                "type": "error",
+                "message": str(e),
+            }))
+            return
+        log.info(f"[{client_id}] Hello: {config}")
+        await websocket.send(json.dumps({"type": "hello", **config}))
+
+    async def send_result(self, websocket, client_id, session: Session,
+                          kind: str, result: dict):
+        """Send one recognizer result to the client, skipping empty ones.
+
+        A final that a learned correction matches is rewritten, keeping
+        what was heard in "heard". If the session resolves commands, a
+        final that matches one is followed by a {"type": "command"}
+        message.
+        """
+        if kind == WAKE:
+            log.info(f"[{client_id}] Wake word detected")
+            await self.send_event(websocket, session, {"type": "wake"})
+            self.metrics.messages.inc(type="wake")
+        elif kind == FINAL:
+            # A final supersedes any partial still waiting to be sent
+            session.partials.reset()
+            if session.partial_timer:
+                session.partial_timer.cancel()
+                session.partial_timer = None
+            text = result.get("text", "").strip()
+            log.debug(f"[{client_id}] Vosk result: {result}")
+            words = result.get("result")
+            if text and self.corrections is not None and session.apply_corrections:
+                corrected = await self.decode(self.corrections.correct, text)
+                if corrected is not None:
+                    heard, (text, how) = text, corrected
+                    words = None  # the timings are of the words heard
+                    log.info(f"[{client_id}] Corrected ({how}): "
+                             f"\"{heard}\" -> \"{text}\"")
+                    self.metrics.corrected.inc(match=how)
+                    result = {**result, "heard": heard}
+            if text:
+                message = {"type": "final", "text": text}
+                # What ended the utterance, how long after the last word,
+                # and whether the secondary model decoded it again
+                for key in ("endpoint", "latency_ms", "rescored", "first_pass",
+                            "heard"):
+                    if key in result:
+                        message[key] = result[key]
+                if words:
+                    message["result"] = words  # compact encodings only
+                log.info(f"[{client_id}] Final: \"{text}\" "
+                         f"({result.get('endpoint')}, "
+                         f"{result.get('latency_ms', '?')} ms)")
+                log.debug(f"[{client_id}] Sending: {message}")
+                messages = [message]
+                if session.resolve_commands:
+                    intent = self.resolver.resolve(text, words)
+                    if intent:
+                        log.info(f"[{client_id}] Command: {intent}")
+                        messages.append({"type": "command", **intent, "text": text})
+                await self.send_event(websocket, session, *messages)
+                for sent in messages:
+                    self.metrics.messages.inc(type=sent["type"])
+            else:
+                log.debug(f"[{client_id}] Empty final result, skipping")
+        else:
+            loop = asyncio.get_running_loop()
+            partial_text = session.partials.offer(
+                result.get("partial", "").strip(), loop.time())
+            if partial_text:
+                await self.send_event(websocket, session,
+                                      {"type": "partial", "text": partial_text})
+                self.metrics.messages.inc(type="partial")
+            flush_at = session.partials.flush_at()
+            if flush_at is not None and session.partial_timer is None:
+                # Rate-limited: send the latest partial when its slot opens
+                session.partial_timer = loop.call_at(
+                    flush_at, self._flush_partial, websocket, session)
+
+    def _flush_partial(self, websocket, session: Session):
+        """Timer callback sending a coalesced partial."""
+        session.partial_timer = None
+        text = session.partials.take_pending(asyncio.get_running_loop().time())
+        if text:
+            self.metrics.messages.inc(type="partial")
+            asyncio.ensure_future(self._send_quietly(
+                websocket, session, {"type": "partial", "text": text}))
+
+    async def _send_quietly(self, websocket, session: Session, message: dict):
+        try:
+            await self.send_event(websocket, session, message)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    async def send_event(self, websocket, session: Session, *messages: dict):
+        """Send result messages in the session's encoding, recording them
+        if sessions are captured.
+
+        Compact encodings put all the messages in one frame and send a
+        final's "result" (word timings); JSON sends one frame per message
+        without it.
+        """
+        json_messages = None
+        if session.result_encoder is None or self.capture is not None:
+            json_messages = [json.dumps({k: v for k, v in m.items() if k != "result"})
+                             if "result" in m else json.dumps(m) for m in messages]
+        if self.capture is not None and session.capture_id is not None:
+            for text in json_messages:
+                self.capture.event(session.capture_id, text)
+        if session.result_encoder is None:
+            for text in json_messages:
+                await websocket.send(text)
+        else:
+            encode = session.result_encoder.encode
+            await websocket.send(b"".join(encode(m) for m in messages))
+
+    async def run(self, socks=None):
+        """Start the WebSocket server.
+
+        If socks is given, serve on those already-listening sockets (used by
+        pre-fork workers) instead of binding the port here.
+        """
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.decode_workers,
+            thread_name_prefix="decode",
+        )
+        self.ready = asyncio.Event()
         log.info(f"Starting Vosk server on ws://localhost:{self.port}")
+        if self.capture_dir is not None:
+            self.capture = CaptureWriter(
+                self.capture_dir, int(self.capture_segment_mb * (1 << 20)),
+                keep=self.capture_keep)
+            self.capture.start()
         log.info("Constrained vocabulary mode - only command words recognized")
-        log.info("Waiting for connections...")
 
-        async with websockets.serve(
-            self.handle_client,
-            "localhost",
-            self.port,
-            ping_interval=20,
-            ping_timeout=60,
-        ):
-            await asyncio.Future()  # Run forever
+        options = dict(ping_interval=20, ping_timeout=60)
+        # Compressing frames that never leave the machine only costs CPU
+        local_options = dict(options, compression=None)
+        async with AsyncExitStack() as stack:
+            # Listen first: clients that connect while the model loads are
+            # told to wait instead of being refused
+            if socks:
+                for sock in socks:
+                    await stack.enter_async_context(websockets.serve(
+                        self.handle_client, sock=sock,
+                        **(local_options if sock.family == getattr(socket, "AF_UNIX", None)
+                           else options)))
+            else:
+                await stack.enter_async_context(websockets.serve(
+                    self.handle_client, "localhost", self.port,
+                    backlog=LISTEN_BACKLOG, **options))
+                if self.unix_socket is not None:
+                    sock = bind_unix_socket(self.unix_socket, LISTEN_BACKLOG)
+                    stack.callback(Path(self.unix_socket).unlink, missing_ok=True)
+                    await stack.enter_async_context(websockets.serve(
+                        self.handle_client, sock=sock, **local_options))
+                    log.info(f"Also listening on unix:{self.unix_socket}")
+            if self.metrics_port is not None:
+                # Pre-fork workers each get their own port: base + slot
+                metrics_server = await self.metrics.serve(
+                    self.metrics_port + self.worker_slot)
+                stack.push_async_callback(metrics_server.wait_closed)
+                stack.callback(metrics_server.close)
+                lag_task = asyncio.create_task(self.metrics.sample_loop_lag())
+                stack.callback(lag_task.cancel)
+            if not self.loaded:
+                try:
+                    await self._load_in_background()
+                except Exception as e:
+                    log.error(f"Could not load the model: {e}")
+                    raise
+            self.ready.set()
+            log.info("Waiting for connections...")
+            reaper = asyncio.create_task(self.reap_sessions())
+            stack.callback(reaper.cancel)
+            if self.vocab_file is not None:
+                if self.vocab_watcher.changed():
+                    # Edited since load (e.g. a worker restarted after a reload)
+                    asyncio.ensure_future(self.reload_vocabulary("changed since load"))
+                if self.vocab_watch > 0:
+                    watcher = asyncio.create_task(self.watch_vocabulary())
+                    stack.callback(watcher.cancel)
+                if hasattr(signal, "SIGHUP"):
+                    loop = asyncio.get_running_loop()
+                    try:
+                        loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.ensure_future(
+                            self.reload_vocabulary("SIGHUP")))
+                        stack.callback(loop.remove_signal_handler, signal.SIGHUP)
+                    except (RuntimeError, NotImplementedError) as e:
+                        # Not on the main thread (an embedded server)
+                        log.warning(f"No SIGHUP reload: {e}")
+            if self.corrections is not None and self.corrections.path is not None:
+                # Forked workers start from the parent's copy; catch up now
+                await self.decode(self.corrections.refresh)
+                refresher = asyncio.create_task(self.refresh_corrections())
+                stack.callback(refresher.cancel)
+            try:
+                await asyncio.Future()  # Run forever
+            finally:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                if self.capture is not None:
+                    self.capture.close()
 
 
 def main():
@@ -177,18 +1013,205 @@ def main():
                         help=f"WebSocket port (default: {DEFAULT_PORT})")
     parser.add_argument("--model", type=str, default=DEFAULT_MODEL,
                         help=f"Model name (default: {DEFAULT_MODEL})")
+    parser.add_argument("--model-source", type=str, default=None,
+                        help="Where to get models that aren't installed: a "
+                             "mirror URL or directory holding <model>.zip, "
+                             "or one .zip URL or path (default: the Vosk "
+                             "model site)")
+    parser.add_argument("--model-sha256", type=str, default=None,
+                        help="Expected SHA-256 of the model archive")
+    parser.add_argument("--decode-workers", type=int,
+                        default=DEFAULT_DECODE_WORKERS,
+                        help="Threads used for Kaldi decoding "
+                             f"(default: {DEFAULT_DECODE_WORKERS})")
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE,
+                        help="Recognizers pre-built and kept idle for reuse "
+                             f"(default: {DEFAULT_POOL_SIZE})")
+    parser.add_argument("--vad", action="store_true",
+                        help="Skip decoding silence with voice activity "
+                             "detection (clients can toggle it per session)")
+    parser.add_argument("--wake-mode", action="store_true",
+                        help="Start sessions idle on a wake-word-only grammar "
+                             "and switch to the full grammar after the wake word")
+    parser.add_argument("--grammar", choices=sorted(GRAMMAR_MODES),
+                        default=WORDS_MODE,
+                        help="'words' allows any sequence of vocabulary words; "
+                             "'phrases' only whole command phrases "
+                             f"(default: {WORDS_MODE})")
+    parser.add_argument("--resolve-commands", action="store_true",
+                        help="Follow each final with a structured "
+                             "{\"type\": \"command\"} message when it "
+                             "matches a known command")
+    parser.add_argument("--partials", choices=POLICIES, default=DEFAULT_POLICY,
+                        help="Default partial-result policy; clients may "
+                             f"override it in their hello (default: {DEFAULT_POLICY})")
+    parser.add_argument("--partial-rate", type=float, default=DEFAULT_RATE_HZ,
+                        help="Max partials per second for the 'rate' policy "
+                             f"(default: {DEFAULT_RATE_HZ})")
+    parser.add_argument("--frame-ms", type=int, default=0,
+                        help="Re-frame incoming audio into fixed frames of "
+                             "this many ms before decoding (default: 0, "
+                             "decode chunks as received)")
+    parser.add_argument("--max-sessions", type=int, default=0,
+                        help="Reject new connections with {\"type\": \"busy\"} "
+                             "beyond this many sessions (default: 0, no limit)")
+    parser.add_argument("--queue-ms", type=int, default=DEFAULT_QUEUE_MS,
+                        help="Audio buffered per session while waiting to be "
+                             f"decoded (default: {DEFAULT_QUEUE_MS})")
+    parser.add_argument("--overflow", choices=OVERFLOW_POLICIES,
+                        default=DEFAULT_OVERFLOW,
+                        help="What to do when a session's queue is full "
+                             f"(default: {DEFAULT_OVERFLOW})")
+    parser.add_argument("--resume-grace", type=float,
+                        default=DEFAULT_RESUME_GRACE,
+                        help="Seconds a disconnected session is kept for the "
+                             "client to resume with its token (default: "
+                             f"{DEFAULT_RESUME_GRACE:g}, 0 = no resume)")
+    parser.add_argument("--endpoint-silence-ms", type=int, default=0,
+                        help="Force a final once the partial has been "
+                             "unchanged for this much audio (default: 0, "
+                             "Kaldi's own endpointing only)")
+    parser.add_argument("--endpoint-command-ms", type=int, default=0,
+                        help="Force a final once the partial is a complete "
+                             "command unchanged for this much audio "
+                             "(default: 0, off)")
+    parser.add_argument("--vocab-file", type=Path, default=DEFAULT_VOCAB_FILE,
+                        help="JSON/YAML file of extra vocabulary words, "
+                             "reloaded on change, SIGHUP or an admin "
+                             "{\"type\": \"reload\"} (default: "
+                             f"{DEFAULT_VOCAB_FILE.name} next to server.py)")
+    parser.add_argument("--vocab-watch", type=float,
+                        default=DEFAULT_WATCH_INTERVAL,
+                        help="Seconds between checks of the vocabulary file "
+                             f"(default: {DEFAULT_WATCH_INTERVAL:g}, 0 = don't watch)")
+    parser.add_argument("--admin-token", type=str, default=None,
+                        help="Token clients must send to use admin control "
+                             "messages (default: admin messages disabled)")
+    parser.add_argument("--secondary-model", type=str, default=None,
+                        help="Larger model that decodes again any final with "
+                             "low confidence or mostly [unk] (default: off)")
+    parser.add_argument("--rescore-confidence", type=float,
+                        default=DEFAULT_MIN_CONFIDENCE,
+                        help="Rescore finals whose mean word confidence is "
+                             f"below this (default: {DEFAULT_MIN_CONFIDENCE:g})")
+    parser.add_argument("--rescore-unknown", type=float,
+                        default=DEFAULT_MAX_UNKNOWN,
+                        help="Rescore finals with at least this share of "
+                             f"[unk] words (default: {DEFAULT_MAX_UNKNOWN:g})")
+    parser.add_argument("--capture-dir", type=Path, default=None,
+                        help="Record every session's audio, control messages "
+                             "and results here, for replay.py (default: off)")
+    parser.add_argument("--capture-segment-mb", type=float,
+                        default=DEFAULT_SEGMENT_MB,
+                        help="Start a new capture file after this many MB "
+                             f"(default: {DEFAULT_SEGMENT_MB})")
+    parser.add_argument("--capture-keep", type=int, default=0,
+                        help="Keep only the newest N capture files per "
+                             "process (default: 0, keep all)")
+    parser.add_argument("--unix-socket", type=Path, default=None,
+                        help="Also listen on this Unix domain socket, for "
+                             "clients on the same machine (default: off)")
+    parser.add_argument("--corrections", type=Path, default=None,
+                        help="Learn and apply corrections for misheard "
+                             "phrases, kept in this file (default: off)")
+    parser.add_argument("--correction-distance", type=int,
+                        default=DEFAULT_MAX_DISTANCE,
+                        help="Largest sound-alike distance a correction "
+                             f"still applies at (default: {DEFAULT_MAX_DISTANCE})")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="vosk",
+                        help="'fake' plays scripted results without a model, "
+                             "to test or benchmark the server itself "
+                             "(default: vosk)")
+    parser.add_argument("--fake-cost-ms", type=float, default=0.0,
+                        help="Decode time the fake backend spends per chunk "
+                             "(default: 0)")
+    parser.add_argument("--fake-utterance-ms", type=float,
+                        default=DEFAULT_UTTERANCE_MS,
+                        help="Audio per scripted phrase of the fake backend "
+                             f"(default: {DEFAULT_UTTERANCE_MS:g})")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve Prometheus metrics on this port at "
+                             "/metrics (with --workers, worker N uses "
+                             "port + N; default: off)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes sharing one loaded model "
+                             "(default: 1, no forking)")
     args = parser.parse_args()
 
-    # Download model if needed
-    model_path = download_model(args.model)
+    if args.backend == "fake":
+        backend = FakeBackend(utterance_ms=args.fake_utterance_ms,
+                              chunk_cost_ms=args.fake_cost_ms)
+    else:
+        try:
+            backend = VoskBackend()
+        except ImportError as e:
+            print(f"Missing dependency: {e}")
+            print("Install with: pip install -r requirements.txt")
+            sys.exit(1)
+
+    # Models are installed (if needed) and loaded by the server, in the
+    # background once it's listening. The fake backend needs none.
+    model_path = functools.partial(download_model, args.model,
+                                   args.model_source, args.model_sha256)
+    if args.backend == "fake":
+        model_path = args.model
+    secondary_model_path = None
+    if args.secondary_model and args.backend == "fake":
+        secondary_model_path = args.secondary_model
+    elif args.secondary_model:
+        # A mirror serves both models; a single archive is the primary's
+        mirror = (args.model_source if args.model_source
+                  and not args.model_source.lower().endswith(".zip") else None)
+        secondary_model_path = functools.partial(
+            download_model, args.secondary_model, mirror)
 
     # Start server
-    server = VoskServer(model_path, args.port)
+    server = VoskServer(
+        model_path, args.port,
+        decode_workers=args.decode_workers,
+        pool_size=args.pool_size,
+        vad=args.vad,
+        mode=WAKE_MODE if args.wake_mode else COMMAND_MODE,
+        grammar_mode=args.grammar,
+        resolve_commands=args.resolve_commands,
+        partials=args.partials,
+        partial_rate=args.partial_rate,
+        frame_ms=args.frame_ms,
+        metrics_port=args.metrics_port,
+        max_sessions=args.max_sessions,
+        queue_ms=args.queue_ms,
+        overflow=args.overflow,
+        resume_grace=args.resume_grace,
+        endpoint_silence_ms=args.endpoint_silence_ms,
+        endpoint_command_ms=args.endpoint_command_ms,
+        vocab_file=args.vocab_file,
+        vocab_watch=args.vocab_watch,
+        admin_token=args.admin_token,
+        secondary_model_path=secondary_model_path,
+        rescore_confidence=args.rescore_confidence,
+        rescore_unknown=args.rescore_unknown,
+        capture_dir=args.capture_dir,
+        capture_segment_mb=args.capture_segment_mb,
+        capture_keep=args.capture_keep,
+        backend=backend,
+        unix_socket=args.unix_socket,
+        corrections_file=args.corrections,
+        correction_distance=args.correction_distance,
+    )
 
     try:
+        if args.workers > 1:
+            from prefork import Supervisor
+            # Load before forking so the workers share one copy of the model
+            server.load()
+            Supervisor(server, args.workers).run()
+            return
         asyncio.run(server.run())
     except KeyboardInterrupt:
         log.info("Server stopped.")
+    except InstallError as e:
+        log.error(f"Could not install the model: {e}")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
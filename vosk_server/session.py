@@ -0,0 +1,455 @@
+"""
+Per-connection decoding state.
+
+A Session owns the recognizers checked out for a connection plus the audio
+pipeline in front of them. All methods that touch a recognizer block and
+run on the server's decode executor; feed() and finish() return result
+events for the event loop to send.
+
+Sessions listen in one of two modes:
+
+- "command": every utterance is decoded against the full command grammar
+- "wake": idle audio is decoded against a tiny wake-word grammar. When the
+  wake word is heard, the session wakes up, replays the audio buffered
+  around the wake word into the command recognizer and decodes the
+  following utterance in full. It goes back to idle after that utterance's
+  final result, or after `wake_timeout_ms` without new speech.
+"""
+
+import json
+import time
+from collections import deque
+
+try:
+    from vosk import _ffi
+except ImportError:
+    _ffi = None
+
+from audio_format import FORMAT_SETTINGS, FormatConverter
+from endpointing import EOF, KALDI, TIMEOUT, VAD, Endpointer
+from framing import FrameBuffer, frame_bytes_for
+from partials import PartialPolicy
+from result_encoding import JSON, make_encoder
+from vad import END_OF_SPEECH, VoiceActivityDetector
+from vocabulary import WAKE_WORDS
+
+# Event kinds returned by feed() / finish()
+FINAL = "final"
+PARTIAL = "partial"
+WAKE = "wake"
+
+# Listening modes
+COMMAND_MODE = "command"
+WAKE_MODE = "wake"
+
+DEFAULT_WAKE_TIMEOUT_MS = 5000
+BYTES_PER_MS = 16000 * 2 // 1000  # 16 kHz PCM16
+# Audio kept while idle, replayed into the command recognizer on wake
+WAKE_REPLAY_BYTES = 16000 * 2 * 3 // 2  # 1.5 s of 16 kHz PCM16
+
+
+def as_waveform(segment):
+    """Make a segment acceptable to KaldiRecognizer.AcceptWaveform.
+
+    Vosk's C binding takes bytes or a cffi buffer. Memoryviews (frames from
+    the ring buffer) are wrapped without copying.
+    """
+    if isinstance(segment, memoryview):
+        return _ffi.from_buffer(segment) if _ffi is not None else segment.tobytes()
+    return segment
+
+
+def decode_segment(recognizer, segment, partial: bool = True) -> tuple[str, dict]:
+    """Feed one segment (or END_OF_SPEECH) to a recognizer.
+
+    With partial=False the (unused) partial result isn't computed.
+    """
+    if segment is END_OF_SPEECH:
+        return FINAL, json.loads(recognizer.FinalResult())
+    if recognizer.AcceptWaveform(as_waveform(segment)):
+        return FINAL, json.loads(recognizer.Result())
+    if not partial:
+        return PARTIAL, {}
+    return PARTIAL, json.loads(recognizer.PartialResult())
+
+
+def result_text(kind: str, result: dict) -> str:
+    return result.get("text" if kind == FINAL else "partial", "").strip()
+
+
+def has_wake_word(text: str) -> bool:
+    return any(word in WAKE_WORDS for word in text.split())
+
+
+def only_wake_words(text: str) -> bool:
+    """True if text has nothing but wake words and unknowns in it."""
+    return all(word in WAKE_WORDS or word == "[unk]" for word in text.split())
+
+
+class Session:
+    """Audio pipeline and recognizers for one client connection."""
+
+    def __init__(self, pool, grammar: str, wake_grammar: str,
+                 vad: VoiceActivityDetector = None,
+                 mode: str = COMMAND_MODE):
+        self.pool = pool
+        self.grammar = grammar
+        self.wake_grammar = wake_grammar
+        self.vad = vad
+        self.recognizer = pool.acquire(grammar)
+        self.wake_recognizer = None
+        self.context = None
+        self.pending_grammar = None  # swapped in between utterances
+        self._in_utterance = False
+        self.resolve_commands = False
+        self.apply_corrections = True  # if the server keeps corrections
+        self.partials = PartialPolicy()
+        self.endpointer = Endpointer()
+        self.partial_timer = None  # pending "rate" flush, owned by the loop
+        self.undelivered = []      # finals decoded after the client dropped
+        self.capture_id = None     # capture tap session of the connection
+        self.result_encoder = None  # compact result frames, if negotiated
+        self.framer = None
+        self.frame_ms = 0
+        self.converter = None  # FormatConverter, unless the input is 16 kHz mono int16
+        self.convert_seconds = 0.0
+        self.metrics = None  # ServerMetrics, if the server exports them
+        self.rescorer = None  # Rescorer, for two-pass decoding
+        self._utterance = []  # audio of the current utterance, for rescoring
+        self._utterance_bytes = 0
+        self.audio_bytes = 0
+        self.decode_seconds = 0.0
+        self.mode = COMMAND_MODE
+        self.wake_timeout_ms = DEFAULT_WAKE_TIMEOUT_MS
+        self.awake = False
+        self._wake_deadline = 0.0
+        self._last_partial = ""
+        self._replay = deque()
+        self._replay_bytes = 0
+        self.set_mode(mode)
+
+    def set_mode(self, mode: str, wake_timeout_ms: int = None) -> dict:
+        """Switch listening mode and return the resulting settings.
+
+        Raises ValueError for an unknown mode.
+        """
+        if mode not in (COMMAND_MODE, WAKE_MODE):
+            raise ValueError(f"Unknown mode: {mode}")
+        if wake_timeout_ms is not None:
+            self.wake_timeout_ms = int(wake_timeout_ms)
+        if mode == WAKE_MODE and self.wake_recognizer is None:
+            self.wake_recognizer = self.pool.acquire(self.wake_grammar)
+        if mode != self.mode:
+            self._go_idle()
+            self.recognizer.Reset()
+            self.mode = mode
+        return {"mode": self.mode, "wake_timeout_ms": self.wake_timeout_ms}
+
+    def set_grammar(self, grammar: str, context: str = None):
+        """Swap the command recognizer for one compiled with `grammar`.
+
+        `context` names the screen the grammar was built for (None = full
+        grammar). Any utterance in progress is dropped.
+        """
+        self.context = context
+        self.pending_grammar = None
+        if grammar == self.grammar:
+            return
+        recognizer = self.pool.acquire(grammar)
+        self.pool.release(self.grammar, self.recognizer)
+        self.grammar = grammar
+        self.recognizer = recognizer
+        self._go_idle()
+
+    def request_grammar(self, grammar: str):
+        """Swap to `grammar` at the next utterance boundary.
+
+        Safe to call from another thread: the swap itself happens inside
+        feed(), on this session's decode path.
+        """
+        self.pending_grammar = grammar
+
+    def set_frame_ms(self, frame_ms: int, sample_rate: int = 16000) -> int:
+        """Re-frame incoming audio into fixed frame_ms frames (0 = off)."""
+        self.framer, self.frame_ms = self._framing(frame_ms, sample_rate)
+        return self.frame_ms
+
+    def set_format(self, **settings) -> dict:
+        """Declare the client's audio format and return it.
+
+        Settings are those of FormatConverter (sample_rate, channels,
+        encoding, gain); unspecified ones keep their current value.
+        Raises ValueError for an unsupported format.
+        """
+        converter = self._converter(**settings)
+        self.converter = None if converter.passthrough else converter
+        return converter.config()
+
+    def set_results(self, name: str) -> str:
+        """Choose how result messages are encoded (see result_encoding).
+
+        Raises ValueError for an unknown or unavailable encoding.
+        """
+        self.result_encoder = self._encoder(name)
+        return self.results
+
+    def negotiate(self, partials: str = None, partial_rate: float = None,
+                  frame_ms: int = None, results: str = None,
+                  **audio_format) -> dict:
+        """Apply a client's hello: partial policy, framing, audio format
+        and result encoding. Returns the settings in effect.
+
+        All or nothing: raises ValueError or TypeError, with nothing
+        changed, if any setting is invalid.
+        """
+        config = PartialPolicy(self.partials.policy, self.partials.rate_hz).configure(
+            partials, partial_rate)
+        framer, frame_ms = (self._framing(frame_ms) if frame_ms is not None
+                            else (self.framer, self.frame_ms))
+        converter = self._converter(**audio_format)
+        encoder = self._encoder(results) if results is not None else self.result_encoder
+
+        self.partials.configure(partials, partial_rate)
+        self.framer, self.frame_ms = framer, frame_ms
+        self.converter = None if converter.passthrough else converter
+        self.result_encoder = encoder
+        return {**config, "frame_ms": frame_ms, **converter.config(),
+                "results": self.results}
+
+    @staticmethod
+    def _framing(frame_ms: int, sample_rate: int = 16000) -> tuple:
+        """(FrameBuffer or None, frame_ms) for a frame size."""
+        frame_ms = int(frame_ms)
+        if frame_ms < 0:
+            raise ValueError("frame_ms must not be negative")
+        return (FrameBuffer(frame_bytes_for(frame_ms, sample_rate))
+                if frame_ms else None), frame_ms
+
+    def _converter(self, **settings) -> FormatConverter:
+        """A converter for the current format with `settings` changed."""
+        unknown = set(settings) - set(FORMAT_SETTINGS)
+        if unknown:
+            raise ValueError(f"Unknown format setting: {', '.join(sorted(unknown))}")
+        current = (self.converter or FormatConverter()).config()
+        return FormatConverter(**{**current, **settings})
+
+    def _encoder(self, name: str):
+        """The result encoder for `name`, keeping the current one (and its
+        text table) if it's the same encoding."""
+        return make_encoder(name) if name != self.results else self.result_encoder
+
+    @property
+    def results(self) -> str:
+        """The result encoding in effect."""
+        return self.result_encoder.name if self.result_encoder else JSON
+
+    @property
+    def input_bytes_per_ms(self) -> float:
+        """Bytes per ms of audio as the client sends it."""
+        return self.converter.bytes_per_ms if self.converter else BYTES_PER_MS
+
+    def feed(self, chunk: bytes) -> list:
+        """Decode one audio chunk, returning a list of (kind, result) events.
+
+        Audio in another format is converted to 16 kHz mono int16 first.
+        With fixed framing, the chunk is cut into equal frames first (any
+        remainder waits for the next chunk). With VAD enabled, only speech
+        regions reach the recognizer and the end of each region forces a
+        final result.
+        """
+        if self.converter is not None:
+            start = time.perf_counter()
+            chunk = self.converter.convert(chunk)
+            elapsed = time.perf_counter() - start
+            self.convert_seconds += elapsed
+            if self.metrics is not None:
+                self.metrics.convert_seconds.observe(elapsed)
+        self.audio_bytes += len(chunk)
+        self._swap_grammar()
+        frames = self.framer.push(chunk) if self.framer else [chunk]
+        if self.vad is not None and self.vad.enabled:
+            segments = []
+            for frame in frames:
+                segments.extend(self.vad.process(frame))
+        else:
+            segments = frames
+
+        events = []
+        for segment in segments:
+            if self.mode == WAKE_MODE and not self.awake:
+                self._feed_idle(segment, events)
+            else:
+                self._feed_command(segment, events)
+
+        if self.awake and time.monotonic() > self._wake_deadline:
+            # Nothing (more) was said after the wake word
+            kind, result = FINAL, self._final(TIMEOUT)
+            if not only_wake_words(result_text(kind, result)):
+                events.append((kind, result))
+            self._go_idle()
+        self._swap_grammar()
+        return events
+
+    def finish(self) -> list:
+        """Flush the current utterance at end of stream."""
+        events = [(FINAL, self._final(EOF))]
+        self._go_idle()
+        return events
+
+    def reset(self):
+        """Drop any partially decoded utterance and buffered audio."""
+        self.recognizer.Reset()
+        if self.wake_recognizer is not None:
+            self.wake_recognizer.Reset()
+        if self.vad is not None:
+            self.vad.reset()
+        if self.framer is not None:
+            self.framer.clear()
+        if self.converter is not None:
+            self.converter.reset()
+        self._go_idle()
+
+    def real_time_factor(self) -> float:
+        """Seconds spent decoding per second of audio received so far."""
+        audio_seconds = self.audio_bytes / BYTES_PER_MS / 1000
+        return self.decode_seconds / audio_seconds if audio_seconds else 0.0
+
+    def close(self):
+        """Return this session's recognizers to the pool."""
+        self.pool.release(self.grammar, self.recognizer)
+        if self.wake_recognizer is not None:
+            self.pool.release(self.wake_grammar, self.wake_recognizer)
+            self.wake_recognizer = None
+
+    def _feed_command(self, segment, events: list):
+        # Partials also drive the endpointer and, while awake, extend the
+        # wake timeout
+        want_partial = (self.partials.enabled or self.endpointer.enabled
+                        or self.awake)
+        if self.rescorer is not None:
+            self._buffer_utterance(segment)
+        kind, result = self._decode(self.recognizer, segment, want_partial)
+        if kind == FINAL:
+            self._tag_final(result, VAD if segment is END_OF_SPEECH else KALDI)
+        elif want_partial:
+            text = result_text(kind, result)
+            self._in_utterance = bool(text)
+            reason = self.endpointer.update(text, self.audio_bytes / BYTES_PER_MS)
+            if reason:
+                kind, result = FINAL, self._final(reason)
+        else:
+            self._in_utterance = True  # can't tell without the partial
+        if self.awake:
+            text = result_text(kind, result)
+            if kind == FINAL:
+                if only_wake_words(text):
+                    # A pause right after the wake word; keep listening
+                    return
+                self._go_idle()
+            elif text and text != self._last_partial:
+                # Still talking - push the idle timeout back
+                self._last_partial = text
+                self._wake_deadline = time.monotonic() + self.wake_timeout_ms / 1000
+        events.append((kind, result))
+
+    def _feed_idle(self, segment, events: list):
+        if segment is not END_OF_SPEECH:
+            if isinstance(segment, memoryview):
+                segment = segment.tobytes()  # outlives the ring buffer slot
+            self._replay.append(segment)
+            self._replay_bytes += len(segment)
+            while len(self._replay) > 1 and self._replay_bytes > WAKE_REPLAY_BYTES:
+                self._replay_bytes -= len(self._replay.popleft())
+
+        kind, result = self._decode(self.wake_recognizer, segment)
+        if not has_wake_word(result_text(kind, result)):
+            return
+
+        self.wake_recognizer.Reset()
+        self.awake = True
+        self._last_partial = ""
+        self._wake_deadline = time.monotonic() + self.wake_timeout_ms / 1000
+        events.append((WAKE, {}))
+
+        replay = list(self._replay)
+        self._replay.clear()
+        self._replay_bytes = 0
+        for buffered in replay:
+            self._feed_command(buffered, events)
+
+    def _decode(self, recognizer, segment, partial: bool = True) -> tuple[str, dict]:
+        """decode_segment(), timed for the real-time factor and metrics."""
+        start = time.perf_counter()
+        kind, result = decode_segment(recognizer, segment, partial)
+        elapsed = time.perf_counter() - start
+        self.decode_seconds += elapsed
+        if self.metrics is not None and segment is not END_OF_SPEECH:
+            self.metrics.accept_seconds.observe(elapsed)
+        return kind, result
+
+    def _final(self, reason: str) -> dict:
+        """Force the final result of the current utterance."""
+        result = json.loads(self.recognizer.FinalResult())
+        self._tag_final(result, reason)
+        return result
+
+    def _swap_grammar(self):
+        """Apply a requested grammar unless an utterance is under way."""
+        if (self.pending_grammar is not None and not self._in_utterance
+                and not self.awake):
+            self.set_grammar(self.pending_grammar, self.context)
+
+    def _buffer_utterance(self, segment):
+        """Keep the current utterance's audio for a second pass."""
+        if self._utterance is None or segment is END_OF_SPEECH:
+            return
+        if isinstance(segment, memoryview):
+            segment = segment.tobytes()  # outlives the ring buffer slot
+        self._utterance_bytes += len(segment)
+        if self._utterance_bytes > self.rescorer.max_audio_ms * BYTES_PER_MS:
+            self._utterance = None  # too long to rescore
+        else:
+            self._utterance.append(segment)
+
+    def _rescore(self, result: dict):
+        """Replace a doubtful final with the secondary model's result."""
+        audio = self._utterance
+        self._utterance, self._utterance_bytes = [], 0
+        reason = self.rescorer.reason(result)
+        if reason is None or not audio:
+            return
+        second, seconds = self.rescorer.rescore(self.grammar, audio)
+        self.decode_seconds += seconds
+        outcome = "kept"
+        if second["text"] and second["text"] != result.get("text"):
+            result["first_pass"] = result.get("text", "")
+            result.update(second)
+            outcome = "replaced"
+        result["rescored"] = reason
+        if self.metrics is not None:
+            self.metrics.rescored.inc(reason=reason, outcome=outcome)
+            self.metrics.rescore_seconds.observe(seconds)
+
+    def _tag_final(self, result: dict, reason: str):
+        """Note why the utterance ended and how long after the last word."""
+        if self.rescorer is not None:
+            self._rescore(result)
+        self._in_utterance = False
+        result["endpoint"] = reason
+        latency_ms = self.endpointer.latency_ms()
+        if latency_ms is not None:
+            result["latency_ms"] = latency_ms
+        if self.metrics is not None and result.get("text"):
+            self.metrics.endpoints.inc(reason=reason)
+            if latency_ms is not None:
+                self.metrics.endpoint_latency.observe(latency_ms / 1000)
+        self.endpointer.reset()
+
+    def _go_idle(self):
+        self._in_utterance = False
+        self.endpointer.reset()
+        self.awake = False
+        self._last_partial = ""
+        self._replay.clear()
+        self._replay_bytes = 0
+        self._utterance, self._utterance_bytes = [], 0
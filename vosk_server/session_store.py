@@ -0,0 +1,91 @@
+"""
+Session tokens and resume.
+
+A client can ask for a session token. When it disconnects, its Session
+(recognizers, negotiated options, half-decoded utterance) and its queue of
+not-yet-decoded messages are parked instead of torn down. A client that
+reconnects with the token inside the grace window gets them back.
+
+Resume is opt-in, so clients that don't know about it see no new messages.
+A client asks for a token by connecting with an empty session parameter,
+and resumes by passing the token it was given:
+
+    ws://localhost:8765/?session=            -> {"type": "session", "token": ...}
+    ws://localhost:8765/?session=<token>
+
+Parked sessions past the grace window are reaped by the server on a timer.
+"""
+
+import asyncio
+import secrets
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_RESUME_GRACE = 10.0
+
+
+def token_from_path(path: str):
+    """The session token in a path like "/?session=abc".
+
+    Returns "" for a bare "?session=" and None if there is no parameter.
+    """
+    values = parse_qs(urlsplit(path or "").query,
+                      keep_blank_values=True).get("session")
+    return values[0] if values else None
+
+
+class SessionEntry:
+    """A session with its queue and the connection it's attached to."""
+
+    __slots__ = ("token", "session", "queue", "websocket", "parked_at", "parked")
+
+    def __init__(self, token: str, session, queue, websocket):
+        self.token = token
+        self.session = session
+        self.queue = queue
+        self.websocket = websocket   # None while parked
+        self.parked_at = None
+        self.parked = asyncio.Event()
+
+
+class SessionStore:
+    """Live and parked sessions, by token."""
+
+    def __init__(self, grace: float = DEFAULT_RESUME_GRACE):
+        self.grace = grace
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def parked_count(self) -> int:
+        return sum(1 for entry in self._entries.values() if entry.websocket is None)
+
+    def add(self, session, queue, websocket) -> SessionEntry:
+        token = secrets.token_urlsafe(16)
+        entry = self._entries[token] = SessionEntry(token, session, queue, websocket)
+        return entry
+
+    def get(self, token: str):
+        return self._entries.get(token) if token else None
+
+    def attach(self, entry: SessionEntry, websocket):
+        entry.websocket = websocket
+        entry.parked_at = None
+        entry.parked.clear()
+
+    def park(self, entry: SessionEntry, now: float):
+        entry.websocket = None
+        entry.parked_at = now
+        entry.parked.set()
+
+    def remove(self, entry: SessionEntry):
+        self._entries.pop(entry.token, None)
+
+    def expired(self, now: float) -> list:
+        """Remove and return parked entries older than the grace window."""
+        stale = [entry for entry in self._entries.values()
+                 if entry.websocket is None and now - entry.parked_at > self.grace]
+        for entry in stale:
+            del self._entries[entry.token]
+        return stale
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Tests for input format conversion.
+"""
+
+import unittest
+
+import numpy as np
+
+from audio_format import FormatConverter
+from recognizer_pool import RecognizerPool
+from session import BYTES_PER_MS, Session
+
+
+def tone(freq: float, rate: int, seconds: float, amplitude: float = 0.5) -> np.ndarray:
+    return amplitude * np.sin(2 * np.pi * freq * np.arange(int(rate * seconds)) / rate)
+
+
+def convert_in_chunks(converter, data: bytes, size: int) -> np.ndarray:
+    out = b"".join(converter.convert(data[i:i + size]) for i in range(0, len(data), size))
+    return np.frombuffer(out, dtype=np.int16)
+
+
+def level_at(samples: np.ndarray, freq: float) -> float:
+    spectrum = np.abs(np.fft.rfft(samples * np.hanning(len(samples))))
+    freqs = np.fft.rfftfreq(len(samples), 1 / 16000)
+    return spectrum[np.argmin(np.abs(freqs - freq))] / spectrum.max()
+
+
+class TestFormatConverter(unittest.TestCase):
+
+    def test_default_format_passes_through(self):
+        converter = FormatConverter()
+        self.assertTrue(converter.passthrough)
+        self.assertIs(converter.convert(b"\1\2\3"), b"\1\2\3")
+
+    def test_48k_stereo_float_to_16k_mono(self):
+        signal = tone(1000, 48000, 1.0) + tone(12000, 48000, 1.0, 0.3)
+        stereo = np.stack([signal, signal], axis=1).astype(np.float32).tobytes()
+        # Odd chunk sizes split samples and frames across chunks
+        out = convert_in_chunks(FormatConverter(48000, 2, "float32"), stereo, 3001)
+        self.assertEqual(len(out), 16000)
+        # 12 kHz can't exist at 16 kHz; it must be filtered, not aliased to 4 kHz
+        self.assertEqual(np.argmax(np.abs(np.fft.rfft(out))), 1000)
+        self.assertLess(level_at(out[1000:], 4000), 0.01)
+
+    def test_chunking_does_not_change_output(self):
+        data = (tone(440, 44100, 0.5) * 20000).astype(np.int16).tobytes()
+        whole = FormatConverter(44100).convert(data)
+        chunked = convert_in_chunks(FormatConverter(44100), data, 882)
+        np.testing.assert_array_equal(np.frombuffer(whole, dtype=np.int16), chunked)
+
+    def test_upsampling_8k(self):
+        data = (tone(440, 8000, 1.0) * 20000).astype(np.int16).tobytes()
+        out = convert_in_chunks(FormatConverter(8000), data, 333)
+        self.assertAlmostEqual(len(out), 16000, delta=2)
+        self.assertEqual(np.argmax(np.abs(np.fft.rfft(out[:16000 - 2]))), 440)
+
+    def test_auto_gain_boosts_quiet_speech_but_not_silence(self):
+        converter = FormatConverter(gain="auto")
+        silence = (tone(300, 16000, 1.0) * 3).astype(np.int16).tobytes()
+        convert_in_chunks(converter, silence, 1600)
+        self.assertEqual(converter.gain_db, 0.0)
+        quiet = (tone(300, 16000, 2.0) * 300).astype(np.int16).tobytes()
+        out = convert_in_chunks(converter, quiet, 1600)
+        self.assertGreater(converter.gain_db, 15)
+        self.assertGreater(np.abs(out[-1600:]).max(), 10 * 300)
+
+    def test_invalid_formats(self):
+        for settings in ({"sample_rate": 96000}, {"channels": 0},
+                         {"encoding": "mulaw"}, {"gain": "loud"}):
+            with self.assertRaises(ValueError):
+                FormatConverter(**settings)
+
+
+class Recorder:
+    """Recognizer that keeps what it was fed."""
+
+    def __init__(self, grammar):
+        self.audio = b""
+
+    def AcceptWaveform(self, data):
+        self.audio += bytes(data)
+        return False
+
+    def PartialResult(self):
+        return '{"partial": ""}'
+
+    def FinalResult(self):
+        return '{"text": ""}'
+
+    def Reset(self):
+        pass
+
+
+class TestSessionFormat(unittest.TestCase):
+
+    def test_session_converts_before_decoding(self):
+        session = Session(RecognizerPool(Recorder), "[]", "[]")
+        config = session.set_format(sample_rate=32000, channels=2)
+        self.assertEqual(config, {"sample_rate": 32000, "channels": 2,
+                                  "encoding": "int16", "gain": None})
+        self.assertEqual(session.input_bytes_per_ms, 128)
+        session.feed(b"\0" * 128 * 100)  # 100 ms
+        self.assertEqual(session.audio_bytes, 100 * BYTES_PER_MS)
+        self.assertAlmostEqual(len(session.recognizer.audio), 100 * BYTES_PER_MS,
+                               delta=4)
+
+    def test_back_to_default_format(self):
+        session = Session(RecognizerPool(Recorder), "[]", "[]")
+        session.set_format(sample_rate=8000)
+        session.set_format(sample_rate=16000)
+        self.assertIsNone(session.converter)
+        with self.assertRaises(ValueError):
+            session.set_format(bits=24)
+
+    def test_hello_is_all_or_nothing(self):
+        session = Session(RecognizerPool(Recorder), "[]", "[]")
+        config = session.negotiate(partials="rate", partial_rate=4, frame_ms=40,
+                                   sample_rate=8000)
+        self.assertEqual((config["partials"], config["frame_ms"],
+                          config["sample_rate"], config["results"]),
+                         ("rate", 40, 8000, "json"))
+        before = (session.partials.policy, session.partials.rate_hz,
+                  session.framer, session.converter, session.result_encoder)
+        for hello in ({"partials": "all", "frame_ms": 20, "encoding": "mp3"},
+                      {"partials": "all", "sample_rate": 48000, "results": "xml"},
+                      {"frame_ms": 20, "partial_rate": 0},
+                      {"partials": "off", "frame_ms": "soon"}):
+            with self.assertRaises((TypeError, ValueError), msg=hello):
+                session.negotiate(**hello)
+            self.assertEqual((session.partials.policy, session.partials.rate_hz,
+                              session.framer, session.converter,
+                              session.result_encoder), before)
+        self.assertEqual(session.frame_ms, 40)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
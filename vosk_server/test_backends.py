@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Tests for the recognizer backends, and the server run in-process on the
+fake one.
+"""
+
+import asyncio
+import json
+import random
+import time
+import unittest
+
+import websockets
+
+from backends import BYTES_PER_MS, FakeBackend, FakeRecognizer
+from test_server import ServerThread
+
+
+def audio(ms: int, fill: int = 0) -> bytes:
+    return bytes([fill]) * (ms * BYTES_PER_MS)
+
+
+class JitteryRecognizer(FakeRecognizer):
+    """Costs up to twice chunk_cost_ms, at random, and checks that a
+    session's audio arrives in order. Sessions fill chunk i with byte i."""
+
+    def __init__(self, disorder: list, *args):
+        self.disorder = disorder
+        super().__init__(*args)
+
+    def Reset(self):
+        super().Reset()
+        self._last = 0
+
+    def AcceptWaveform(self, data) -> bool:
+        time.sleep(random.uniform(0, self.chunk_cost_ms) / 1000)
+        data = bytes(data)
+        if data[0] < self._last or list(data) != sorted(data):
+            self.disorder.append((self._last, data[0]))
+        self._last = data[-1]
+        return super().AcceptWaveform(data)
+
+
+class JitteryBackend(FakeBackend):
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.disorder = []
+
+    def create_recognizer(self, model, grammar: str):
+        return JitteryRecognizer(self.disorder, grammar, self.script,
+                                 self.utterance_ms, self.chunk_cost_ms, self.rtf)
+
+
+class TestFakeRecognizer(unittest.TestCase):
+
+    def test_words_arrive_with_audio_then_final(self):
+        rec = FakeRecognizer(script=["show inbox", "next"], utterance_ms=900)
+        self.assertFalse(rec.AcceptWaveform(audio(300)))
+        self.assertEqual(json.loads(rec.PartialResult()), {"partial": "show"})
+        self.assertFalse(rec.AcceptWaveform(audio(300)))
+        self.assertEqual(json.loads(rec.PartialResult()), {"partial": "show inbox"})
+        self.assertTrue(rec.AcceptWaveform(audio(300)))
+        final = json.loads(rec.Result())
+        self.assertEqual(final["text"], "show inbox")
+        self.assertEqual([w["word"] for w in final["result"]], ["show", "inbox"])
+        # The next utterance is the next phrase, with later word timings
+        rec.AcceptWaveform(audio(600))
+        final = json.loads(rec.FinalResult())
+        self.assertEqual(final["text"], "next")
+        self.assertGreater(final["result"][0]["start"], 0.9)
+
+    def test_reset_starts_the_script_over(self):
+        rec = FakeRecognizer(script=["one", "two"], utterance_ms=100)
+        rec.AcceptWaveform(audio(100))
+        rec.Result()
+        rec.Reset()
+        rec.AcceptWaveform(audio(100))
+        self.assertEqual(json.loads(rec.Result())["text"], "one")
+        self.assertEqual(json.loads(rec.FinalResult()), {"text": ""})
+
+    def test_grammar_constrains_words(self):
+        rec = FakeRecognizer('["jarvis", "[unk]"]', script=["jarvis show inbox"],
+                             utterance_ms=100)
+        rec.AcceptWaveform(audio(100))
+        self.assertEqual(json.loads(rec.Result())["text"], "jarvis [unk] [unk]")
+
+    def test_chunk_cost(self):
+        rec = FakeRecognizer(chunk_cost_ms=5, rtf=0.1)
+        start = time.perf_counter()
+        for _ in range(4):
+            rec.AcceptWaveform(audio(100))  # 5 ms + 10 ms each
+        self.assertGreaterEqual(time.perf_counter() - start, 0.06)
+
+
+class TestInProcessServer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.thread = ServerThread(backend=FakeBackend(utterance_ms=500),
+                                  pool_size=8, resolve_commands=True)
+        cls.url = cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.thread.stop()
+
+    async def session(self, chunks: int = 8) -> list:
+        async with websockets.connect(self.url) as ws:
+            await ws.send(json.dumps({"type": "hello", "partials": "change"}))
+            for i in range(chunks):
+                await ws.send(audio(100, fill=i + 1))
+            await ws.send(json.dumps({"type": "eof"}))
+            await ws.send(json.dumps({"type": "stats"}))
+            messages = []
+            async for message in ws:
+                data = json.loads(message)
+                if data["type"] == "stats":
+                    return messages
+                messages.append(data)
+
+    def test_scripted_session(self):
+        messages = asyncio.run(self.session())
+        self.assertEqual(messages[0]["type"], "hello")
+        finals = [m["text"] for m in messages if m["type"] == "final"]
+        # eof flushes the second phrase after its first word
+        self.assertEqual(finals, ["jarvis show inbox", "next"])
+        partials = [m["text"] for m in messages if m["type"] == "partial"]
+        self.assertEqual(partials[:3], ["jarvis", "jarvis show", "jarvis show inbox"])
+        commands = [m for m in messages if m["type"] == "command"]
+        self.assertTrue(commands)
+
+    def test_rejected_hello_changes_nothing(self):
+        async def hellos():
+            async with websockets.connect(self.url) as ws:
+                replies = []
+                for hello in ({"partials": "off", "encoding": "mp3"}, {}):
+                    await ws.send(json.dumps({"type": "hello", **hello}))
+                    replies.append(json.loads(await ws.recv()))
+                return replies
+        error, hello = asyncio.run(hellos())
+        self.assertEqual(error["type"], "error")
+        self.assertEqual(hello["partials"], self.thread.server.partials)
+
+    def test_stats_report_the_session_decode_time(self):
+        async def stats():
+            async with websockets.connect(self.url) as ws:
+                for _ in range(4):
+                    await ws.send(audio(100))
+                await ws.send(json.dumps({"type": "stats"}))
+                async for message in ws:
+                    data = json.loads(message)
+                    if data["type"] == "stats":
+                        return data["session"]
+        session = asyncio.run(stats())
+        self.assertEqual(session["audio_seconds"], 0.4)
+        # Free to decode on the fake backend
+        self.assertLess(session["decode_seconds"], 0.1)
+
+    def test_many_concurrent_sessions_get_the_same_results(self):
+        async def many():
+            return await asyncio.gather(*(self.session(6) for _ in range(200)))
+        results = asyncio.run(many())
+        first = [(m["type"], m.get("text")) for m in results[0]]
+        for messages in results:
+            self.assertEqual([(m["type"], m.get("text")) for m in messages], first)
+
+
+class TestDecodeOrder(TestInProcessServer):
+    """The same sessions on a shared thread pool where every chunk takes a
+    random time to decode: each session's chunks must still be decoded
+    in the order they were sent."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.backend = JitteryBackend(utterance_ms=500, chunk_cost_ms=2)
+        cls.thread = ServerThread(backend=cls.backend, pool_size=8,
+                                  decode_workers=8, resolve_commands=True)
+        cls.url = cls.thread.start()
+
+    def test_many_concurrent_sessions_get_the_same_results(self):
+        super().test_many_concurrent_sessions_get_the_same_results()
+        self.assertEqual(self.backend.disorder, [])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Tests for the bounded per-session message queue.
+"""
+
+import asyncio
+import json
+import time
+import unittest
+
+import websockets
+
+from backends import BYTES_PER_MS, FakeBackend
+from backpressure import AudioQueue
+from test_server import ServerThread
+
+
+def drain(queue):
+    async def take_all():
+        queue.close()
+        items = []
+        while (item := await queue.get()) is not None:
+            items.append(item)
+        return items
+    return asyncio.run(take_all())
+
+
+class TestAudioQueue(unittest.TestCase):
+    """Test the overflow policies."""
+
+    def test_keeps_order_within_bound(self):
+        queue = AudioQueue(10)
+        self.assertEqual(queue.put_audio(b"aaaa"), 0)
+        queue.put_control({"type": "eof"})
+        self.assertEqual(queue.put_audio(b"bbbb"), 0)
+        self.assertEqual(queue.queued_bytes, 8)
+        items = asyncio.run(self._take(queue, 3))
+        self.assertEqual(items, [(True, b"aaaa"), (False, {"type": "eof"}),
+                                 (True, b"bbbb")])
+        self.assertEqual(queue.queued_bytes, 0)
+
+    @staticmethod
+    async def _take(queue, n):
+        return [await queue.get() for _ in range(n)]
+
+    def test_drop_oldest(self):
+        queue = AudioQueue(8, "drop_oldest")
+        queue.put_audio(b"aaaa")
+        queue.put_control({"type": "reset"})
+        queue.put_audio(b"bbbb")
+        self.assertEqual(queue.put_audio(b"cccc"), 4)
+        items = asyncio.run(self._take(queue, 3))
+        self.assertEqual(items, [(False, {"type": "reset"}), (True, b"bbbb"),
+                                 (True, b"cccc")])
+
+    def test_latest_skips_everything_queued(self):
+        queue = AudioQueue(8, "latest")
+        queue.put_audio(b"aaaa")
+        queue.put_audio(b"bbbb")
+        self.assertEqual(queue.put_audio(b"cccc"), 8)
+        self.assertEqual(queue.dropped_bytes, 8)
+        self.assertEqual(asyncio.run(self._take(queue, 1)), [(True, b"cccc")])
+
+    def test_close_policy_refuses(self):
+        queue = AudioQueue(4, "close")
+        queue.put_audio(b"aaaa")
+        self.assertEqual(queue.put_audio(b"b"), -1)
+        self.assertEqual(len(queue), 1)
+
+    def test_close_keeps_control_messages(self):
+        queue = AudioQueue(100)
+        queue.put_audio(b"aaaa")
+        queue.put_control({"type": "eof"})
+        self.assertEqual(drain(queue), [(False, {"type": "eof"})])
+
+    def test_get_waits_for_items(self):
+        async def scenario():
+            queue = AudioQueue(100)
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.sleep(0)
+            self.assertFalse(getter.done())
+            queue.put_audio(b"ab")
+            return await getter
+        self.assertEqual(asyncio.run(scenario()), (True, b"ab"))
+
+    def test_detach_keeps_messages(self):
+        async def scenario():
+            queue = AudioQueue(100)
+            queue.put_audio(b"ab")
+            queue.detach()
+            self.assertIsNone(await queue.get())
+            queue.attach()
+            return await queue.get()
+        self.assertEqual(asyncio.run(scenario()), (True, b"ab"))
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            AudioQueue(10, "block")
+
+
+class TestServerAdmission(unittest.TestCase):
+    """max_sessions and the close policy, through a running server."""
+
+    def setUp(self):
+        self.thread = None
+
+    def tearDown(self):
+        if self.thread is not None:
+            self.thread.stop()
+
+    def start(self, **options):
+        self.thread = ServerThread(**options)
+        return self.thread.start()
+
+    async def wait_for_sessions(self, count: int):
+        deadline = time.monotonic() + 5
+        while (self.thread.server.active_sessions > count
+               and time.monotonic() < deadline):
+            await asyncio.sleep(0.01)
+
+    @staticmethod
+    async def admitted(url):
+        """Connect and wait until the server has a session for us."""
+        ws = await websockets.connect(url)
+        await ws.send(json.dumps({"type": "stats"}))
+        reply = json.loads(await ws.recv())
+        if reply["type"] != "stats":
+            await ws.close()
+            return reply
+        return ws
+
+    def test_busy_beyond_max_sessions(self):
+        url = self.start(max_sessions=2)
+        server = self.thread.server
+
+        async def run():
+            first, second = await self.admitted(url), await self.admitted(url)
+            async with websockets.connect(url) as ws:
+                self.assertEqual(json.loads(await ws.recv()), {"type": "busy"})
+                with self.assertRaises(websockets.exceptions.ConnectionClosed):
+                    await ws.recv()
+                self.assertEqual(ws.close_code, 1013)
+            await first.close()
+            await self.wait_for_sessions(1)
+            third = await self.admitted(url)  # a slot is free again
+            self.assertNotIsInstance(third, dict)
+            await second.close()
+            await third.close()
+            await self.wait_for_sessions(0)
+
+        asyncio.run(run())
+        self.assertIn("vosk_sessions_rejected_total 1",
+                      server.metrics.render())
+
+    def test_close_policy_disconnects_a_slow_session(self):
+        url = self.start(backend=FakeBackend(chunk_cost_ms=50), queue_ms=200,
+                         overflow="close")
+
+        async def run():
+            start = time.monotonic()
+            # The client's close frame is queued behind all of this audio
+            async with websockets.connect(url) as ws:
+                with self.assertRaises(websockets.exceptions.ConnectionClosed):
+                    for _ in range(50):
+                        await ws.send(b"\0" * (100 * BYTES_PER_MS))
+                    while True:
+                        await ws.recv()
+            await self.wait_for_sessions(0)
+            return ws.close_code, ws.close_reason, time.monotonic() - start
+
+        code, reason, seconds = asyncio.run(run())
+        self.assertEqual((code, reason), (1013, "decoding fell behind"))
+        self.assertLess(seconds, 2)  # not the 10 s close timeout
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests for batch transcription (without a model).
+"""
+
+import json
+import tempfile
+import unittest
+import wave
+from pathlib import Path
+
+import batch
+from batch import (completed_paths, find_inputs, read_audio, transcribe,
+                   _open_for_append, _transcribe_in_worker)
+
+
+class CountingRecognizer:
+    """Ends an utterance every third chunk; reports the chunk count."""
+
+    def __init__(self):
+        self.chunks = 0
+        self.resets = 0
+
+    def AcceptWaveform(self, data):
+        self.chunks += 1
+        return self.chunks % 3 == 0
+
+    def Result(self):
+        return json.dumps({"text": "show inbox", "result": [
+            {"word": "show", "start": 0.1, "end": 0.4, "conf": 1.0},
+            {"word": "inbox", "start": 0.4, "end": 0.9, "conf": 0.9}]})
+
+    def FinalResult(self):
+        return json.dumps({"text": ""})
+
+    def Reset(self):
+        self.resets += 1
+
+
+def write_wav(path: Path, seconds: float, rate: int = 16000):
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(b"\0\0" * int(rate * seconds))
+
+
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.dir.name)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+
+class TestInputs(BatchTest):
+    """Test finding files and reading audio."""
+
+    def test_directory_is_searched_recursively(self):
+        (self.root / "sub").mkdir()
+        for name in ("b.wav", "sub/a.raw", "notes.txt"):
+            (self.root / name).write_bytes(b"")
+        self.assertEqual([p.name for p in find_inputs(self.root)], ["b.wav", "a.raw"])
+
+    def test_manifest_paths_are_relative_to_it(self):
+        manifest = self.root / "list.txt"
+        manifest.write_text("# archive\n\na.wav\n/abs/b.raw\n")
+        self.assertEqual(find_inputs(manifest),
+                         [self.root / "a.wav", Path("/abs/b.raw")])
+
+    def test_read_wav_in_chunks(self):
+        path = self.root / "a.wav"
+        write_wav(path, 1.25)
+        chunks = list(read_audio(path))
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(sum(map(len, chunks)), 40000)
+
+    def test_wrong_format_is_rejected(self):
+        path = self.root / "a.wav"
+        write_wav(path, 0.1, rate=8000)
+        with self.assertRaises(ValueError):
+            list(read_audio(path))
+
+
+class TestTranscribe(BatchTest):
+
+    def test_result_has_segments_and_word_timings(self):
+        path = self.root / "a.raw"
+        path.write_bytes(b"\0" * 16000 * 2 * 2)  # 2 s = 4 chunks
+        recognizer = CountingRecognizer()
+        record = transcribe(recognizer, path)
+        self.assertEqual(record["text"], "show inbox")
+        self.assertEqual(record["segments"][0]["words"][1]["word"], "inbox")
+        self.assertEqual(record["audio_seconds"], 2.0)
+        self.assertEqual(recognizer.resets, 1)
+
+    def test_decoder_failure_is_a_per_file_error(self):
+        path = self.root / "a.raw"
+        path.write_bytes(b"\0" * 16000)
+
+        class FailingRecognizer(CountingRecognizer):
+            def AcceptWaveform(self, data):
+                raise Exception("Failed to process waveform")
+
+        recognizer = FailingRecognizer()
+        self.addCleanup(setattr, batch, "_recognizer", batch._recognizer)
+        batch._recognizer = recognizer
+        record = _transcribe_in_worker(str(path))
+        self.assertEqual(record, {"path": str(path),
+                                  "error": "Failed to process waveform"})
+        self.assertEqual(recognizer.resets, 1)
+
+
+class TestResume(BatchTest):
+    """Test picking up an interrupted output file."""
+
+    def test_completed_paths_skips_torn_line(self):
+        output = self.root / "out.jsonl"
+        output.write_text('{"path": "a.wav", "text": ""}\n'
+                          '{"path": "b.wav", "error": "bad"}\n'
+                          '{"path": "c.w')
+        self.assertEqual(completed_paths(output), {"a.wav", "b.wav"})
+        self.assertEqual(completed_paths(output, retry_errors=True), {"a.wav"})
+        self.assertEqual(completed_paths(self.root / "none.jsonl"), set())
+
+    def test_append_starts_on_a_new_line(self):
+        output = self.root / "out.jsonl"
+        output.write_text('{"path": "a.wav"}\n{"path": "c.w')
+        with _open_for_append(output) as f:
+            f.write(b'{"path": "c.wav"}\n')
+        self.assertEqual(completed_paths(output), {"a.wav", "c.wav"})
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
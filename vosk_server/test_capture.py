@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Tests for the capture tap and the replay comparison.
+"""
+
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from capture import (AUDIO, CONTROL, EVENT, CaptureWriter, capture_files,
+                     read_capture)
+from replay import compare, recorded_results
+
+
+class CaptureTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.dir.name)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def session(self, writer, chunks=3, size=3200):
+        sid = writer.open(client=1, token=None, resumed=False)
+        writer.control(sid, '{"type": "hello", "partials": "all"}')
+        for i in range(chunks):
+            writer.audio(sid, bytes([i]) * size)
+            writer.event(sid, json.dumps({"type": "partial", "text": f"word{i}"}))
+        writer.event(sid, '{"type": "final", "text": "show inbox"}')
+        writer.finish(sid)
+        return sid
+
+
+class TestCaptureWriter(CaptureTest):
+
+    def test_round_trip(self):
+        writer = CaptureWriter(self.path)
+        writer.start()
+        self.session(writer)
+        writer.close()
+        sessions = read_capture([self.path])
+        self.assertEqual(len(sessions), 1)
+        entry = next(iter(sessions.values()))
+        self.assertEqual(entry["meta"], {"client": 1, "token": None, "resumed": False})
+        self.assertTrue(entry["closed"])
+        self.assertEqual(entry["gaps"], 0)
+        kinds = [kind for kind, _, _ in entry["records"]]
+        self.assertEqual(kinds, [CONTROL] + [AUDIO, EVENT] * 3 + [EVENT])
+        self.assertEqual(entry["records"][3][2], b"\1" * 3200)
+        times = [t for _, t, _ in entry["records"]]
+        self.assertEqual(times, sorted(times))
+
+    def test_rotation_repeats_open_sessions(self):
+        writer = CaptureWriter(self.path, segment_bytes=4096)
+        writer.start()
+        long_running = writer.open(client=2, token="abc", resumed=True)
+        self.session(writer, chunks=4)
+        writer.audio(long_running, b"\0" * 100)
+        writer.close()
+        files = capture_files([self.path])
+        self.assertGreater(len(files), 2)
+        # The last segment alone still knows the long-running session
+        last = read_capture(files[-1:])
+        self.assertEqual(next(iter(last.values()))["meta"]["token"], "abc")
+        # Read together, repeated OPENs don't duplicate sessions
+        self.assertEqual(len(read_capture([self.path])), 2)
+
+    def test_keep_newest_segments(self):
+        writer = CaptureWriter(self.path, segment_bytes=4096, keep=2)
+        writer.start()
+        self.session(writer, chunks=8)
+        writer.close()
+        files = capture_files([self.path])
+        self.assertEqual(files, writer.segments)
+        self.assertEqual(len(files), 2)
+
+    def test_full_queue_drops_and_marks_a_gap(self):
+        writer = CaptureWriter(self.path, max_queue_bytes=5000)
+        sid = writer.open(client=1)
+        writer.audio(sid, b"\1" * 3200)
+        writer.audio(sid, b"\2" * 3200)  # doesn't fit; the thread isn't running
+        writer.finish(sid)
+        self.assertEqual((writer.dropped_records, writer.dropped_bytes), (1, 3200))
+        writer.start()
+        writer.close()
+        entry = next(iter(read_capture([self.path]).values()))
+        self.assertEqual(entry["gaps"], 1)
+        self.assertEqual([p for _, _, p in entry["records"]], [b"\1" * 3200])
+
+    def test_cut_off_segment_is_readable(self):
+        writer = CaptureWriter(self.path)
+        writer.start()
+        self.session(writer)
+        writer.close()
+        segment = capture_files([self.path])[0]
+        segment.write_bytes(segment.read_bytes()[:-20])  # CLOSE and half the final
+        entry = next(iter(read_capture([segment]).values()))
+        self.assertFalse(entry["closed"])
+        self.assertEqual(len(entry["records"]), 7)
+
+
+class TestReplayCompare(unittest.TestCase):
+
+    def test_latency_and_finals(self):
+        records = [
+            (AUDIO, 1.0, b""),
+            (EVENT, 1.05, b'{"type": "partial", "text": "show"}'),
+            (AUDIO, 1.1, b""),
+            (EVENT, 1.4, b'{"type": "final", "text": "show inbox"}'),
+        ]
+        recorded = recorded_results(records)
+        self.assertAlmostEqual(recorded[1][0], 0.3)
+        replayed = [(0.02, {"type": "partial", "text": "show"}),
+                    (0.5, {"type": "final", "text": "show in box"})]
+        report = compare(recorded, replayed)
+        self.assertFalse(report["match"])
+        self.assertEqual(report["replayed_finals"], ["show in box"])
+        self.assertEqual(report["replayed_latency"]["max"], 0.5)
+        self.assertTrue(compare(recorded, recorded)["match"])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared correction store and its use by the server.
+"""
+
+import asyncio
+import json
+import random
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import websockets
+
+from backends import BYTES_PER_MS, FakeBackend
+from corrections import (BKTree, CorrectionStore, edit_distance, normalize,
+                         phonetic_key)
+from intents import CommandResolver
+from test_server import ServerThread
+
+
+class TestPhoneticKey(unittest.TestCase):
+
+    def test_sound_alikes_share_a_key(self):
+        for heard, meant in [("delayed a men", "delayed amen"),
+                             ("show in box", "show inbox"),
+                             ("next e mail", "nexed email")]:
+            self.assertEqual(phonetic_key(normalize(heard)),
+                             phonetic_key(normalize(meant)))
+        self.assertNotEqual(phonetic_key("next"), phonetic_key("open"))
+
+    def test_normalize(self):
+        self.assertEqual(normalize("Jarvis  Delete, email!"), "delete email")
+
+
+class TestBKTree(unittest.TestCase):
+
+    def test_search_matches_a_scan(self):
+        rng = random.Random(7)
+        keys = {"".join(rng.choice("tlkmnsr") for _ in range(rng.randint(2, 8)))
+                for _ in range(500)}
+        tree = BKTree()
+        for key in keys:
+            tree.add(key)
+        self.assertEqual(tree.size, len(keys))
+        for query in ("tlt", "kmns", "srrt", "ntlksm"):
+            expected = sorted((edit_distance(query, k), k) for k in keys
+                              if edit_distance(query, k) <= 2)
+            self.assertEqual(sorted(tree.search(query, 2)), expected)
+
+
+class TestCorrectionStore(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.dir.name) / "corrections.jsonl"
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_lookups(self):
+        store = CorrectionStore()
+        store.learn("Delayed amen", "delete email")
+        self.assertEqual(store.lookup("delayed amen"),
+                         ("delete email", "delayed amen", "exact"))
+        self.assertEqual(store.lookup("delayed a men")[2], "phonetic")
+        self.assertEqual(store.lookup("the layed amen")[2], "near")
+        self.assertIsNone(store.lookup("next email"))
+        # A phrase some correction leads to is known to be right
+        self.assertIsNone(store.lookup("delete email"))
+        self.assertEqual(store.correct("jarvis delayed amen"),
+                         ("jarvis delete email", "exact"))
+
+    def test_learn_and_forget(self):
+        store = CorrectionStore()
+        with self.assertRaises(ValueError):
+            store.learn("next", "Next!")
+        store.learn("delayed amen", "delete email")
+        store.learn("delayed amen", "delete all")  # replaces
+        self.assertEqual(store.lookup("delayed amen")[0], "delete all")
+        self.assertTrue(store.forget("jarvis delayed amen"))
+        self.assertFalse(store.forget("delayed amen"))
+        self.assertIsNone(store.lookup("delayed a men"))
+        self.assertEqual(len(store), 0)
+
+    def test_commands_are_never_rewritten(self):
+        store = CorrectionStore(resolver=CommandResolver())
+        store.learn("zoom it", "zoom in")
+        store.learn("delayed amen", "delete email")
+        # "zoom out" has the same key as "zoom it", but it's a command
+        self.assertIsNone(store.correct("jarvis zoom out"))
+        # Sounds as much like "zoom out" as like the learned phrase
+        self.assertIsNone(store.correct("zoom at"))
+        self.assertEqual(store.correct("zoom it"), ("zoom in", "exact"))
+        self.assertEqual(store.correct("delayed a men"), ("delete email", "phonetic"))
+        with self.assertRaises(ValueError):
+            store.learn("zoom out", "zoom in")
+
+    def test_journal_is_shared_and_compacted(self):
+        first, second = CorrectionStore(self.path), CorrectionStore(self.path)
+        first.load()
+        second.load()
+        first.learn("delayed amen", "delete email")
+        first.learn("our kive this", "archive this")
+        second.forget("our kive this")  # not learned here yet
+        self.assertEqual(second.refresh(), 2)
+        second.forget("our kive this")
+        first.refresh()
+        self.assertEqual(first.corrections, {"delayed amen": "delete email"})
+        with open(self.path, "a") as f:
+            f.write('{"learn": "nest", "te')  # another worker mid-write
+        self.assertEqual(first.refresh(), 0)
+        self.assertNotIn("nest", first.corrections)
+        # Loading compacts the journal to the live entries
+        third = CorrectionStore(self.path)
+        third.load()
+        self.assertEqual(third.corrections, first.corrections)
+        self.assertEqual(self.path.read_text().count("\n"), 1)
+        first.learn("nest", "next")
+        self.assertEqual(second.refresh(), 2)  # re-reads the rewritten file
+        self.assertEqual(second.corrections, first.corrections)
+
+    def test_decode_threads_share_the_store(self):
+        store = CorrectionStore(self.path)
+        store.load()
+        phrases = [f"open email {a} {b}" for a in "abcdefghij" for b in "klmnopqrst"]
+
+        def teach(phrase):
+            store.learn(phrase, "open email three")
+            store.lookup(phrase)
+            store.refresh()
+
+        with ThreadPoolExecutor(4) as pool:
+            list(pool.map(teach, phrases))
+        self.assertEqual(len(store), len(phrases))
+        self.assertEqual(self.path.read_text().count("\n"), len(phrases))
+        self.assertEqual(store._tree.size, len(store._keys))
+
+    def test_tree_is_rebuilt_after_many_forgets(self):
+        store = CorrectionStore()
+        phrases = [f"open email {a} {b}" for a in "abcdefghij" for b in "klmnopqrst"]
+        for phrase in phrases:
+            store.learn(phrase, "open email three")
+        for phrase in phrases[:-2]:
+            store.forget(phrase)
+        self.assertLess(store._tree.size, 70)
+        self.assertEqual(store.lookup(phrases[-1])[0], "open email three")
+
+
+class TestServerCorrections(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.TemporaryDirectory()
+        cls.path = Path(cls.dir.name) / "corrections.jsonl"
+        cls.thread = ServerThread(
+            backend=FakeBackend(script=["jarvis inbox show"], utterance_ms=300),
+            resolve_commands=True, corrections_file=cls.path)
+        cls.url = cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.thread.stop()
+        cls.dir.cleanup()
+
+    async def request(self, ws, message: dict) -> dict:
+        await ws.send(json.dumps(message))
+        return json.loads(await ws.recv())
+
+    async def final(self, hello: dict = None) -> list:
+        async with websockets.connect(self.url) as ws:
+            await self.request(ws, {"type": "hello", "partials": "off", **(hello or {})})
+            await ws.send(b"\0" * (300 * BYTES_PER_MS))
+            await ws.send(json.dumps({"type": "stats"}))
+            messages = []
+            async for message in ws:
+                data = json.loads(message)
+                if data["type"] == "stats":
+                    return messages
+                messages.append(data)
+
+    def test_learned_on_one_connection_applies_on_another(self):
+        async def run():
+            async with websockets.connect(self.url) as ws:
+                reply = await self.request(ws, {"type": "learn",
+                                                "heard": "Inbox show",
+                                                "text": "show inbox"})
+                self.assertEqual(reply, {"type": "learn", "heard": "inbox show",
+                                         "text": "show inbox", "size": 1})
+                error = await self.request(ws, {"type": "learn", "heard": "next"})
+                self.assertEqual(error["type"], "error")
+                error = await self.request(ws, {"type": "learn", "heard": "next email",
+                                                "text": "archive this"})
+                self.assertEqual(error["message"], "'next email' is already a command")
+            corrected = await self.final()
+            untouched = await self.final({"corrections": False})
+            async with websockets.connect(self.url) as ws:
+                reply = await self.request(ws, {"type": "forget", "heard": "Inbox show"})
+                self.assertEqual((reply["heard"], reply["removed"]), ("inbox show", True))
+            return corrected, untouched
+
+        corrected, untouched = asyncio.run(run())
+        final, command = corrected
+        self.assertEqual(final["text"], "jarvis show inbox")
+        self.assertEqual(final["heard"], "jarvis inbox show")
+        self.assertEqual(command["command"], "show_inbox")
+        self.assertEqual(untouched[0]["text"], "jarvis inbox show")
+        self.assertNotIn("heard", untouched[0])
+        self.assertEqual(self.path.read_text().count("\n"), 2)  # learn, forget
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for server-side endpointing.
+"""
+
+import unittest
+
+from endpointing import COMMAND, SILENCE, Endpointer
+from intents import CommandResolver
+
+
+class TestEndpointer(unittest.TestCase):
+    """Test the silence and complete-command rules."""
+
+    def setUp(self):
+        self.endpointer = Endpointer(silence_ms=500, command_ms=200,
+                                     is_complete=CommandResolver().is_complete)
+
+    def test_silence_rule(self):
+        self.assertIsNone(self.endpointer.update("search for", 0))
+        self.assertIsNone(self.endpointer.update("search for", 400))
+        self.assertEqual(self.endpointer.update("search for", 500), SILENCE)
+
+    def test_new_words_restart_the_clock(self):
+        self.endpointer.update("search", 0)
+        self.assertIsNone(self.endpointer.update("search for", 450))
+        self.assertIsNone(self.endpointer.update("search for", 900))
+
+    def test_complete_command_rule(self):
+        self.endpointer.update("jarvis archive this", 0)
+        self.assertIsNone(self.endpointer.update("jarvis archive this", 100))
+        self.assertEqual(self.endpointer.update("jarvis archive this", 200),
+                         COMMAND)
+
+    def test_number_command_prefix_waits_for_silence(self):
+        self.endpointer.update("jarvis delete email", 0)
+        self.assertIsNone(self.endpointer.update("jarvis delete email", 300))
+        self.assertEqual(self.endpointer.update("jarvis delete email", 500),
+                         SILENCE)
+
+    def test_free_text_command_is_not_complete(self):
+        self.endpointer.update("search for invoices", 0)
+        self.assertIsNone(self.endpointer.update("search for invoices", 300))
+
+    def test_empty_partial_never_ends(self):
+        self.assertIsNone(self.endpointer.update("", 0))
+        self.assertIsNone(self.endpointer.update("", 10000))
+
+    def test_latency(self):
+        self.assertIsNone(self.endpointer.latency_ms())
+        self.endpointer.update("delete", 0)
+        self.assertGreaterEqual(self.endpointer.latency_ms(), 0)
+        self.endpointer.reset()
+        self.assertIsNone(self.endpointer.latency_ms())
+
+    def test_configure(self):
+        self.assertEqual(self.endpointer.configure(silence_ms="300"),
+                         {"silence_ms": 300, "command_ms": 200})
+        self.assertFalse(Endpointer().enabled)
+        with self.assertRaises(ValueError):
+            self.endpointer.configure(hangover_ms=1)
+        with self.assertRaises(ValueError):
+            self.endpointer.configure(command_ms=-1)
+
+
+class TestIsComplete(unittest.TestCase):
+
+    def test_commands(self):
+        resolver = CommandResolver()
+        self.assertTrue(resolver.is_complete("jarvis archive this"))
+        self.assertTrue(resolver.is_complete("open email three"))
+        self.assertTrue(resolver.is_complete("show the inbox"))
+        # Simple commands a number or free text may still extend
+        for text in ("delete", "delete email", "archive", "open attachment",
+                     "jarvis open the attachment"):
+            self.assertFalse(resolver.is_complete(text), text)
+        self.assertFalse(resolver.is_complete("open email"))
+        self.assertFalse(resolver.is_complete("search for invoices"))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
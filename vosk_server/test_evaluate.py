@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for grammar A/B evaluation scoring (without a model).
+"""
+
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import vocab_reload
+from evaluate import load_corpus, load_variant, normalize, score, word_errors
+from intents import CommandResolver
+
+
+class TestWordErrors(unittest.TestCase):
+
+    def test_identical(self):
+        self.assertEqual(word_errors(["jarvis", "delete"], ["jarvis", "delete"]), 0)
+
+    def test_substitution_deletion_insertion(self):
+        self.assertEqual(word_errors(["open", "email", "three"], ["open", "email", "tree"]), 1)
+        self.assertEqual(word_errors(["open", "email", "three"], ["open", "three"]), 1)
+        self.assertEqual(word_errors(["next"], ["next", "page", "please"]), 2)
+        self.assertEqual(word_errors([], ["noise"]), 1)
+
+    def test_normalize(self):
+        self.assertEqual(normalize("Jarvis, Delete!"), ["jarvis", "delete"])
+
+
+class TestScore(unittest.TestCase):
+
+    def test_command_match_ignores_filler(self):
+        corpus = [("a.wav", "jarvis delete"), ("b.wav", "open email three"),
+                  ("c.wav", "hello there")]
+        got = ["jarvis delete please", "open email four", "hello there"]
+        result = score(corpus, got, CommandResolver())
+        self.assertEqual(result["utterances"], 3)
+        self.assertEqual(result["exact_match"], round(1 / 3, 4))
+        # "jarvis delete please" still deletes; email four is the wrong email
+        self.assertEqual(result["command_match"], round(2 / 3, 4))
+        self.assertEqual(result["wer"], round(2 / 7, 4))
+
+
+class TestInputs(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.dir.name)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_corpus_formats(self):
+        corpus = self.root / "corpus.jsonl"
+        corpus.write_text('# commands\n{"audio": "a.wav", "text": "jarvis delete"}\n'
+                          '/abs/b.wav\tnext page\n')
+        self.assertEqual(load_corpus(corpus), [(self.root / "a.wav", "jarvis delete"),
+                                               (Path("/abs/b.wav"), "next page")])
+        corpus.write_text("a.wav jarvis delete\n")
+        with self.assertRaises(ValueError):
+            load_corpus(corpus)
+
+    def test_variants(self):
+        self.assertIsNone(load_variant("free"))
+        self.assertIn("[unk]", json.loads(load_variant("words")))
+        grammar_file = self.root / "g.json"
+        grammar_file.write_text('["yes", "no", "[unk]"]')
+        self.assertEqual(json.loads(load_variant(str(grammar_file))), ["yes", "no", "[unk]"])
+        vocab_file = self.root / "v.json"
+        vocab_file.write_text('{"commands": ["snooze"]}')
+        words = json.loads(load_variant(str(vocab_file)))
+        self.assertIn("snooze", words)
+        self.assertIn("jarvis", words)
+
+    @unittest.skipIf(vocab_reload.yaml is None, "needs PyYAML")
+    def test_yaml_vocabulary_variant(self):
+        vocab_file = self.root / "v.yaml"
+        vocab_file.write_text("commands:\n  - snooze\ncontexts:\n  alarm: [snooze]\n")
+        words = json.loads(load_variant(str(vocab_file)))
+        self.assertIn("snooze", words)
+        self.assertIn("jarvis", words)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
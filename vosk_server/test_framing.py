@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for fixed-size audio framing.
+"""
+
+import os
+import unittest
+
+from framing import FrameBuffer, frame_bytes_for
+
+
+class TestFrameBuffer(unittest.TestCase):
+    """Test re-framing of arbitrarily sized chunks."""
+
+    def reframe(self, buffer, data, chunk_sizes):
+        out = []
+        pos = 0
+        for size in chunk_sizes:
+            out.extend(bytes(f) for f in buffer.push(data[pos:pos + size]))
+            pos += size
+        return out
+
+    def test_frame_size(self):
+        self.assertEqual(frame_bytes_for(100), 3200)
+
+    def test_reframes_variable_chunks(self):
+        """Output should be the input stream cut into equal frames."""
+        data = os.urandom(10000)
+        buffer = FrameBuffer(640, capacity_frames=4)
+        frames = self.reframe(buffer, data, [1, 333, 640, 7, 2000, 17, 7002])
+        self.assertTrue(all(len(f) == 640 for f in frames))
+        self.assertEqual(b"".join(frames), data[:len(frames) * 640])
+        self.assertEqual(buffer.buffered, len(data) % 640)
+
+    def test_odd_byte_split(self):
+        """A sample split across chunks should come out whole."""
+        buffer = FrameBuffer(4)
+        self.assertEqual(buffer.push(b"\x01\x02\x03"), [])
+        frames = buffer.push(b"\x04\x05")
+        self.assertEqual([bytes(f) for f in frames], [b"\x01\x02\x03\x04"])
+
+    def test_ring_reused_without_growing(self):
+        """Steady small chunks should not enlarge the ring."""
+        buffer = FrameBuffer(640, capacity_frames=4)
+        capacity = buffer.capacity
+        self.reframe(buffer, os.urandom(64000), [500] * 128)
+        self.assertEqual(buffer.capacity, capacity)
+
+    def test_grows_for_large_chunk(self):
+        """A chunk larger than the ring should still be framed."""
+        buffer = FrameBuffer(640, capacity_frames=2)
+        buffer.push(b"\x00" * 100)
+        frames = buffer.push(b"\x01" * 5000)
+        self.assertEqual(len(frames), 5100 // 640)
+        self.assertEqual(bytes(frames[0])[:100], b"\x00" * 100)
+
+    def test_rejects_partial_sample_frames(self):
+        with self.assertRaises(ValueError):
+            FrameBuffer(641)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
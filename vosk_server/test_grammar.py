@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Tests for the phrase-level grammar builder.
+"""
+
+import json
+import unittest
+
+from commands import COMMAND_PHRASES, NUMBER_WORDS
+from grammar import build_phrases, get_grammar
+from vocabulary import VOCABULARY
+
+
+class TestPhraseGrammar(unittest.TestCase):
+    """Test the grammar generated from the command catalog."""
+
+    def setUp(self):
+        self.phrases, self.dropped = build_phrases()
+
+    def test_phrases_use_vocabulary_words(self):
+        """Every phrase should be decodable with the vocabulary."""
+        for phrase in self.phrases:
+            for word in phrase.split():
+                self.assertIn(word, VOCABULARY, f"{word!r} in {phrase!r}")
+
+    def test_command_phrases_included(self):
+        """Canonical phrases made of vocabulary words should be present."""
+        for phrase in ["show inbox", "delete this", "scroll down", "jarvis"]:
+            self.assertIn(phrase, self.phrases)
+
+    def test_number_slots_expanded(self):
+        """Number commands should be expanded with every number word."""
+        for number in NUMBER_WORDS:
+            self.assertIn(f"open email {number}", self.phrases)
+
+    def test_out_of_vocabulary_phrases_dropped(self):
+        """Phrases the model can't decode should be reported, not used."""
+        self.assertIn("unstar", COMMAND_PHRASES["unstar"])
+        self.assertIn("unstar", self.dropped)
+        self.assertNotIn("unstar", self.phrases)
+
+    def test_context_subset(self):
+        """A context's phrase grammar should be a subset of the full one."""
+        pdf = set(json.loads(get_grammar("phrases", "pdf")))
+        full = set(json.loads(get_grammar("phrases")))
+        self.assertTrue(pdf < full)
+        self.assertIn("scroll down", pdf)
+        self.assertNotIn("show inbox", pdf)
+
+    def test_grammar_ends_with_unk(self):
+        """Free-text arguments need [unk] in the grammar."""
+        self.assertEqual(json.loads(get_grammar("phrases"))[-1], "[unk]")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tests for server-side command resolution.
+"""
+
+import unittest
+
+from intents import CommandResolver, parse_number
+
+
+class TestCommandResolver(unittest.TestCase):
+    """Test trie-based resolution of transcripts into intents."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.resolver = CommandResolver()
+
+    def resolve(self, text, **kwargs):
+        return self.resolver.resolve(text, **kwargs)
+
+    def test_simple_command(self):
+        """Phrase variations should resolve to their canonical command."""
+        self.assertEqual(self.resolve("show my inbox")["command"], "show_inbox")
+        self.assertEqual(self.resolve("trash it")["command"], "delete")
+
+    def test_wake_word_and_fillers_ignored(self):
+        """Leading wake word and filler words should not matter."""
+        intent = self.resolve("jarvis open the attachment please")
+        self.assertEqual(intent["command"], "open_attachment")
+        self.assertEqual(intent["confidence"], 1.0)
+
+    def test_number_command(self):
+        """Number commands should carry the parsed number."""
+        intent = self.resolve("delete email three")
+        self.assertEqual(intent["command"], "delete_email")
+        self.assertEqual(intent["args"], {"number": 3})
+        self.assertEqual(self.resolve("go to page twenty one")["args"],
+                         {"number": 21})
+
+    def test_simple_beats_number_prefix(self):
+        """'delete' alone is the simple command, not a number command."""
+        self.assertEqual(self.resolve("delete")["command"], "delete")
+
+    def test_text_command(self):
+        """Free-text commands should keep the rest of the transcript."""
+        intent = self.resolve("search the invoice")
+        self.assertEqual(intent["command"], "search")
+        self.assertEqual(intent["args"], {"text": "the invoice"})
+
+    def test_unknown_text_not_resolved(self):
+        """Nonsense or only-[unk] arguments should not resolve."""
+        self.assertIsNone(self.resolve("zoom trash the eleven"))
+        self.assertIsNone(self.resolve("label [unk]"))
+        self.assertIsNone(self.resolve("jarvis"))
+
+    def test_word_confidence_scales_result(self):
+        """Kaldi word confidences should scale the match confidence."""
+        words = [{"word": "next", "conf": 0.8}]
+        self.assertEqual(self.resolve("next", words=words)["confidence"], 0.8)
+
+    def test_parse_number(self):
+        self.assertEqual(parse_number(["7"]), 7)
+        self.assertEqual(parse_number(["for"]), 4)
+        self.assertIsNone(parse_number(["one", "two"]))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests for the Prometheus metrics module.
+"""
+
+import asyncio
+import unittest
+
+from metrics import Counter, Gauge, Histogram, ServerMetrics, _Metric
+from recognizer_pool import RecognizerPool
+from session import Session
+from test_session import GRAMMAR, WAKE_GRAMMAR, ScriptedRecognizer
+
+
+class TestMetricTypes(unittest.TestCase):
+    """Test rendering of the individual metric types."""
+
+    def test_counter_labels(self):
+        counter = Counter("sent_total", "Messages sent")
+        counter.inc(type="final")
+        counter.inc(2, type="final")
+        lines = counter.render()
+        self.assertIn("# TYPE sent_total counter", lines)
+        self.assertIn('sent_total{type="final"} 3', lines)
+
+    def test_empty_metric_renders_zero(self):
+        self.assertIn("up 0", Gauge("up", "Up").render())
+
+    def test_gauge_remove(self):
+        gauge = Gauge("rtf", "RTF")
+        gauge.set(0.5, session=1)
+        gauge.remove(session=1)
+        self.assertNotIn('rtf{session="1"} 0.5', gauge.render())
+
+    def test_histogram_is_cumulative(self):
+        histogram = Histogram("t", "Timing", (0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value)
+        lines = histogram.render()
+        self.assertIn('t_bucket{le="0.1"} 1', lines)
+        self.assertIn('t_bucket{le="1.0"} 2', lines)
+        self.assertIn('t_bucket{le="+Inf"} 3', lines)
+        self.assertIn("t_count 3", lines)
+        self.assertIn("t_sum 5.55", lines)
+
+
+class TestServerMetrics(unittest.TestCase):
+    """Test the server's metric set and its HTTP listener."""
+
+    def test_collectors_run_on_render(self):
+        metrics = ServerMetrics()
+        metrics.add_collector(lambda m: m.pool.set(7, stat="hits"))
+        self.assertIn('vosk_recognizer_pool{stat="hits"} 7', metrics.render())
+
+    def test_every_metric_is_rendered(self):
+        metrics = ServerMetrics()
+        metrics.corrections.set(3, stat="entries")
+        metrics.corrected.inc(match="phonetic")
+        text = metrics.render()
+        self.assertIn('vosk_corrections{stat="entries"} 3', text)
+        self.assertIn('vosk_corrected_total{match="phonetic"} 1', text)
+        for metric in vars(metrics).values():
+            if isinstance(metric, _Metric):
+                self.assertIn(f"# TYPE {metric.name} ", text)
+
+    def test_http_listener(self):
+        metrics = ServerMetrics()
+        metrics.active_sessions.set(2)
+
+        async def scrape(path):
+            server = await metrics.serve(0)
+            port = server.sockets[0].getsockname()[1]
+            try:
+                reader, writer = await asyncio.open_connection("localhost", port)
+                writer.write(f"GET {path} HTTP/1.1\r\nHost: x\r\n\r\n".encode())
+                response = await reader.read()
+                writer.close()
+                return response.decode()
+            finally:
+                server.close()
+                await server.wait_closed()
+
+        response = asyncio.run(scrape("/metrics"))
+        self.assertTrue(response.startswith("HTTP/1.1 200"))
+        self.assertIn("vosk_active_sessions 2", response)
+        self.assertTrue(asyncio.run(scrape("/")).startswith("HTTP/1.1 404"))
+
+    def test_session_records_decode_time(self):
+        metrics = ServerMetrics()
+        session = Session(RecognizerPool(ScriptedRecognizer), GRAMMAR, WAKE_GRAMMAR)
+        session.metrics = metrics
+        for chunk in (b"show", b"inbox", b"."):
+            session.feed(chunk)
+        self.assertEqual(session.audio_bytes, 10)
+        self.assertGreater(session.real_time_factor(), 0)
+        self.assertIn("vosk_accept_waveform_seconds_count 3", metrics.render())
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming model installer.
+
+Downloads are served by a local HTTP stand-in that supports Range
+requests and can be told to cut a response short.
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import tempfile
+import threading
+import time
+import unittest
+import zipfile
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+import websockets
+
+import model_install
+from backends import BYTES_PER_MS, FakeBackend
+from model_install import (InstallError, ZipStreamExtractor, archive_location,
+                           install_model)
+from test_server import ServerThread
+
+MODEL = "vosk-model-test"
+FILES = {
+    f"{MODEL}/am/final.mdl": bytes(range(256)) * 400,
+    f"{MODEL}/conf/model.conf": b"--sample-frequency=16000\n",
+    f"{MODEL}/graph/empty": b"",
+}
+
+
+class Unseekable(io.RawIOBase):
+    """Makes zipfile write data descriptors, like a streaming archiver."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.data += b
+        return len(b)
+
+
+def make_archive(streamed: bool = False, files=FILES) -> bytes:
+    out = Unseekable() if streamed else io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(f"{MODEL}/", b"")
+        for name, data in files.items():
+            zf.writestr(name, data)
+    return bytes(out.data) if streamed else out.getvalue()
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Serves server.archive at /<MODEL>.zip."""
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.headers.get("Range"))
+        if self.path != f"/{MODEL}.zip":
+            self.send_error(404)
+            return
+        data, start = server.archive, 0
+        ranged = self.headers.get("Range")
+        if ranged and server.ranges:
+            start = int(ranged.split("=")[1].rstrip("-"))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        else:
+            self.send_response(200)
+        body = data[start:]
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if server.cut_at is not None:
+            # Drop the connection partway through, once
+            cut, server.cut_at = server.cut_at, None
+            self.wfile.write(body[:cut])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class InstallTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.dir.name)
+        self.models = self.root / "models"
+        self.http = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+        self.http.archive = make_archive()
+        self.http.requests = []
+        self.http.ranges = True
+        self.http.cut_at = None
+        threading.Thread(target=self.http.serve_forever, daemon=True).start()
+        self.mirror = f"http://127.0.0.1:{self.http.server_address[1]}"
+        # No real waiting between retries
+        patcher = mock.patch.object(model_install.time, "sleep")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.http.shutdown()
+        self.http.server_close()
+        self.dir.cleanup()
+
+    def assertInstalled(self, path):
+        self.assertEqual(path, self.models / MODEL)
+        for name, data in FILES.items():
+            self.assertEqual((self.models / name).read_bytes(), data)
+        self.assertEqual(sorted(p.name for p in self.models.iterdir()), [MODEL])
+
+
+class TestInstall(InstallTest):
+
+    def test_from_mirror(self):
+        progress = []
+        path = install_model(MODEL, self.models, self.mirror + "/",
+                             progress=lambda done, total: progress.append((done, total)))
+        self.assertInstalled(path)
+        self.assertEqual(progress[-1], (len(self.http.archive),) * 2)
+        # Installed models aren't fetched again
+        install_model(MODEL, self.models, self.mirror)
+        self.assertEqual(len(self.http.requests), 1)
+
+    def test_from_local_archive(self):
+        archive = self.root / "model.zip"
+        archive.write_bytes(make_archive(streamed=True))
+        self.assertInstalled(install_model(MODEL, self.models, str(archive)))
+
+    def test_interrupted_download_resumes(self):
+        self.http.cut_at = len(self.http.archive) // 2
+        self.assertInstalled(install_model(MODEL, self.models, self.mirror))
+        self.assertEqual(self.http.requests,
+                         [None, f"bytes={len(self.http.archive) // 2}-"])
+
+    def test_server_without_ranges_starts_over(self):
+        self.http.ranges = False
+        self.http.cut_at = 1000
+        self.assertInstalled(install_model(MODEL, self.models, self.mirror))
+        self.assertEqual(len(self.http.requests), 2)
+
+    def test_checksum(self):
+        good = hashlib.sha256(self.http.archive).hexdigest()
+        with self.assertRaises(InstallError):
+            install_model(MODEL, self.models, self.mirror, sha256="0" * 64)
+        self.assertEqual(list(self.models.iterdir()), [])
+        self.assertInstalled(install_model(MODEL, self.models, self.mirror, sha256=good))
+
+    def test_missing_archive(self):
+        with self.assertRaises(InstallError):
+            install_model("no-such-model", self.models, self.mirror)
+        self.assertEqual(len(self.http.requests), 1)
+
+
+class TestExtractor(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.dest = Path(self.dir.name)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_byte_at_a_time_with_data_descriptors(self):
+        extractor = ZipStreamExtractor(self.dest)
+        for byte in make_archive(streamed=True):
+            extractor.feed(bytes([byte]))
+        extractor.close()
+        self.assertEqual(extractor.files, len(FILES))
+        self.assertEqual((self.dest / f"{MODEL}/am/final.mdl").read_bytes(),
+                         FILES[f"{MODEL}/am/final.mdl"])
+
+    def test_truncated_and_corrupt_archives(self):
+        archive = make_archive()
+        extractor = ZipStreamExtractor(self.dest / "a")
+        extractor.feed(archive[:len(archive) // 2])
+        with self.assertRaises(InstallError):
+            extractor.close()
+        corrupt = bytearray(make_archive(files={"x.txt": b"hello" * 100}))
+        corrupt[corrupt.index(b"x.txt") + 8] ^= 0xFF  # inside the compressed data
+        with self.assertRaises((InstallError, zlib.error)):
+            ZipStreamExtractor(self.dest / "b").feed(bytes(corrupt))
+
+    def test_unsafe_paths_are_rejected(self):
+        archive = make_archive(files={"../evil.txt": b"x"})
+        with self.assertRaises(InstallError):
+            ZipStreamExtractor(self.dest / "c").feed(archive)
+        self.assertFalse((self.dest / "evil.txt").exists())
+
+    def test_archive_location(self):
+        self.assertEqual(archive_location("m", "https://mirror/vosk/"),
+                         "https://mirror/vosk/m.zip")
+        self.assertEqual(archive_location("m", "/srv/models"), "/srv/models/m.zip")
+        self.assertEqual(archive_location("m", "/tmp/x.zip"), "/tmp/x.zip")
+        self.assertTrue(archive_location("m").endswith("/m.zip"))
+
+
+class TestServerStartup(unittest.TestCase):
+    """A client that connects while the model is still being installed."""
+
+    def test_loading_then_ready(self):
+        release = threading.Event()
+
+        def slow_install(progress):
+            progress(50, 100)
+            release.wait(10)
+            return "fake-model"
+
+        thread = ServerThread(backend=FakeBackend(utterance_ms=300))
+        thread.server.model_path = slow_install
+        url = thread.start(load=False)
+
+        async def run():
+            deadline = time.monotonic() + 5
+            while (thread.server.load_status.get("progress") is None
+                   and time.monotonic() < deadline):
+                await asyncio.sleep(0.01)
+            async with websockets.connect(url) as ws:
+                first = json.loads(await ws.recv())
+                release.set()
+                ready = json.loads(await ws.recv())
+                # Then it's an ordinary session
+                await ws.send(b"\0" * (300 * BYTES_PER_MS))
+                final = json.loads(await ws.recv())
+                while final["type"] != "final":
+                    final = json.loads(await ws.recv())
+                return first, ready, final
+
+        try:
+            first, ready, final = asyncio.run(run())
+        finally:
+            release.set()
+            thread.stop()
+        self.assertEqual(first, {"type": "loading", "stage": "installing",
+                                 "bytes": 50, "progress": 0.5})
+        self.assertEqual(ready, {"type": "ready"})
+        self.assertEqual(final["text"], "jarvis show inbox")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Tests for partial-result policies.
+"""
+
+import unittest
+
+from partials import PartialPolicy
+
+
+class TestPartialPolicy(unittest.TestCase):
+    """Test dedup, rate limiting and coalescing of partials."""
+
+    def test_all_sends_everything(self):
+        policy = PartialPolicy("all")
+        self.assertEqual(policy.offer("show", 0.0), "show")
+        self.assertEqual(policy.offer("show", 0.1), "show")
+
+    def test_change_dedups(self):
+        """Only partials different from the last one sent go out."""
+        policy = PartialPolicy("change")
+        self.assertEqual(policy.offer("show", 0.0), "show")
+        self.assertIsNone(policy.offer("show", 0.1))
+        self.assertEqual(policy.offer("show inbox", 0.2), "show inbox")
+
+    def test_empty_and_off(self):
+        self.assertIsNone(PartialPolicy("change").offer("", 0.0))
+        policy = PartialPolicy("off")
+        self.assertFalse(policy.enabled)
+        self.assertIsNone(policy.offer("show", 0.0))
+
+    def test_rate_coalesces(self):
+        """Early partials are coalesced into the latest one."""
+        policy = PartialPolicy("rate", rate_hz=2)
+        self.assertEqual(policy.offer("show", 0.0), "show")
+        self.assertIsNone(policy.offer("show my", 0.1))
+        self.assertIsNone(policy.offer("show my inbox", 0.2))
+        self.assertEqual(policy.flush_at(), 0.5)
+        self.assertIsNone(policy.take_pending(0.4))
+        self.assertEqual(policy.take_pending(0.5), "show my inbox")
+        self.assertIsNone(policy.flush_at())
+
+    def test_reset_after_final(self):
+        """After a final, the same partial text may be sent again."""
+        policy = PartialPolicy("change")
+        policy.offer("next", 0.0)
+        policy.reset()
+        self.assertEqual(policy.offer("next", 0.1), "next")
+
+    def test_configure_validates(self):
+        policy = PartialPolicy()
+        self.assertEqual(policy.configure("rate", 4),
+                         {"partials": "rate", "partial_rate": 4.0})
+        with self.assertRaises(ValueError):
+            policy.configure("sometimes")
+        with self.assertRaises(ValueError):
+            policy.configure("rate", 0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
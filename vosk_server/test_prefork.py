@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests for pre-fork mode: a supervisor process, its workers and the
+listening socket they share.
+"""
+
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import unittest
+import urllib.request
+from pathlib import Path
+
+import websockets
+
+from backends import BYTES_PER_MS
+from test_server import free_port
+
+HERE = Path(__file__).parent
+
+
+def worker_pids(parent: int) -> set:
+    """Pids of the live processes whose parent is `parent` (Linux /proc)."""
+    pids = set()
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        # pid (comm) state ppid ...; comm may contain spaces
+        state, ppid = stat.rsplit(")", 1)[1].split()[:2]
+        if int(ppid) == parent and state != "Z":
+            pids.add(int(entry.name))
+    return pids
+
+
+def wait_for(condition, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.05)
+
+
+@unittest.skipUnless(hasattr(os, "fork") and Path("/proc/self/stat").exists(),
+                     "needs os.fork and /proc")
+class TestSupervisor(unittest.TestCase):
+    """Two workers on the fake backend behind one socket."""
+
+    def setUp(self):
+        self.port, self.metrics_port = free_port(), free_port()
+        self.url = f"ws://localhost:{self.port}"
+        self.process = subprocess.Popen(
+            [sys.executable, "server.py", "--backend", "fake", "--workers", "2",
+             "--port", str(self.port), "--metrics-port", str(self.metrics_port),
+             "--fake-utterance-ms", "300", "--vocab-file", "missing.json"],
+            cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        wait_for(lambda: len(worker_pids(self.process.pid)) == 2
+                 and None not in self.active_sessions())
+
+    def tearDown(self):
+        self.process.terminate()
+        self.process.wait(timeout=10)
+
+    def active_sessions(self) -> list:
+        """vosk_active_sessions of each worker (None if it's not up)."""
+        counts = []
+        for slot in range(2):
+            try:
+                url = f"http://localhost:{self.metrics_port + slot}/metrics"
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    text = response.read().decode()
+            except OSError:
+                counts.append(None)
+                continue
+            line = next(line for line in text.splitlines()
+                        if line.startswith("vosk_active_sessions "))
+            counts.append(float(line.split()[1]))
+        return counts
+
+    async def admitted(self):
+        """A connection the server has a session for."""
+        ws = await websockets.connect(self.url)
+        await ws.send(json.dumps({"type": "stats"}))
+        await ws.recv()
+        return ws
+
+    async def final(self) -> str:
+        async with websockets.connect(self.url) as ws:
+            await ws.send(b"\0" * (300 * BYTES_PER_MS))
+            while (data := json.loads(await ws.recv()))["type"] != "final":
+                pass
+            return data["text"]
+
+    def test_workers_share_the_socket_and_restart(self):
+        async def spread():
+            # The kernel hands each connection to whichever worker
+            # accepts first; keep connecting until both have some
+            connections = []
+            try:
+                while len(connections) < 32:
+                    connections.append(await self.admitted())
+                    if all(self.active_sessions()):
+                        return len(connections)
+                return None
+            finally:
+                for ws in connections:
+                    await ws.close()
+
+        self.assertIsNotNone(asyncio.run(spread()), self.active_sessions())
+
+        before = worker_pids(self.process.pid)
+        victim = min(before)
+        os.kill(victim, signal.SIGKILL)
+        wait_for(lambda: len(worker_pids(self.process.pid)) == 2
+                 and victim not in worker_pids(self.process.pid))
+        after = worker_pids(self.process.pid)
+        self.assertEqual(len(after - before), 1)
+        wait_for(lambda: None not in self.active_sessions())
+        for _ in range(4):
+            self.assertEqual(asyncio.run(self.final()), "jarvis show inbox")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
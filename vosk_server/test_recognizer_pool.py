@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Tests for the recognizer pool.
+"""
+
+import unittest
+
+from recognizer_pool import RecognizerPool
+from server import DEFAULT_POOL_SIZE
+from vocabulary import CONTEXTS
+
+
+class FakeRecognizer:
+    def __init__(self, grammar):
+        self.grammar = grammar
+        self.resets = 0
+
+    def Reset(self):
+        self.resets += 1
+
+
+class TestRecognizerPool(unittest.TestCase):
+    """Test checkout, return and the hit/miss counters."""
+
+    def setUp(self):
+        self.built = []
+
+        def factory(grammar):
+            rec = FakeRecognizer(grammar)
+            self.built.append(rec)
+            return rec
+
+        self.pool = RecognizerPool(factory, max_idle=2)
+
+    def test_prewarm_builds_idle_recognizers(self):
+        """Prewarming should build recognizers up front."""
+        self.pool.prewarm("g", 2)
+        self.assertEqual(len(self.built), 2)
+        self.assertEqual(self.pool.stats()["idle"], 2)
+
+    def test_acquire_hit_reuses_prewarmed(self):
+        """Acquiring a prewarmed grammar should not build a new one."""
+        self.pool.prewarm("g", 1)
+        rec = self.pool.acquire("g")
+        self.assertIs(rec, self.built[0])
+        self.assertEqual(self.pool.hits, 1)
+        self.assertEqual(self.pool.misses, 0)
+
+    def test_acquire_miss_builds_for_grammar(self):
+        """A grammar with no idle recognizers should build a new one."""
+        self.pool.prewarm("g", 1)
+        rec = self.pool.acquire("other")
+        self.assertEqual(rec.grammar, "other")
+        self.assertEqual(self.pool.misses, 1)
+
+    def test_release_resets_and_reuses(self):
+        """Released recognizers should be reset and handed out again."""
+        rec = self.pool.acquire("g")
+        self.pool.release("g", rec)
+        self.assertEqual(rec.resets, 1)
+        self.assertIs(self.pool.acquire("g"), rec)
+
+    def test_release_respects_size_limit(self):
+        """Recognizers beyond max_idle should be dropped."""
+        recs = [self.pool.acquire("g") for _ in range(3)]
+        for rec in recs:
+            self.pool.release("g", rec)
+        stats = self.pool.stats()
+        self.assertEqual(stats["idle"], 2)
+        self.assertEqual(stats["discarded"], 1)
+
+    def test_context_recognizer_is_cached_in_a_full_pool(self):
+        """A context grammar released into a pool prewarmed to capacity
+        should displace an idle full-grammar recognizer, not be dropped."""
+        pool = RecognizerPool(FakeRecognizer, max_idle=DEFAULT_POOL_SIZE,
+                              max_grammars=len(CONTEXTS) + 1)
+        pool.prewarm("full", DEFAULT_POOL_SIZE)
+        built = []
+        for _ in range(2):
+            # Connect, switch to the "pdf" context, disconnect
+            rec = pool.acquire("full")
+            pool.release("full", rec)
+            pdf = pool.acquire("pdf")
+            built.append(pdf)
+            pool.release("pdf", pdf)
+        self.assertIs(built[1], built[0])
+        self.assertEqual(pool.discarded, 0)
+        self.assertEqual(pool.stats()["idle"], DEFAULT_POOL_SIZE)
+
+    def test_lru_grammar_eviction(self):
+        """The least recently used grammar should be evicted first."""
+        pool = RecognizerPool(FakeRecognizer, max_idle=8, max_grammars=2)
+        pool.prewarm("a", 1)
+        pool.prewarm("b", 1)
+        pool.release("a", pool.acquire("a"))  # "a" is now most recent
+        pool.prewarm("c", 1)
+        self.assertEqual(pool.evictions, 1)
+        pool.acquire("a")
+        pool.acquire("b")
+        self.assertEqual(pool.hits, 2)
+        self.assertEqual(pool.misses, 1)
+
+    def test_set_max_grammars(self):
+        """Lowering the cap evicts LRU grammars; raising it keeps more."""
+        pool = RecognizerPool(FakeRecognizer, max_idle=8, max_grammars=3)
+        for grammar in "abc":
+            pool.prewarm(grammar, 1)
+        pool.set_max_grammars(2)
+        self.assertEqual((pool.stats()["grammars"], pool.evictions), (2, 1))
+        pool.set_max_grammars(4)
+        for grammar in "ade":
+            pool.prewarm(grammar, 1)
+        self.assertEqual(pool.stats()["grammars"], 4)
+        self.assertEqual(pool.evictions, 2)
+
+    def test_retire_drops_old_grammar(self):
+        """Retired grammars free their idle slots and aren't kept again."""
+        self.pool.prewarm("old", 2)
+        rec = self.pool.acquire("old")
+        self.pool.retire(["old"])
+        self.assertEqual(self.pool.stats()["idle"], 0)
+        self.pool.release("old", rec)
+        self.assertEqual(self.pool.stats()["idle"], 0)
+        self.pool.prewarm("new", 2)
+        self.assertEqual(self.pool.stats()["idle"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Tests for two-pass decoding (without a model).
+
+The first pass is scripted: each chunk is a word, b"." ends the utterance
+and a word's confidence is 0.3 if it starts with "?" (which is stripped).
+The secondary model "hears" every chunk, upper-cased.
+"""
+
+import json
+import unittest
+
+from recognizer_pool import RecognizerPool
+from rescoring import LOW_CONFIDENCE, UNKNOWN, Rescorer, rescore_reason
+from session import FINAL, Session
+
+
+class FastRecognizer:
+    def __init__(self, grammar):
+        self.vocab = json.loads(grammar)
+        self.words = []
+
+    def AcceptWaveform(self, data):
+        if data == b".":
+            return True
+        word = data.decode()
+        conf = 0.3 if word.startswith("?") else 1.0
+        word = word.lstrip("?")
+        self.words.append({"word": word if word in self.vocab else "[unk]",
+                           "conf": conf})
+        return False
+
+    def Result(self):
+        return self.FinalResult()
+
+    def PartialResult(self):
+        return json.dumps({"partial": ""})
+
+    def FinalResult(self):
+        words, self.words = self.words, []
+        return json.dumps({"text": " ".join(w["word"] for w in words),
+                           "result": words})
+
+    def Reset(self):
+        self.words = []
+
+
+class AccurateRecognizer:
+    def __init__(self, grammar):
+        self.words = []
+
+    def AcceptWaveform(self, data):
+        if data == b".":
+            return False
+        self.words.append(data.decode().lstrip("?").upper())
+        return data == b"|"  # an endpoint of its own
+
+    def Result(self):
+        return self.FinalResult()
+
+    def FinalResult(self):
+        words, self.words = [w for w in self.words if w != "|"], []
+        return json.dumps({"text": " ".join(words),
+                           "result": [{"word": w, "conf": 0.9} for w in words]})
+
+    def Reset(self):
+        self.words = []
+
+
+GRAMMAR = json.dumps(["show", "inbox", "[unk]"])
+
+
+class TestRescoreReason(unittest.TestCase):
+
+    def test_thresholds(self):
+        def result(text, conf=1.0):
+            return {"text": text, "result": [{"word": w, "conf": conf}
+                                             for w in text.split()]}
+        self.assertIsNone(rescore_reason(result("show inbox"), 0.6, 0.5))
+        self.assertIsNone(rescore_reason(result(""), 0.6, 0.5))
+        self.assertEqual(rescore_reason(result("show [unk]"), 0.6, 0.5), UNKNOWN)
+        self.assertEqual(rescore_reason(result("show inbox", 0.4), 0.6, 0.5),
+                         LOW_CONFIDENCE)
+        # No word confidences: judged on [unk] alone
+        self.assertIsNone(rescore_reason({"text": "show inbox"}, 0.6, 0.5))
+
+    def test_rescore_joins_segments(self):
+        rescorer = Rescorer(RecognizerPool(AccurateRecognizer))
+        result, seconds = rescorer.rescore(GRAMMAR, [b"a", b"|", b"b"])
+        self.assertEqual(result["text"], "A B")
+        self.assertEqual(len(result["result"]), 2)
+        self.assertEqual(rescorer.pool.stats()["idle"], 1)
+
+
+class TestTwoPass(unittest.TestCase):
+
+    def setUp(self):
+        self.session = Session(RecognizerPool(FastRecognizer), GRAMMAR, GRAMMAR)
+        self.session.rescorer = Rescorer(RecognizerPool(AccurateRecognizer))
+
+    def final(self, *chunks):
+        events = []
+        for chunk in chunks:
+            events.extend(self.session.feed(chunk))
+        return [result for kind, result in events if kind == FINAL][-1]
+
+    def test_confident_final_stays_on_fast_path(self):
+        result = self.final(b"show", b"inbox", b".")
+        self.assertEqual(result["text"], "show inbox")
+        self.assertNotIn("rescored", result)
+        self.assertEqual(self.session.rescorer.pool.stats()["misses"], 0)
+
+    def test_unknown_final_is_rescored(self):
+        result = self.final(b"show", b"snooze", b"later", b".")
+        self.assertEqual(result["text"], "SHOW SNOOZE LATER")
+        self.assertEqual(result["first_pass"], "show [unk] [unk]")
+        self.assertEqual(result["rescored"], UNKNOWN)
+        self.assertEqual(result["endpoint"], "kaldi")
+
+    def test_only_the_current_utterance_is_rescored(self):
+        self.final(b"show", b".")
+        result = self.final(b"?inbox", b".")
+        self.assertEqual((result["text"], result["rescored"]),
+                         ("INBOX", LOW_CONFIDENCE))
+
+    def test_long_utterance_is_not_buffered(self):
+        self.session.rescorer.max_audio_ms = 0
+        result = self.final(b"snooze", b".")
+        self.assertEqual(result["text"], "[unk]")
+        self.assertNotIn("rescored", result)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
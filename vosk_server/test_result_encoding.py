@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Tests for the compact result encodings, and the Unix socket listener.
+"""
+
+import asyncio
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from websockets.asyncio.client import unix_connect
+
+from backends import BYTES_PER_MS, FakeRecognizer
+from prefork import bind_unix_socket
+from recognizer_pool import RecognizerPool
+from result_encoding import (BINARY, MSGPACK, TABLE_RESET, HEAD, ResultDecoder,
+                             ResultEncoder, make_encoder, msgpack)
+from session import Session
+from test_server import ServerThread
+
+FINAL = {
+    "type": "final",
+    "text": "show inbox",
+    "result": [{"word": "show", "start": 0.25, "end": 0.5, "conf": 1.0},
+               {"word": "inbox", "start": 0.5, "end": 0.875, "conf": 0.5}],
+    "endpoint": "silence",
+}
+
+
+class TestBinaryEncoding(unittest.TestCase):
+
+    def round_trip(self, encoder, decoder, *messages):
+        frame = b"".join(encoder.encode(m) for m in messages)
+        return frame, decoder.decode(frame)
+
+    def test_final_with_words_and_extras(self):
+        frame, decoded = self.round_trip(ResultEncoder(), ResultDecoder(), FINAL)
+        self.assertEqual(decoded, [FINAL])
+
+    def test_texts_are_sent_once(self):
+        encoder, decoder = ResultEncoder(), ResultDecoder()
+        first, _ = self.round_trip(encoder, decoder,
+                                   {"type": "partial", "text": "show inbox"})
+        again, decoded = self.round_trip(encoder, decoder,
+                                         {"type": "partial", "text": "show inbox"})
+        self.assertGreater(len(first), len(again))
+        self.assertEqual(len(again), HEAD.size)
+        self.assertEqual(decoded, [{"type": "partial", "text": "show inbox"}])
+
+    def test_final_and_command_share_a_frame(self):
+        command = {"type": "command", "text": "show inbox", "action": "inbox"}
+        _, decoded = self.round_trip(ResultEncoder(), ResultDecoder(), FINAL, command)
+        self.assertEqual(decoded, [FINAL, command])
+
+    def test_full_table_starts_over(self):
+        encoder, decoder = ResultEncoder(limit=4), ResultDecoder()
+        for text in ("one", "two", "three", "four"):
+            frame, decoded = self.round_trip(encoder, decoder,
+                                             {"type": "partial", "text": text})
+            self.assertEqual(decoded[0]["text"], text)
+        self.assertTrue(frame[1] & TABLE_RESET)
+
+    def test_reset_redefines_texts(self):
+        encoder = ResultEncoder()
+        encoder.encode({"type": "partial", "text": "next"})
+        encoder.reset()
+        # A client that reconnected has a fresh decoder
+        frame = encoder.encode({"type": "partial", "text": "next"})
+        self.assertEqual(ResultDecoder().decode(frame)[0]["text"], "next")
+
+
+class TestEncoderChoice(unittest.TestCase):
+
+    def test_make_encoder(self):
+        self.assertIsNone(make_encoder("json"))
+        self.assertEqual(make_encoder(BINARY).name, BINARY)
+        with self.assertRaises(ValueError):
+            make_encoder("protobuf")
+
+    @unittest.skipIf(msgpack is not None, "msgpack is installed")
+    def test_msgpack_needs_the_package(self):
+        with self.assertRaises(ValueError):
+            make_encoder(MSGPACK)
+
+    @unittest.skipIf(msgpack is None, "msgpack isn't installed")
+    def test_msgpack_round_trip(self):
+        encoder, decoder = make_encoder(MSGPACK), ResultDecoder(MSGPACK)
+        frame = encoder.encode(FINAL) + encoder.encode(FINAL)
+        self.assertEqual(decoder.decode(frame), [FINAL, FINAL])
+
+    def test_session_keeps_its_table_for_the_same_encoding(self):
+        session = Session(RecognizerPool(FakeRecognizer), "[]", "[]")
+        self.assertEqual(session.results, "json")
+        session.set_results(BINARY)
+        encoder = session.result_encoder
+        session.set_results(BINARY)
+        self.assertIs(session.result_encoder, encoder)
+        session.set_results("json")
+        self.assertIsNone(session.result_encoder)
+
+
+class TestUnixSocket(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.dir.name) / "vosk.sock"
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_stale_socket_is_replaced(self):
+        sock = bind_unix_socket(self.path)
+        sock.close()  # the file stays behind, nothing listening
+        sock = bind_unix_socket(self.path)
+        self.assertEqual(self.path.stat().st_mode & 0o777, 0o600)
+        with self.assertRaises(OSError):
+            bind_unix_socket(self.path)  # this one is live
+        sock.close()
+
+    def test_binary_results_over_the_socket(self):
+        thread = ServerThread(unix_socket=self.path, resolve_commands=True)
+        thread.start()
+        try:
+            messages = asyncio.run(self.session())
+        finally:
+            thread.stop()
+        self.assertFalse(self.path.exists())
+        finals = [m for m in messages if m["type"] == "final"]
+        self.assertEqual(finals[0]["text"], "jarvis show inbox")
+        self.assertEqual([w["word"] for w in finals[0]["result"]],
+                         ["jarvis", "show", "inbox"])
+        self.assertIn("command", [m["type"] for m in messages])
+
+    async def session(self) -> list:
+        async with unix_connect(str(self.path), "ws://localhost/") as ws:
+            await ws.send(json.dumps({"type": "hello", "results": BINARY}))
+            hello = json.loads(await ws.recv())
+            self.assertEqual(hello["results"], BINARY)
+            for _ in range(12):
+                await ws.send(b"\0" * (100 * BYTES_PER_MS))
+            await ws.send(json.dumps({"type": "stats"}))
+            decoder = ResultDecoder()
+            messages = []
+            async for message in ws:
+                if isinstance(message, bytes):
+                    messages.extend(decoder.decode(message))
+                elif json.loads(message)["type"] == "stats":
+                    return messages
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
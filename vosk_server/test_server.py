@@ -2,8 +2,11 @@
 """
 Tests for the Vosk WebSocket server.
 
-These tests require the server to be running:
+By default the tests start a server in-process on the fake backend
+(scripted results, no model). To test a real server instead, start it
+and point the tests at it:
     python server.py
+    VOSK_SERVER_URL=ws://localhost:8765 python test_server.py
 
 Run tests with:
     python test_server.py
@@ -11,17 +14,90 @@ Run tests with:
 
 import asyncio
 import json
+import os
+import socket
 import struct
+import threading
+import time
 import unittest
 import math
 
 try:
     import websockets
+    from websockets.protocol import State
 except ImportError:
     websockets = None
 
 
-SERVER_URL = "ws://localhost:8765"
+SERVER_URL = os.environ.get("VOSK_SERVER_URL")
+_server = None
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+class ServerThread:
+    """A VoskServer running on its own event loop thread.
+
+    Options are passed to VoskServer; the backend defaults to the fake.
+    """
+
+    def __init__(self, **options):
+        from backends import FakeBackend
+        from server import VoskServer
+        options.setdefault("backend", FakeBackend())
+        options.setdefault("vocab_file", None)
+        self.server = VoskServer(None, free_port(), **options)
+        self.url = f"ws://localhost:{self.server.port}"
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.task = None
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.task = self.loop.create_task(self.server.run())
+        try:
+            self.loop.run_until_complete(self.task)
+        except asyncio.CancelledError:
+            pass
+
+    def start(self, load: bool = True) -> str:
+        """Load, start serving and wait until ready; returns the URL.
+
+        With load=False, run() loads the model in the background and this
+        returns without waiting.
+        """
+        if not load:
+            self.thread.start()
+            return self.url
+        self.server.load()
+        self.thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.ready.is_set():
+            if time.monotonic() > deadline or not self.thread.is_alive():
+                raise RuntimeError("in-process server didn't start")
+            time.sleep(0.01)
+        return self.url
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.task.cancel)
+        self.thread.join(timeout=10)
+        self.loop.close()
+
+
+def setUpModule():
+    global SERVER_URL, _server
+    if SERVER_URL is None and websockets is not None:
+        _server = ServerThread()
+        SERVER_URL = _server.start()
+
+
+def tearDownModule():
+    if _server is not None:
+        _server.stop()
 
 
 def generate_sine_wave(frequency: float, duration: float,
@@ -51,7 +127,7 @@ class TestServerConnection(unittest.TestCase):
         async def connect():
             try:
                 async with websockets.connect(SERVER_URL, close_timeout=2) as ws:
-                    self.assertTrue(ws.open)
+                    self.assertEqual(ws.state, State.OPEN)
                 return True
             except Exception as e:
                 self.fail(f"Could not connect to server: {e}")
@@ -228,7 +304,8 @@ if __name__ == "__main__":
     print("=" * 60)
     print("Vosk Server Tests")
     print("=" * 60)
-    print("\nMake sure the server is running: python server.py\n")
+    print("\nTesting an in-process server on the fake backend; set "
+          "VOSK_SERVER_URL to test a running one\n")
     print("=" * 60)
 
     unittest.main(verbosity=2)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Tests for per-session decoding (wake-word mode).
+
+Uses a scripted recognizer: each audio chunk is a word, a chunk of
+b"." ends the utterance and a chunk of spaces is silence (32 bytes = 1 ms).
+"""
+
+import json
+import unittest
+
+from recognizer_pool import RecognizerPool
+from session import FINAL, PARTIAL, WAKE, WAKE_MODE, Session
+
+
+class ScriptedRecognizer:
+    def __init__(self, grammar):
+        self.vocab = json.loads(grammar)
+        self.words = []
+
+    def _heard(self):
+        return " ".join(w if w in self.vocab else "[unk]" for w in self.words)
+
+    def AcceptWaveform(self, data):
+        if data == b".":
+            return True
+        if not data.strip():
+            return False  # silence
+        self.words.append(data.decode())
+        return False
+
+    def Result(self):
+        return self.FinalResult()
+
+    def PartialResult(self):
+        return json.dumps({"partial": self._heard()})
+
+    def FinalResult(self):
+        text = self._heard()
+        self.words = []
+        return json.dumps({"text": text})
+
+    def Reset(self):
+        self.words = []
+
+
+GRAMMAR = json.dumps(["jarvis", "show", "inbox", "[unk]"])
+WAKE_GRAMMAR = json.dumps(["jarvis", "[unk]"])
+
+
+def texts(events):
+    return [(kind, result.get("text", result.get("partial")))
+            for kind, result in events]
+
+
+class TestWakeMode(unittest.TestCase):
+    """Test the idle -> wake -> command -> idle cycle."""
+
+    def setUp(self):
+        self.pool = RecognizerPool(ScriptedRecognizer)
+        self.session = Session(self.pool, GRAMMAR, WAKE_GRAMMAR,
+                               mode=WAKE_MODE)
+
+    def feed(self, *chunks):
+        events = []
+        for chunk in chunks:
+            events.extend(self.session.feed(chunk))
+        return events
+
+    def test_idle_audio_produces_no_events(self):
+        """Without the wake word nothing should be sent."""
+        self.assertEqual(self.feed(b"show", b"inbox", b"."), [])
+        self.assertFalse(self.session.awake)
+
+    def test_wake_word_replays_buffered_audio(self):
+        """The wake word should wake the session and be replayed."""
+        events = self.feed(b"hello", b"jarvis")
+        self.assertEqual(events[0], (WAKE, {}))
+        self.assertEqual(texts(events[1:])[-1], (PARTIAL, "[unk] jarvis"))
+        self.assertTrue(self.session.awake)
+
+    def test_command_then_back_to_idle(self):
+        """After the command's final, the session should be idle again."""
+        events = self.feed(b"jarvis", b"show", b"inbox", b".")
+        self.assertEqual(texts(events)[-1], (FINAL, "jarvis show inbox"))
+        self.assertFalse(self.session.awake)
+
+    def test_pause_after_wake_word_keeps_listening(self):
+        """A final with only the wake word should not end the command."""
+        events = self.feed(b"jarvis", b".")
+        self.assertNotIn(FINAL, [kind for kind, _ in events])
+        self.assertTrue(self.session.awake)
+
+    def test_timeout_returns_to_idle(self):
+        """The session should go idle when nothing follows the wake word."""
+        self.session.set_mode(WAKE_MODE, wake_timeout_ms=0)
+        self.feed(b"jarvis", b"um")
+        self.assertFalse(self.session.awake)
+
+    def test_close_returns_recognizers(self):
+        """Both recognizers should go back to the pool."""
+        self.session.close()
+        self.assertEqual(self.pool.stats()["idle"], 2)
+
+
+class TestGrammarSwap(unittest.TestCase):
+    """Test grammar swaps requested by a vocabulary reload."""
+
+    def setUp(self):
+        self.session = Session(RecognizerPool(ScriptedRecognizer), GRAMMAR,
+                               WAKE_GRAMMAR)
+        self.new_grammar = json.dumps(["show", "inbox", "snooze", "[unk]"])
+
+    def test_swap_waits_for_utterance_boundary(self):
+        self.session.feed(b"show")
+        self.session.request_grammar(self.new_grammar)
+        self.session.feed(b"snooze")
+        self.assertEqual(self.session.grammar, GRAMMAR)
+        events = self.session.feed(b".")
+        self.assertEqual(texts(events), [(FINAL, "show [unk]")])
+        self.assertEqual(self.session.grammar, self.new_grammar)
+        self.assertEqual(texts(self.session.feed(b"snooze")), [(PARTIAL, "snooze")])
+
+    def test_idle_session_swaps_on_next_chunk(self):
+        self.session.set_grammar(GRAMMAR, "inbox")
+        self.session.request_grammar(self.new_grammar)
+        self.session.feed(b"show")
+        self.assertEqual(self.session.grammar, self.new_grammar)
+        self.assertEqual(self.session.context, "inbox")
+
+
+class TestEndpointing(unittest.TestCase):
+    """Test finals forced by the session's endpointer."""
+
+    def setUp(self):
+        self.session = Session(RecognizerPool(ScriptedRecognizer), GRAMMAR,
+                               WAKE_GRAMMAR)
+        self.session.endpointer.is_complete = lambda text: text == "show inbox"
+
+    def feed(self, *chunks):
+        events = []
+        for chunk in chunks:
+            events.extend(self.session.feed(chunk))
+        return events
+
+    def test_complete_command_is_finalized_early(self):
+        self.session.endpointer.configure(command_ms=10, silence_ms=1000)
+        events = self.feed(b"show", b"inbox", b" " * 320)
+        kind, result = events[-1]
+        self.assertEqual((kind, result["text"]), (FINAL, "show inbox"))
+        self.assertEqual(result["endpoint"], "command")
+        self.assertIn("latency_ms", result)
+
+    def test_incomplete_command_waits_for_silence(self):
+        self.session.endpointer.configure(command_ms=10, silence_ms=20)
+        events = self.feed(b"show", b" " * 320)
+        self.assertEqual(texts(events), [(PARTIAL, "show"), (PARTIAL, "show")])
+        kind, result = self.feed(b" " * 320)[-1]
+        self.assertEqual((kind, result["endpoint"]), (FINAL, "silence"))
+
+    def test_kaldi_and_eof_finals_are_tagged(self):
+        self.assertEqual(self.feed(b"show", b".")[-1][1]["endpoint"], "kaldi")
+        self.assertEqual(self.session.finish()[0][1]["endpoint"], "eof")
+
+    def test_disabled_by_default(self):
+        events = self.feed(b"show", b"inbox", b" " * 32000)
+        self.assertNotIn(FINAL, [kind for kind, _ in events])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
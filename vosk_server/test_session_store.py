@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Tests for session tokens, parking and reaping.
+"""
+
+import asyncio
+import json
+import time
+import unittest
+
+import websockets
+
+from backends import BYTES_PER_MS, FakeBackend
+from session_store import SessionStore, token_from_path
+from test_server import ServerThread
+
+
+class TestTokenFromPath(unittest.TestCase):
+
+    def test_token_in_query(self):
+        self.assertEqual(token_from_path("/?session=abc"), "abc")
+        self.assertEqual(token_from_path("/asr?x=1&session=abc"), "abc")
+
+    def test_token_requested(self):
+        self.assertEqual(token_from_path("/?session="), "")
+
+    def test_no_token(self):
+        self.assertIsNone(token_from_path("/"))
+        self.assertIsNone(token_from_path(""))
+        self.assertIsNone(token_from_path(None))
+
+
+class TestSessionStore(unittest.TestCase):
+    """Test the attach -> park -> resume / reap lifecycle."""
+
+    def setUp(self):
+        self.store = SessionStore(grace=10)
+        self.entry = self.store.add("session", "queue", "ws1")
+
+    def test_tokens_are_unique(self):
+        other = self.store.add("session", "queue", "ws2")
+        self.assertNotEqual(self.entry.token, other.token)
+        self.assertIs(self.store.get(self.entry.token), self.entry)
+        self.assertIsNone(self.store.get("nope"))
+        self.assertIsNone(self.store.get(None))
+
+    def test_park_and_resume(self):
+        self.store.park(self.entry, now=100)
+        self.assertEqual(self.store.parked_count, 1)
+        self.assertTrue(self.entry.parked.is_set())
+        self.store.attach(self.entry, "ws2")
+        self.assertEqual(self.entry.websocket, "ws2")
+        self.assertEqual(self.store.parked_count, 0)
+        self.assertFalse(self.entry.parked.is_set())
+
+    def test_reaps_only_expired_parked_sessions(self):
+        live = self.store.add("session", "queue", "ws2")
+        self.store.park(self.entry, now=100)
+        self.assertEqual(self.store.expired(now=105), [])
+        self.assertEqual(self.store.expired(now=111), [self.entry])
+        self.assertIsNone(self.store.get(self.entry.token))
+        self.assertIs(self.store.get(live.token), live)
+
+
+class TestServerResume(unittest.TestCase):
+    """Takeover and reaping, through a running server."""
+
+    def setUp(self):
+        self.thread = None
+
+    def tearDown(self):
+        if self.thread is not None:
+            self.thread.stop()
+
+    def start(self, **options):
+        self.thread = ServerThread(**options)
+        return self.thread.start()
+
+    @staticmethod
+    async def messages(ws) -> list:
+        """Everything received until the connection closes."""
+        received = []
+        try:
+            async for message in ws:
+                received.append(json.loads(message))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        return received
+
+    def test_takeover_delivers_the_pending_final_once(self):
+        # Decoding lags the audio, so the final is still to come at takeover
+        url = self.start(backend=FakeBackend(utterance_ms=300, chunk_cost_ms=100),
+                         resume_grace=10)
+
+        async def run():
+            old = await websockets.connect(f"{url}/?session=")
+            hello = json.loads(await old.recv())
+            self.assertEqual((hello["type"], hello["resumed"]), ("session", False))
+            for _ in range(3):
+                await old.send(b"\0" * (100 * BYTES_PER_MS))
+            old_messages = asyncio.create_task(self.messages(old))
+            async with websockets.connect(f"{url}/?session={hello['token']}") as new:
+                resumed = json.loads(await new.recv())
+                await new.send(json.dumps({"type": "stats"}))
+                new_messages = []
+                async for message in new:
+                    data = json.loads(message)
+                    if data["type"] == "stats":
+                        break
+                    new_messages.append(data)
+            return resumed, old.close_reason, await old_messages, new_messages
+
+        resumed, reason, old_messages, new_messages = asyncio.run(run())
+        self.assertTrue(resumed["resumed"])
+        self.assertEqual(reason, "session resumed elsewhere")
+        self.assertNotIn("final", [m["type"] for m in old_messages])
+        self.assertEqual([m["text"] for m in new_messages if m["type"] == "final"],
+                         ["jarvis show inbox"])
+
+    def test_expired_session_is_reaped(self):
+        url = self.start(resume_grace=0.2)
+        server = self.thread.server
+
+        async def run():
+            async with websockets.connect(f"{url}/?session=") as ws:
+                token = json.loads(await ws.recv())["token"]
+            deadline = time.monotonic() + 5
+            while server.sessions.parked_count == 0 and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            self.assertEqual(len(server.live_sessions), 1)
+            # The reaper runs once a second
+            while len(server.sessions) and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            self.assertEqual(len(server.sessions), 0)
+            while server.live_sessions and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            self.assertEqual(server.live_sessions, set())
+            async with websockets.connect(f"{url}/?session={token}") as ws:
+                return token, json.loads(await ws.recv())
+
+        token, reply = asyncio.run(run())
+        # Too late: a new session, with a new token
+        self.assertEqual((reply["type"], reply["resumed"]), ("session", False))
+        self.assertNotEqual(reply["token"], token)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
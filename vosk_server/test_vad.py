@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tests for the voice activity detector.
+"""
+
+import unittest
+
+import numpy as np
+
+from vad import END_OF_SPEECH, VoiceActivityDetector
+
+SAMPLE_RATE = 16000
+
+
+def tone(duration: float, amplitude: float = 0.3) -> bytes:
+    """A 300 Hz tone as PCM16, loud enough to count as speech."""
+    t = np.arange(int(SAMPLE_RATE * duration)) / SAMPLE_RATE
+    return (amplitude * 32767 * np.sin(2 * np.pi * 300 * t)).astype('<i2').tobytes()
+
+
+def silence(duration: float) -> bytes:
+    return b'\x00\x00' * int(SAMPLE_RATE * duration)
+
+
+def audio_bytes(segments: list) -> int:
+    return sum(len(s) for s in segments if s is not END_OF_SPEECH)
+
+
+class TestVoiceActivityDetector(unittest.TestCase):
+    """Test speech gating, pre-roll and hangover."""
+
+    def setUp(self):
+        self.vad = VoiceActivityDetector(SAMPLE_RATE, hangover_ms=200,
+                                         preroll_ms=100)
+
+    def test_silence_is_skipped(self):
+        """Pure silence should produce nothing to decode."""
+        self.assertEqual(self.vad.process(silence(1.0)), [])
+
+    def test_speech_is_passed_with_preroll(self):
+        """Speech should be decoded along with the pre-roll before it."""
+        self.vad.process(silence(0.5))
+        segments = self.vad.process(tone(0.5))
+        # 100 ms pre-roll + 500 ms tone
+        self.assertEqual(audio_bytes(segments), len(tone(0.6)))
+
+    def test_hangover_then_end_of_speech(self):
+        """Decoding should continue for the hangover, then mark the end."""
+        self.vad.process(tone(0.5))
+        segments = self.vad.process(silence(1.0))
+        self.assertIn(END_OF_SPEECH, segments)
+        self.assertEqual(audio_bytes(segments), len(silence(0.2)))
+        self.assertFalse(self.vad.in_speech)
+
+    def test_odd_sized_chunks(self):
+        """Chunks split mid-sample should be reassembled correctly."""
+        audio = tone(0.4)
+        total = 0
+        for i in range(0, len(audio), 333):
+            total += audio_bytes(self.vad.process(audio[i:i + 333]))
+        # Everything but the last partial frame is decoded
+        self.assertEqual(total, len(audio) - len(audio) % (2 * self.vad.frame_len))
+
+    def test_configure(self):
+        """Settings should be tunable and unknown keys rejected."""
+        config = self.vad.configure(enabled=False, threshold_db=-40)
+        self.assertFalse(config["enabled"])
+        self.assertEqual(config["threshold_db"], -40.0)
+        with self.assertRaises(ValueError):
+            self.vad.configure(bogus=1)
+
+    def test_rejected_configure_changes_nothing(self):
+        """A bad value should leave the keys before it unapplied."""
+        before = self.vad.config()
+        for settings in ({"enabled": False, "threshold_db": "loud"},
+                         {"hangover_ms": 100, "snr_db": None},
+                         {"preroll_ms": 100, "bogus": 1}):
+            with self.assertRaises((TypeError, ValueError)):
+                self.vad.configure(**settings)
+            self.assertEqual(self.vad.config(), before)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Tests for the vocabulary data file and hot reload.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+import websockets
+
+import vocab_reload
+from backends import BYTES_PER_MS, FakeBackend
+from grammar import get_grammar
+from vocab_reload import (FileWatcher, install_vocabulary, load_vocabulary,
+                          merge_vocabulary, read_vocabulary_file)
+from test_server import ServerThread
+from vocabulary import CONTEXTS, VOCABULARY
+
+
+class FakeModel:
+    """Lexicon lookups: every word is known except those listed."""
+
+    def __init__(self, missing=()):
+        self.missing = set(missing)
+
+    def vosk_model_find_word(self, word):
+        return -1 if word in self.missing else 1
+
+
+class VocabFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.dir.name) / "vocabulary.json"
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write(self, data):
+        self.path.write_text(json.dumps(data))
+
+
+class TestReadVocabularyFile(VocabFileTest):
+    """Test parsing and shape checks."""
+
+    def test_reads_words(self):
+        self.write({"commands": ["Snooze "], "contexts": {"inbox": ["snooze"]}})
+        self.assertEqual(read_vocabulary_file(self.path),
+                         {"commands": ["snooze"], "contexts": {"inbox": ["snooze"]}})
+
+    def test_rejects_malformed_files(self):
+        for data in ([], {"words": []}, {"commands": "snooze"},
+                     {"commands": ["two words"]}, {"contexts": ["inbox"]}):
+            self.write(data)
+            with self.assertRaises(ValueError, msg=data):
+                read_vocabulary_file(self.path)
+        self.path.write_text("{not json")
+        with self.assertRaises(ValueError):
+            read_vocabulary_file(self.path)
+
+    @unittest.skipIf(vocab_reload.yaml is None, "PyYAML not installed")
+    def test_yaml(self):
+        path = self.path.with_suffix(".yaml")
+        path.write_text("commands:\n  - snooze\n")
+        self.assertEqual(read_vocabulary_file(path)["commands"], ["snooze"])
+
+
+class TestLoadVocabulary(VocabFileTest):
+    """Test merging, lexicon validation and installing."""
+
+    def test_merge_adds_to_builtin_lists(self):
+        words, contexts = merge_vocabulary(
+            {"commands": ["snooze"], "contexts": {"calendar": ["today"]}})
+        self.assertIn("snooze", words)
+        self.assertIn("today", words)  # context words join the vocabulary
+        self.assertTrue(set(VOCABULARY) <= set(words))
+        self.assertEqual(contexts["calendar"], ["today"])
+        self.assertEqual(contexts["inbox"], CONTEXTS["inbox"])
+
+    def test_missing_file_is_builtin_vocabulary(self):
+        words, contexts = load_vocabulary(self.path, FakeModel())
+        self.assertEqual(words, VOCABULARY)
+        self.assertEqual(contexts, CONTEXTS)
+
+    def test_rejects_words_missing_from_lexicon(self):
+        self.write({"commands": ["snooze", "xyzzy"]})
+        with self.assertRaisesRegex(ValueError, "xyzzy"):
+            load_vocabulary(self.path, FakeModel(missing=["xyzzy"]))
+
+    def test_install_refreshes_grammars(self):
+        builtin = merge_vocabulary({"commands": [], "contexts": {}})
+        before = get_grammar("words")
+        self.write({"commands": ["snooze"], "contexts": {"calendar": ["today"]}})
+        try:
+            install_vocabulary(*load_vocabulary(self.path, FakeModel()))
+            self.assertIn("snooze", json.loads(get_grammar("words")))
+            self.assertIn("today", json.loads(get_grammar("words", "calendar")))
+            self.assertIn("jarvis", json.loads(get_grammar("phrases", "calendar")))
+        finally:
+            install_vocabulary(*builtin)
+        self.assertEqual(get_grammar("words"), before)
+        self.assertNotIn("calendar", CONTEXTS)
+
+
+class TestFileWatcher(VocabFileTest):
+
+    def test_detects_changes(self):
+        watcher = FileWatcher(self.path)
+        self.assertFalse(watcher.changed())
+        self.write({"commands": ["snooze"]})
+        self.assertTrue(watcher.changed())
+        self.assertFalse(watcher.changed())
+        os.utime(self.path, ns=(1, 1))
+        self.assertTrue(watcher.changed())
+        self.path.unlink()
+        self.assertTrue(watcher.changed())
+
+
+class TestServerReload(VocabFileTest):
+    """Reload through a running server and recognize with the new words."""
+
+    def setUp(self):
+        super().setUp()
+        self.builtin = merge_vocabulary({"commands": [], "contexts": {}})
+        self.write({"commands": []})
+        self.thread = None
+
+    def tearDown(self):
+        if self.thread is not None:
+            self.thread.stop()
+        install_vocabulary(*self.builtin)
+        super().tearDown()
+
+    def start(self, **options):
+        self.thread = ServerThread(
+            backend=FakeBackend(script=["jarvis snooze"], utterance_ms=300),
+            vocab_file=self.path, **options)
+        self.thread.start()
+
+    async def request(self, ws, message: dict) -> dict:
+        await ws.send(json.dumps(message))
+        return json.loads(await ws.recv())
+
+    async def final(self) -> str:
+        async with websockets.connect(self.thread.url) as ws:
+            await self.request(ws, {"type": "hello", "partials": "off"})
+            await ws.send(b"\0" * (300 * BYTES_PER_MS))
+            await ws.send(json.dumps({"type": "stats"}))
+            texts = []
+            async for message in ws:
+                data = json.loads(message)
+                if data["type"] == "stats":
+                    return " ".join(texts)
+                if data["type"] == "final":
+                    texts.append(data["text"])
+
+    def test_admin_reload(self):
+        self.start(admin_token="secret", vocab_watch=0)
+
+        async def run():
+            self.assertEqual(await self.final(), "jarvis [unk]")
+            self.write({"commands": ["snooze"]})
+            async with websockets.connect(self.thread.url) as ws:
+                denied = await self.request(ws, {"type": "reload", "token": "guess"})
+                self.assertEqual(denied, {"type": "error", "message": "Not allowed"})
+                reply = await self.request(ws, {"type": "reload", "token": "secret"})
+            self.assertEqual((reply["ok"], reply["added"]), (True, 1))
+            self.assertEqual(await self.final(), "jarvis snooze")
+
+        asyncio.run(run())
+
+    def test_reload_prewarms_the_new_grammar(self):
+        self.start(admin_token="secret", vocab_watch=0, pool_size=3,
+                   secondary_model_path="secondary")
+        server = self.thread.server
+
+        async def run():
+            self.write({"commands": ["snooze"]})
+            async with websockets.connect(self.thread.url) as ws:
+                await self.request(ws, {"type": "reload", "token": "secret"})
+                return await self.request(ws, {"type": "stats"})
+
+        stats = asyncio.run(run())
+        # Only the new grammar, filled up as at load
+        self.assertEqual((stats["pool"]["idle"], stats["pool"]["grammars"]), (3, 1))
+        self.assertEqual((stats["secondary_pool"]["idle"],
+                          stats["secondary_pool"]["grammars"]), (1, 1))
+        for _ in range(3):
+            server.pool.acquire(server.grammar)
+        self.assertEqual(server.pool.stats()["misses"], 0)
+
+    def test_reload_makes_room_for_new_contexts(self):
+        self.start(admin_token="secret", vocab_watch=0)
+        server = self.thread.server
+        contexts = {f"folder{i}": ["snooze"] for i in range(4)}
+        self.write({"commands": [], "contexts": contexts})
+
+        async def run():
+            async with websockets.connect(self.thread.url) as ws:
+                return await self.request(ws, {"type": "reload", "token": "secret"})
+
+        self.assertTrue(asyncio.run(run())["ok"])
+        # One grammar per context, the new ones too, plus the full one
+        self.assertEqual(server.pool.stats()["max_grammars"], len(CONTEXTS) + 1)
+
+    def test_file_watcher(self):
+        self.start(vocab_watch=0.05)
+
+        async def run():
+            self.assertEqual(await self.final(), "jarvis [unk]")
+            self.write({"commands": ["snooze"]})
+            deadline = time.monotonic() + 5
+            while "snooze" not in VOCABULARY and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            self.assertEqual(await self.final(), "jarvis snooze")
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -9,7 +9,7 @@ import unittest
 import re
 from pathlib import Path
 
-from vocabulary import VOCABULARY, WAKE_WORDS, COMMANDS
+from vocabulary import VOCABULARY, WAKE_WORDS, COMMANDS, CONTEXTS
 
 
 class TestVocabulary(unittest.TestCase):
@@ -159,5 +159,34 @@ class TestGrammarFormat(unittest.TestCase):
         self.assertIn("[unk]", grammar)
 
 
+class TestContexts(unittest.TestCase):
+    """Test the per-screen sub-vocabularies."""
+
+    def test_context_words_in_vocabulary(self):
+        """Context grammars should only use vocabulary words."""
+        for name, words in CONTEXTS.items():
+            missing = set(words) - set(VOCABULARY)
+            self.assertFalse(missing, f"{name} has unknown words: {missing}")
+
+    def test_context_grammar_is_smaller(self):
+        """Each context grammar should be smaller than the full grammar."""
+        import json
+        from vocabulary import get_grammar_string
+
+        full = json.loads(get_grammar_string())
+        for name in CONTEXTS:
+            words = json.loads(get_grammar_string(name))
+            self.assertIn("jarvis", words)
+            self.assertIn("[unk]", words)
+            self.assertLess(len(words), len(full))
+
+    def test_unknown_context(self):
+        """Unknown contexts should raise KeyError."""
+        from vocabulary import get_grammar_string
+
+        with self.assertRaises(KeyError):
+            get_grammar_string("nope")
+
+
 if __name__ == "__main__":
     unittest.main(verbosity=2)
@@ -0,0 +1,161 @@
+"""
+Voice activity detection in front of the recognizer.
+
+Audio is split into short frames. Each frame is classified as speech or
+silence from its energy (dBFS) and zero-crossing rate, computed for all
+frames of a chunk at once with NumPy. Only speech regions are passed on
+for decoding:
+
+- pre-roll: the last few silent frames are kept and flushed ahead of the
+  first speech frame, so word onsets are not clipped
+- hangover: decoding continues for a while after speech stops, so short
+  pauses inside a command don't split it, and Kaldi sees some trailing
+  silence at the end of each utterance
+
+The threshold adapts to the room: it is the larger of `threshold_db` and
+the tracked noise floor plus `snr_db`.
+"""
+
+from collections import deque
+
+import numpy as np
+
+# Marker in process() output where a speech region ended
+END_OF_SPEECH = None
+
+# Settings a client may change per session through a "vad" control message
+TUNABLE = {
+    "enabled": bool,
+    "threshold_db": float,
+    "snr_db": float,
+    "zcr_threshold": float,
+    "hangover_ms": int,
+    "preroll_ms": int,
+}
+
+
+class VoiceActivityDetector:
+    """Streaming energy/zero-crossing VAD over 16-bit mono PCM."""
+
+    def __init__(self, sample_rate: int = 16000, frame_ms: int = 20,
+                 enabled: bool = True, threshold_db: float = -50.0,
+                 snr_db: float = 10.0, zcr_threshold: float = 0.25,
+                 hangover_ms: int = 400, preroll_ms: int = 300):
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.frame_len = sample_rate * frame_ms // 1000
+        self.enabled = enabled
+        self.threshold_db = threshold_db
+        self.snr_db = snr_db
+        self.zcr_threshold = zcr_threshold
+        self.hangover_ms = hangover_ms
+        self.preroll_ms = preroll_ms
+        self.reset()
+
+    def reset(self):
+        """Forget all stream state (buffered audio, noise floor, speech)."""
+        self._pending = np.empty(0, dtype=np.int16)
+        self._odd_byte = b""
+        self._preroll = deque(maxlen=max(1, self.preroll_ms // self.frame_ms))
+        self._hangover_left = 0
+        self.in_speech = False
+        self.noise_floor_db = self.threshold_db - self.snr_db
+
+    def configure(self, **settings) -> dict:
+        """Apply tunable settings and return the current configuration.
+
+        Raises ValueError for unknown settings, and ValueError or
+        TypeError for values that don't convert; either way nothing is
+        changed.
+        """
+        for key in settings:
+            if key not in TUNABLE:
+                raise ValueError(f"Unknown VAD setting: {key}")
+        values = {key: TUNABLE[key](value) for key, value in settings.items()}
+        for key, value in values.items():
+            setattr(self, key, value)
+        preroll_frames = max(1, self.preroll_ms // self.frame_ms)
+        if preroll_frames != self._preroll.maxlen:
+            self._preroll = deque(self._preroll, maxlen=preroll_frames)
+        if not self.enabled:
+            self.in_speech = False
+            self._hangover_left = 0
+        return self.config()
+
+    def config(self) -> dict:
+        return {key: getattr(self, key) for key in TUNABLE}
+
+    def classify(self, frames: np.ndarray) -> np.ndarray:
+        """Classify a (n_frames, frame_len) int16 array, one bool per frame."""
+        x = frames.astype(np.float32)
+        rms = np.sqrt(np.mean(x * x, axis=1)) + 1e-9
+        db = 20.0 * np.log10(rms / 32768.0)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frames.shape[1]
+
+        threshold = max(self.threshold_db, self.noise_floor_db + self.snr_db)
+        # Loud frames are speech. Quieter frames with many zero crossings
+        # are usually fricatives ("s", "f") at the edges of words.
+        speech = (db > threshold) | ((db > threshold - 6.0) & (zcr > self.zcr_threshold))
+
+        silent = db[~speech]
+        if silent.size:
+            # Track the room's noise floor from frames judged silent
+            self.noise_floor_db += 0.05 * (float(np.mean(silent)) - self.noise_floor_db)
+        return speech
+
+    def process(self, chunk: bytes) -> list:
+        """Feed a chunk of PCM audio and return what should be decoded.
+
+        The result is a list of bytes segments in stream order, with
+        END_OF_SPEECH entries marking where a speech region ended.
+        """
+        data = self._odd_byte + chunk if self._odd_byte else chunk
+        if len(data) % 2:
+            self._odd_byte = bytes(data[-1:])
+            data = data[:-1]
+        else:
+            self._odd_byte = b""
+
+        samples = np.frombuffer(data, dtype=np.int16)
+        if self._pending.size:
+            samples = np.concatenate((self._pending, samples))
+        n_frames = samples.size // self.frame_len
+        usable = n_frames * self.frame_len
+        self._pending = samples[usable:].copy()
+        if not n_frames:
+            return []
+
+        frames = samples[:usable].reshape(n_frames, self.frame_len)
+        speech = self.classify(frames)
+
+        segments = []
+        hangover_frames = max(0, self.hangover_ms // self.frame_ms)
+        run_start = None  # first frame of the current run to decode
+
+        for i in range(n_frames):
+            if speech[i]:
+                if not self.in_speech:
+                    self.in_speech = True
+                    segments.extend(self._preroll)
+                    self._preroll.clear()
+                self._hangover_left = hangover_frames
+            elif self.in_speech:
+                if self._hangover_left > 0:
+                    self._hangover_left -= 1
+                else:
+                    self.in_speech = False
+                    if run_start is not None:
+                        segments.append(frames[run_start:i].tobytes())
+                        run_start = None
+                    segments.append(END_OF_SPEECH)
+
+            if self.in_speech:
+                if run_start is None:
+                    run_start = i
+            else:
+                self._preroll.append(frames[i].tobytes())
+
+        if run_start is not None:
+            segments.append(frames[run_start:].tobytes())
+        return segments
@@ -0,0 +1,155 @@
+"""
+Vocabulary data file and hot reload.
+
+Words can be added without editing vocabulary.py, in a JSON (or, with
+PyYAML installed, YAML) file next to it:
+
+    {
+      "commands": ["snooze", "later"],
+      "contexts": {"inbox": ["snooze"], "calendar": ["today", "tomorrow"]}
+    }
+
+"commands" extends COMMANDS. "contexts" extends existing screen contexts
+or adds new ones; their words join the full vocabulary as well. The file
+only ever adds to the built-in lists.
+
+A reload reads and validates the file, then installs the merged lists
+into vocabulary.VOCABULARY / CONTEXTS in place (so modules that imported
+them see the change) and clears the cached grammar strings. The server
+then compiles the new grammar off the hot path and swaps it into
+sessions between utterances.
+"""
+
+import json
+import os
+from pathlib import Path
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+import grammar
+import vocabulary
+from vocabulary import COMMANDS, CONTEXTS, WAKE_WORDS
+
+DEFAULT_VOCAB_FILE = Path(__file__).parent / "vocabulary.json"
+DEFAULT_WATCH_INTERVAL = 2.0
+
+# The lists as defined in vocabulary.py, before any file was merged in
+BASE_CONTEXTS = {name: list(words) for name, words in CONTEXTS.items()}
+
+
+def _word_list(value, where: str) -> list:
+    if not isinstance(value, list) or not all(isinstance(w, str) for w in value):
+        raise ValueError(f"{where} must be a list of words")
+    words = [w.strip().lower() for w in value]
+    bad = [w for w in words if not w or len(w.split()) != 1]
+    if bad:
+        raise ValueError(f"{where}: not single words: {bad}")
+    return words
+
+
+def read_vocabulary_file(path: Path) -> dict:
+    """Parse and shape-check a vocabulary file.
+
+    Returns {"commands": [...], "contexts": {name: [...]}}. Raises
+    ValueError for a malformed file and OSError if it can't be read.
+    """
+    path = Path(path)
+    text = path.read_text()
+    if path.suffix.lower() in (".yaml", ".yml"):
+        if yaml is None:
+            raise ValueError("PyYAML is needed for YAML vocabulary files "
+                             "(pip install pyyaml)")
+        data = yaml.safe_load(text) or {}
+    else:
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{path.name}: {e}") from None
+
+    if not isinstance(data, dict):
+        raise ValueError(f"{path.name}: expected an object at the top level")
+    unknown = set(data) - {"commands", "contexts"}
+    if unknown:
+        raise ValueError(f"{path.name}: unknown keys {sorted(unknown)}")
+    contexts = data.get("contexts", {})
+    if not isinstance(contexts, dict):
+        raise ValueError(f"{path.name}: contexts must map names to word lists")
+    return {
+        "commands": _word_list(data.get("commands", []), "commands"),
+        "contexts": {str(name): _word_list(words, f"contexts.{name}")
+                     for name, words in contexts.items()},
+    }
+
+
+def merge_vocabulary(extra: dict) -> tuple[list, dict]:
+    """The built-in vocabulary and contexts with a file's words added."""
+    contexts = {name: list(words) for name, words in BASE_CONTEXTS.items()}
+    words = set(WAKE_WORDS + COMMANDS + extra["commands"])
+    for name, added in extra["contexts"].items():
+        merged = contexts.setdefault(name, [])
+        merged.extend(w for w in added if w not in merged)
+        words.update(added)
+    return sorted(words), contexts
+
+
+def unknown_words(model, words) -> list:
+    """Words missing from the model's lexicon (Kaldi can't decode them)."""
+    return [w for w in words if model.vosk_model_find_word(w) < 0]
+
+
+def load_vocabulary(path: Path, model=None) -> tuple[list, dict]:
+    """Read, merge and validate a vocabulary file.
+
+    A missing file means the built-in vocabulary alone. Raises ValueError
+    if the file is malformed or, given a model, uses words the model's
+    lexicon doesn't have.
+    """
+    if Path(path).exists():
+        extra = read_vocabulary_file(path)
+    else:
+        extra = {"commands": [], "contexts": {}}
+    merged, contexts = merge_vocabulary(extra)
+    if model is not None:
+        added = set(merged) - set(WAKE_WORDS + COMMANDS)
+        missing = unknown_words(model, sorted(added))
+        if missing:
+            raise ValueError(f"Not in the model's lexicon: {', '.join(missing)}")
+    return merged, contexts
+
+
+def install_vocabulary(words: list, contexts: dict):
+    """Make `words` and `contexts` the current vocabulary.
+
+    Not thread-safe: call from the thread that builds grammars.
+    """
+    vocabulary.VOCABULARY[:] = words
+    CONTEXTS.clear()
+    CONTEXTS.update(contexts)
+    vocabulary.get_grammar_string.cache_clear()
+    grammar.get_phrase_grammar_string.cache_clear()
+
+
+class FileWatcher:
+    """Poll a file's modification time."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._stamp = self._stat()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def changed(self) -> bool:
+        """True if the file changed, appeared or vanished since the last call."""
+        stamp = self._stat()
+        if stamp == self._stamp:
+            return False
+        self._stamp = stamp
+        return True
@@ -3,6 +3,8 @@ Constrained vocabulary for voice commands.
 Vosk will ONLY recognize these words.
 """
 
+import functools
+
 # Wake word
 WAKE_WORDS = ["jarvis"]
 
@@ -63,18 +65,83 @@ COMMANDS = [
     "never", "mind",
 ]
 
+# Words usable on every screen
+_COMMON = [
+    "one", "two", "three", "four", "five",
+    "six", "seven", "eight", "nine", "ten",
+    "the", "this", "that", "it", "a", "to", "go", "my",
+    "yes", "no", "okay", "ok", "please", "now", "just", "can", "you",
+    "stop", "help", "repeat", "commands", "list", "what", "say",
+    "cancel", "never", "mind", "back", "close", "exit",
+]
+
+# Smaller per-screen vocabularies, selected by clients with
+# {"type": "context", "name": "..."}. Every word must also be in COMMANDS.
+CONTEXTS = {
+    # Email list
+    "inbox": _COMMON + [
+        "show", "open", "read", "check", "refresh", "view",
+        "inbox", "email", "emails", "mail", "unread", "sent", "drafts",
+        "starred", "spam", "trash", "folder", "new", "all", "more",
+        "how", "many", "count", "next", "previous", "first", "last",
+        "delete", "archive", "star", "mark",
+        "label", "labels", "add", "remove",
+        "search", "find", "from", "for", "about", "subject",
+        "contact", "contacts", "compose", "write",
+        "eleven", "twelve", "thirteen", "fourteen", "fifteen",
+        "twenty", "thirty", "forty", "fifty",
+        "second", "third", "fourth", "fifth",
+    ],
+    # A single open email
+    "email": _COMMON + [
+        "show", "open", "read", "view", "email", "inbox",
+        "next", "previous", "first", "last",
+        "delete", "archive", "star", "mark", "unread", "done", "with",
+        "reply", "all", "respond", "forward",
+        "label", "labels", "add", "remove",
+        "attachment", "attachments", "pdf", "download", "save",
+        "sender", "contact", "contacts",
+    ],
+    # Writing a draft
+    "compose": _COMMON + [
+        "compose", "email", "message", "subject", "body", "is",
+        "draft", "send", "discard", "continue", "add",
+        "show", "read", "write", "with", "for", "of",
+        "in", "on", "about", "from", "new", "done",
+    ],
+    # PDF viewer
+    "pdf": _COMMON + [
+        "scroll", "down", "up", "page", "zoom", "in", "out",
+        "next", "previous", "first", "last", "beginning", "end",
+        "bigger", "smaller", "pdf", "download", "save",
+    ],
+}
+
 # Build the full vocabulary list
 VOCABULARY = sorted(set(WAKE_WORDS + COMMANDS))
 
-def get_grammar_string():
-    """Return vocabulary as JSON array string for Vosk grammar."""
+@functools.lru_cache(maxsize=None)
+def get_grammar_string(context=None):
+    """Return vocabulary as JSON array string for Vosk grammar.
+
+    With a context name, only that screen's sub-vocabulary is allowed.
+    Raises KeyError for an unknown context.
+    """
     import json
+    words = VOCABULARY
+    if context is not None:
+        words = sorted(set(WAKE_WORDS + CONTEXTS[context]))
     # Vosk grammar format: JSON array of allowed words
     # Adding "[unk]" allows unknown words to be recognized as "[unk]"
     # instead of forcing a match (optional - remove for strict mode)
-    words = VOCABULARY + ["[unk]"]
+    words = words + ["[unk]"]
     return json.dumps(words)
 
+def get_wake_grammar_string():
+    """Return the wake-word-only grammar used while a session is idle."""
+    import json
+    return json.dumps(WAKE_WORDS + ["[unk]"])
+
 if __name__ == "__main__":
     print(f"Vocabulary size: {len(VOCABULARY)} words")
     print(f"\nWords:\n{', '.join(VOCABULARY)}")